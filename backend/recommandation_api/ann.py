@@ -0,0 +1,211 @@
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from .ranking import top_n_indices
+
+
+class IVFIndex:
+    """
+    Index de recherche approchée des plus proches voisins (IVF, "inverted file"):
+    les vecteurs sont répartis en listes autour de centroïdes obtenus par k-means
+    sphérique. Une recherche ne parcourt que les n_probe listes dont les centroïdes
+    sont les plus proches de la requête, puis calcule les scores exacts de ces seuls
+    candidats. n_probe règle le compromis rappel / latence.
+
+    Pour une recherche par produit scalaire (et non par cosinus), l'index est construit
+    sur des vecteurs augmentés d'une composante qui leur donne à tous la même norme:
+    l'ordre des produits scalaires avec une requête complétée par 0 devient celui des cosinus.
+    """
+
+    def __init__(self, centroids, list_offsets, list_items):
+        """
+        Args:
+            centroids: Matrice (n_listes x k) des centroïdes normalisés
+            list_offsets: Début de chaque liste dans list_items (n_listes + 1 valeurs)
+            list_items: Indices des vecteurs, regroupés par liste
+        """
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_items = list_items
+        # Liste de chaque vecteur indexé
+        self.item_lists = np.empty(len(list_items), dtype=np.int32)
+        self.item_lists[list_items] = np.repeat(np.arange(len(centroids), dtype=np.int32), np.diff(list_offsets))
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors, n_lists, n_iter=10, seed=0, inner_product=False):
+        """
+        Construit l'index par k-means sphérique sur les vecteurs normalisés.
+
+        Args:
+            vectors: Matrice numpy (n x k) des vecteurs à indexer
+            n_lists: Nombre de listes (centroïdes)
+            n_iter: Nombre d'itérations du k-means
+            seed: Graine du tirage des centroïdes initiaux
+            inner_product: Index destiné à une recherche par produit scalaire
+
+        Returns:
+            Instance de IVFIndex
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if inner_product:
+            # x -> [x, sqrt(M² - |x|²)]: tous les vecteurs ont la norme M
+            squared_norms = (vectors ** 2).sum(axis=1)
+            extra = np.sqrt(np.maximum(squared_norms.max(initial=0) - squared_norms, 0))
+            vectors = np.hstack([vectors, extra[:, np.newaxis]]).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        unit_vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+        n = len(unit_vectors)
+        n_lists = max(1, min(n_lists, n))
+
+        rng = np.random.default_rng(seed)
+        centroids = unit_vectors[rng.choice(n, n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignment = cls._assign(unit_vectors, centroids)
+
+            # Nouveau centroïde = direction moyenne des vecteurs de la liste
+            membership = sp.csr_matrix((np.ones(n, dtype=np.float32), (assignment, np.arange(n))), shape=(n_lists, n))
+            sums = np.asarray(membership @ unit_vectors)
+            sum_norms = np.linalg.norm(sums, axis=1)
+            filled = sum_norms > 0
+            centroids[filled] = sums[filled] / sum_norms[filled, np.newaxis]
+
+            # Une liste vide reçoit un nouveau centroïde tiré au hasard
+            if not filled.all():
+                centroids[~filled] = unit_vectors[rng.choice(n, int((~filled).sum()), replace=False)]
+
+        assignment = cls._assign(unit_vectors, centroids)
+        order = np.argsort(assignment, kind='stable')
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=list_offsets[1:])
+        return cls(centroids.astype(np.float32), list_offsets, order.astype(np.int32))
+
+    @staticmethod
+    def _assign(unit_vectors, centroids, block_size=65536):
+        """Affecte chaque vecteur au centroïde le plus proche (par blocs de lignes)."""
+        assignment = np.empty(len(unit_vectors), dtype=np.int64)
+        for start in range(0, len(unit_vectors), block_size):
+            block = unit_vectors[start:start + block_size]
+            assignment[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+        return assignment
+
+    def candidates(self, query, n_probe, exclude=None, min_candidates=0):
+        """
+        Retourne les indices des vecteurs des n_probe listes les plus proches de la requête.
+        Si les listes parcourues contiennent moins de min_candidates vecteurs non exclus,
+        les listes suivantes (par proximité décroissante) sont ajoutées.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if len(query) < self.centroids.shape[1]:
+            # Index par produit scalaire: requête complétée par 0
+            query = np.append(query, np.zeros(self.centroids.shape[1] - len(query), dtype=np.float32))
+        n_probe = max(1, min(n_probe, self.n_lists))
+        lists = np.argsort(-(self.centroids @ query), kind='stable')
+
+        # Nombre de candidats non exclus apportés par chaque liste, dans l'ordre de parcours
+        sizes = np.diff(self.list_offsets)[lists]
+        if exclude is not None and len(exclude):
+            excluded_per_list = np.bincount(self.item_lists[exclude], minlength=self.n_lists)[lists]
+            sizes = sizes - excluded_per_list
+        n_probe = max(n_probe, int(np.searchsorted(np.cumsum(sizes), min_candidates)) + 1)
+        return np.concatenate([
+            self.list_items[self.list_offsets[current]:self.list_offsets[current + 1]]
+            for current in lists[:n_probe]
+        ]).astype(np.int64)
+
+    def search(self, query, vectors, top_n, n_probe, exclude=None):
+        """
+        Recherche les top_n vecteurs de plus grand produit scalaire avec la requête,
+        parmi les candidats des n_probe listes les plus proches (complétées si nécessaire
+        pour disposer d'au moins top_n candidats non exclus).
+
+        Args:
+            query: Vecteur requête (k)
+            vectors: Matrice (n x k) des vecteurs sur lesquels calculer les scores exacts
+                (les vecteurs indexés, normalisés ou non selon le score voulu)
+            top_n: Nombre de résultats
+            n_probe: Nombre de listes parcourues
+            exclude: Indices des vecteurs à exclure
+
+        Returns:
+            Tuple (indices des vecteurs, scores), triés par score décroissant
+        """
+        candidates = self.candidates(query, n_probe, exclude=exclude, min_candidates=top_n)
+        scores = np.asarray(vectors[candidates] @ query, dtype=np.float64)
+        excluded = np.isin(candidates, exclude) if exclude is not None and len(exclude) else None
+        top = top_n_indices(scores, top_n, exclude=excluded)
+        return candidates[top], scores[top]
+
+    def arrays(self, prefix='ann_'):
+        """Tableaux de l'index, pour les sauvegarder avec le modèle."""
+        return {
+            f'{prefix}centroids': self.centroids,
+            f'{prefix}list_offsets': self.list_offsets,
+            f'{prefix}list_items': self.list_items
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix='ann_'):
+        """Reconstruit l'index à partir des tableaux sauvegardés (None s'ils sont absents)."""
+        if f'{prefix}centroids' not in arrays:
+            return None
+        return cls(arrays[f'{prefix}centroids'], arrays[f'{prefix}list_offsets'], arrays[f'{prefix}list_items'])
+
+
+def measure_recall(recommender, user_ids, item_ids, top_n=10, probes=(1, 4, 8, 16, 32)):
+    """
+    Mesure le rappel des recherches approchées d'un modèle SVD indexé par rapport au
+    calcul exact, et la latence moyenne de chaque chemin.
+
+    Args:
+        recommender: CollaborativeFilteringRecommender (méthode svd, construit avec ann_lists)
+        user_ids: IDs des utilisateurs testés (recommend_for_user)
+        item_ids: IDs des items testés (recommend_similar_items)
+        top_n: Longueur des listes comparées
+        probes: Valeurs de ann_probes mesurées
+
+    Returns:
+        Liste de dictionnaires, un par valeur de ann_probes (plus une ligne 'exact')
+    """
+    index, user_index, initial_probes = recommender.ann_index, recommender.ann_user_index, recommender.ann_probes
+
+    def run(user_list, item_list):
+        timings = {}
+        results = {}
+        start = time.perf_counter()
+        results['users'] = [set(recommender.recommend_for_user(user_id, top_n)[recommender.item_id_col])
+                            for user_id in user_list]
+        timings['user_ms'] = 1000 * (time.perf_counter() - start) / max(1, len(user_list))
+        start = time.perf_counter()
+        results['items'] = [set(recommender.recommend_similar_items(item_id, top_n)[recommender.item_id_col])
+                            for item_id in item_list]
+        timings['item_ms'] = 1000 * (time.perf_counter() - start) / max(1, len(item_list))
+        return results, timings
+
+    try:
+        # Référence: calcul exact (index désactivé)
+        recommender.ann_index, recommender.ann_user_index = None, None
+        exact, timings = run(user_ids, item_ids)
+        report = [{'probes': 'exact', 'user_recall': 1.0, 'item_recall': 1.0, **timings}]
+
+        recommender.ann_index, recommender.ann_user_index = index, user_index
+        for n_probe in probes:
+            recommender.ann_probes = n_probe
+            approximate, timings = run(user_ids, item_ids)
+            recall = {
+                f'{kind[:-1]}_recall': float(np.mean([
+                    len(found & expected) / max(1, len(expected))
+                    for found, expected in zip(approximate[kind], exact[kind])
+                ])) if exact[kind] else None
+                for kind in ('users', 'items')
+            }
+            report.append({'probes': n_probe, **recall, **timings})
+    finally:
+        recommender.ann_index, recommender.ann_user_index = index, user_index
+        recommender.ann_probes = initial_probes
+    return report
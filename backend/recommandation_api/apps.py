@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RecommandationApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recommandation_api'
+
+    def ready(self):
+        # Enregistre les signaux (invalidation du cache de recommandations)
+        from . import signals
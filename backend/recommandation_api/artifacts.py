@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+MANIFEST_FILE = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+class IdMapping:
+    """
+    Correspondance compacte ID -> indice, construite sur le tableau des IDs
+    (indice -> ID) et sur son ordre de tri, sans dictionnaire Python.
+    S'utilise comme un dictionnaire en lecture: `id in mapping`, `mapping[id]`, `mapping.get(id)`.
+    """
+
+    def __init__(self, ids, order=None, sorted_ids=None):
+        """
+        Args:
+            ids: Tableau numpy des IDs, dans l'ordre des indices de la matrice
+            order: Permutation triant les IDs (calculée si None)
+            sorted_ids: IDs triés, ids[order] (calculés si None); passer le tableau
+                sauvegardé dans l'artefact évite une copie privée dans chaque processus
+        """
+        self.ids = ids
+        self.order = np.argsort(ids, kind='stable') if order is None else order
+        self.sorted_ids = ids[self.order] if sorted_ids is None else sorted_ids
+
+    def get(self, key, default=None):
+        try:
+            position = np.searchsorted(self.sorted_ids, key)
+        except TypeError:
+            return default
+        if position < len(self.sorted_ids) and self.sorted_ids[position] == key:
+            return int(self.order[position])
+        return default
+
+    def get_indexer(self, keys):
+        """Retourne les indices d'un tableau d'IDs en une passe (-1 pour les IDs inconnus)."""
+        keys = np.asarray(keys)
+        if len(self.sorted_ids) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.sorted_ids, keys), len(self.sorted_ids) - 1)
+        return np.where(self.sorted_ids[positions] == keys, self.order[positions], -1).astype(np.int64)
+
+    def __getitem__(self, key):
+        idx = self.get(key)
+        if idx is None:
+            raise KeyError(key)
+        return idx
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def items(self):
+        return zip(self.ids.tolist(), range(len(self.ids)))
+
+
+def _as_storable(array):
+    """Convertit un tableau d'objets (IDs texte) en tableau unicode sauvegardable sans pickle."""
+    array = np.asarray(array)
+    if array.dtype == object:
+        array = array.astype(str)
+    return array
+
+
+def save_artifact(directory, arrays, metadata=None):
+    """
+    Sauvegarde un modèle sous forme de répertoire: un fichier .npy par tableau
+    (les matrices creuses sont éclatées en data/indices/indptr) et un manifeste JSON.
+    L'écriture se fait dans un répertoire temporaire remplacé ensuite en une fois,
+    de sorte qu'un autre processus ne lise jamais un artefact incomplet.
+
+    Args:
+        directory: Répertoire de l'artefact
+        arrays: Dictionnaire {nom: tableau numpy, matrice creuse ou None}
+        metadata: Dictionnaire sérialisable en JSON (paramètres du modèle, ...)
+    """
+    directory = os.path.normpath(directory)
+    tmp_directory = f'{directory}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+
+    manifest = {'format_version': FORMAT_VERSION, 'arrays': {}, 'metadata': metadata or {}}
+    for name, value in arrays.items():
+        if value is None:
+            continue
+        if sp.issparse(value):
+            value = value.tocsr()
+            for part in ('data', 'indices', 'indptr'):
+                np.save(os.path.join(tmp_directory, f'{name}.{part}.npy'), getattr(value, part))
+            manifest['arrays'][name] = {'kind': 'csr', 'shape': list(value.shape)}
+        else:
+            value = _as_storable(value)
+            np.save(os.path.join(tmp_directory, f'{name}.npy'), value)
+            manifest['arrays'][name] = {'kind': 'dense', 'shape': list(value.shape), 'dtype': str(value.dtype)}
+
+    with open(os.path.join(tmp_directory, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Remplacer l'ancien artefact par le nouveau
+    old_directory = f'{directory}.old-{os.getpid()}'
+    if os.path.exists(directory):
+        os.replace(directory, old_directory)
+    os.replace(tmp_directory, directory)
+    shutil.rmtree(old_directory, ignore_errors=True)
+
+
+def load_artifact(directory, mmap_mode='r'):
+    """
+    Charge un artefact sauvegardé par save_artifact. Les tableaux sont projetés
+    en mémoire (mmap) par défaut: les processus qui chargent le même artefact
+    partagent le cache de pages du système au lieu d'en garder chacun une copie.
+
+    Args:
+        directory: Répertoire de l'artefact
+        mmap_mode: Mode de projection de np.load (None pour tout charger en mémoire)
+
+    Returns:
+        Tuple (dictionnaire {nom: tableau ou matrice CSR}, métadonnées)
+    """
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Version d'artefact non supportée: {manifest.get('format_version')}")
+
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        if entry['kind'] == 'csr':
+            data, indices, indptr = (
+                np.load(os.path.join(directory, f'{name}.{part}.npy'), mmap_mode=mmap_mode)
+                for part in ('data', 'indices', 'indptr')
+            )
+            arrays[name] = sp.csr_matrix((data, indices, indptr), shape=tuple(entry['shape']), copy=False)
+        else:
+            arrays[name] = np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+    return arrays, manifest['metadata']
+
+
+def _encode_strings(values):
+    """Encode une liste de chaînes en un tableau d'octets UTF-8 et un tableau de positions."""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _decode_strings(data, offsets):
+    """Décode les chaînes encodées par _encode_strings."""
+    raw = np.asarray(data).tobytes()
+    return [raw[start:end].decode('utf-8') for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def save_frame(directory, frame, metadata=None):
+    """
+    Sauvegarde un DataFrame au format colonne: un tableau .npy par colonne numérique,
+    et pour les colonnes catégorielles ou texte, les codes entiers et les valeurs
+    distinctes (encodées en UTF-8). Les types des colonnes sont conservés; les valeurs
+    d'une colonne de type object sont relues sous forme de texte.
+
+    Args:
+        directory: Répertoire de l'artefact
+        frame: DataFrame à sauvegarder (l'index n'est pas conservé)
+        metadata: Dictionnaire sérialisable en JSON
+    """
+    arrays = {}
+    columns = []
+    for position, name in enumerate(frame.columns):
+        column = frame[name]
+        key = f'column{position}'
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            kind = 'category'
+            codes, values = column.cat.codes.to_numpy(), column.cat.categories
+        elif pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column):
+            kind = 'text'
+            codes, values = pd.factorize(column)
+        else:
+            kind = 'numeric'
+            arrays[key] = column.to_numpy()
+        if kind != 'numeric':
+            arrays[f'{key}.codes'] = codes.astype(np.int32)
+            arrays[f'{key}.values'], arrays[f'{key}.offsets'] = _encode_strings([str(value) for value in values])
+        columns.append({'name': name, 'kind': kind, 'dtype': str(column.dtype)})
+    save_artifact(directory, arrays, metadata={'columns': columns, **(metadata or {})})
+
+
+def load_frame(directory):
+    """
+    Charge un DataFrame sauvegardé par save_frame.
+
+    Returns:
+        Tuple (DataFrame, métadonnées)
+    """
+    arrays, metadata = load_artifact(directory, mmap_mode=None)
+    data = {}
+    for position, column in enumerate(metadata.pop('columns')):
+        key = f'column{position}'
+        if column['kind'] == 'numeric':
+            data[column['name']] = arrays[key]
+            continue
+        codes = arrays[f'{key}.codes']
+        values = _decode_strings(arrays[f'{key}.values'], arrays[f'{key}.offsets'])
+        if column['kind'] == 'category':
+            data[column['name']] = pd.Categorical.from_codes(codes, categories=values)
+        else:
+            # Les valeurs manquantes ont le code -1
+            values = np.array(values + [np.nan], dtype=object)
+            data[column['name']] = pd.Series(values[codes]).astype(column['dtype'])
+    return pd.DataFrame(data), metadata
+
+
+def load_metadata(directory):
+    """Lit uniquement les métadonnées d'un artefact (sans charger ses tableaux)."""
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        metadata = json.load(f)['metadata']
+    metadata.pop('columns', None)
+    return metadata
+
+
+def artifact_exists(directory):
+    """Indique si un artefact complet existe dans le répertoire."""
+    return os.path.exists(os.path.join(directory, MANIFEST_FILE))
+
+
+def fingerprint(data, params):
+    """
+    Calcule l'empreinte d'un modèle à partir de ses données d'entrée et de tous
+    ses paramètres d'entraînement. Deux modèles de même empreinte sont interchangeables.
+
+    Args:
+        data: Liste de DataFrames, Series ou tableaux numpy utilisés pour l'entraînement
+        params: Dictionnaire des paramètres d'entraînement (sérialisable en JSON)
+
+    Returns:
+        Chaîne hexadécimale de 16 caractères
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps({'format_version': FORMAT_VERSION, **params}, sort_keys=True, default=str).encode())
+    for value in data:
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            columns = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+            digest.update(json.dumps(columns, default=str).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+        else:
+            digest.update(np.ascontiguousarray(value).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def touch_artifact(directory):
+    """Marque un artefact comme récemment utilisé (pour l'éviction LRU)."""
+    try:
+        os.utime(os.path.join(directory, MANIFEST_FILE))
+    except OSError:
+        pass
+
+
+def _directory_size(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+def evict_artifacts(cache_dir, max_bytes, keep=None):
+    """
+    Supprime les artefacts les moins récemment utilisés d'un répertoire de cache
+    jusqu'à ce que la taille totale repasse sous max_bytes.
+
+    Args:
+        cache_dir: Répertoire contenant les artefacts
+        max_bytes: Budget disque en octets (aucune éviction si None)
+        keep: Répertoire d'artefact à ne jamais supprimer (celui qui vient d'être écrit)
+
+    Returns:
+        Liste des répertoires supprimés
+    """
+    if max_bytes is None or not os.path.isdir(cache_dir):
+        return []
+
+    artifacts = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_dir() and artifact_exists(entry.path):
+            last_used = os.path.getmtime(os.path.join(entry.path, MANIFEST_FILE))
+            artifacts.append((last_used, entry.path, _directory_size(entry.path)))
+
+    total = sum(size for _, _, size in artifacts)
+    removed = []
+    for _, path, size in sorted(artifacts):
+        if total <= max_bytes:
+            break
+        if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed.append(path)
+    return removed
@@ -0,0 +1,286 @@
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy
+import sklearn
+
+from .ann import measure_recall
+from .collaborative import CollaborativeFilteringRecommender
+from .content_based import ContentBasedRecommender
+from .hybrid import HybridRecommender
+
+# Datasets de benchmark: le dataset movies fourni et un dataset synthétique
+# de la taille de books (goodbooks-10k: ~53 000 lecteurs, 10 000 livres, ~6 millions de notes)
+BENCHMARK_DATASETS = ('movies', 'synthetic_books')
+BOOKS_SIZE = {'n_users': 53_424, 'n_items': 10_000, 'n_ratings': 5_976_479}
+
+# Paramètres des recommandeurs, repris de services.build_hybrid_recommender
+CONTENT_WEIGHTS = [0.4, 0.3, 0.3]
+
+
+def synthetic_books(scale=1.0, seed=0):
+    """
+    Génère un dataset de livres synthétique reproductible, de la taille de books à
+    l'échelle 1: popularité des livres et activité des lecteurs en loi de puissance,
+    notes de 1 à 5, descriptions tirées d'un vocabulaire selon une loi de Zipf.
+
+    Args:
+        scale: Facteur appliqué au nombre de lecteurs, de livres et de notes
+        seed: Graine du générateur
+
+    Returns:
+        Tuple (DataFrame des livres, DataFrame des notes), aux colonnes du dataset books
+    """
+    rng = np.random.default_rng(seed)
+    n_users = max(2, int(BOOKS_SIZE['n_users'] * scale))
+    n_items = max(2, int(BOOKS_SIZE['n_items'] * scale))
+    n_ratings = max(1, int(BOOKS_SIZE['n_ratings'] * scale))
+
+    item_popularity = rng.permutation(1 / np.arange(1, n_items + 1) ** 0.8)
+    user_activity = rng.permutation(1 / np.arange(1, n_users + 1) ** 0.5)
+    ratings_df = pd.DataFrame({
+        'user_id': (rng.choice(n_users, n_ratings, p=user_activity / user_activity.sum()) + 1).astype(np.int32),
+        'item_id': (rng.choice(n_items, n_ratings, p=item_popularity / item_popularity.sum()) + 1).astype(np.int32),
+        'rating': np.clip(np.rint(rng.normal(3.9, 1.0, n_ratings)), 1, 5).astype(np.float32)
+    })
+    ratings_df = ratings_df.drop_duplicates(['user_id', 'item_id'], keep='last', ignore_index=True)
+
+    vocabulary = np.array([f'word{i}' for i in range(5000)])
+    word_frequencies = 1 / np.arange(1, len(vocabulary) + 1)
+    word_frequencies /= word_frequencies.sum()
+    genres = np.array([f'genre{i}' for i in range(40)])
+
+    def texts(n_words):
+        words = vocabulary[rng.choice(len(vocabulary), (n_items, n_words), p=word_frequencies)]
+        return [' '.join(row) for row in words]
+
+    content_df = pd.DataFrame({
+        'item_id': np.arange(1, n_items + 1, dtype=np.int32),
+        'title': texts(4),
+        'authors': [f'author{i}' for i in rng.integers(0, max(1, n_items // 3), n_items)],
+        'genres': [' '.join(row) for row in genres[rng.integers(0, len(genres), (n_items, 3))]],
+        'description': texts(40)
+    })
+    return content_df, ratings_df
+
+
+def benchmark_cases(dataset):
+    """
+    Configurations mesurées pour un dataset: chaque méthode collaborative, le système
+    de contenu (matrice TF-IDF et similarité dense) et l'hybride des vues.
+    Sur books, les similarités entre utilisateurs sont limitées aux k plus proches
+    voisins (la matrice dense ne tiendrait pas en mémoire).
+    """
+    user_top_k = None if dataset == 'movies' else 50
+    return [
+        {'name': 'collaborative_svd', 'engine': 'collaborative', 'params': {'method': 'svd', 'n_factors': 50}},
+        {'name': 'collaborative_svd_ann', 'engine': 'collaborative',
+         'params': {'method': 'svd', 'n_factors': 50, 'ann_lists': 64}},
+        {'name': 'collaborative_item_based', 'engine': 'collaborative', 'params': {'method': 'item_based'}},
+        {'name': 'collaborative_user_based', 'engine': 'collaborative',
+         'params': {'method': 'user_based', 'similarity_top_k': user_top_k}},
+        {'name': 'content_sparse', 'engine': 'content', 'params': {'similarity_mode': 'sparse'}},
+        {'name': 'content_dense', 'engine': 'content', 'params': {'similarity_mode': 'dense'}},
+        {'name': 'hybrid', 'engine': 'hybrid', 'params': {'method': 'item_based', 'similarity_mode': 'sparse'}},
+    ]
+
+
+def _load_dataset(dataset, scale, seed, dataset_path):
+    """Charge un dataset de benchmark (IDs des items du contenu sous 'item_id')."""
+    if dataset == 'synthetic_books':
+        content_df, ratings_df = synthetic_books(scale, seed)
+        return content_df, ratings_df, 'books'
+
+    from . import services
+    if dataset_path:
+        services.dataset_path = dataset_path
+    content_df, ratings_df = services.load_datasets(dataset)
+    return content_df, ratings_df, dataset
+
+
+def _build(case, content_df, ratings_df, dataset_type, dtype, cache_dir=None):
+    """Construit (entraîne ou charge depuis le cache) le recommandeur d'une configuration."""
+    from .services import content_columns
+    params = dict(case['params'])
+    collaborative = content = None
+    if case['engine'] in ('collaborative', 'hybrid'):
+        collaborative = CollaborativeFilteringRecommender(
+            ratings_df, method=params.pop('method'), n_factors=params.pop('n_factors', 50),
+            dtype=dtype, cache_dir=cache_dir and os.path.join(cache_dir, 'collaborative'), **{
+                key: value for key, value in params.items() if key in ('similarity_top_k', 'ann_lists')})
+    if case['engine'] in ('content', 'hybrid'):
+        content = ContentBasedRecommender(
+            content_df.copy(), text_columns=content_columns[dataset_type]['text_columns'],
+            weights=CONTENT_WEIGHTS, similarity_mode=params['similarity_mode'],
+            filter_columns=content_columns[dataset_type]['filter_columns'],
+            list_columns=content_columns[dataset_type]['list_columns'],
+            dtype=dtype, cache_dir=cache_dir and os.path.join(cache_dir, 'content'))
+    if case['engine'] == 'hybrid':
+        return HybridRecommender(content, collaborative, weight_content=0.3, weight_collaborative=0.7)
+    return collaborative or content
+
+
+def _evict_page_cache(directory):
+    """
+    Retire les fichiers d'un répertoire du cache de pages du système (au mieux,
+    sans droits administrateur), pour mesurer un chargement à froid.
+
+    Returns:
+        True si l'éviction a pu être demandée
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for root, _, files in os.walk(directory):
+        for name in files:
+            fd = os.open(os.path.join(root, name), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return True
+
+
+def _peak_rss_mb():
+    """Pic de mémoire résidente du processus courant, en Mo."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: kilo-octets, macOS: octets
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _latency(function, arguments, warmup=5):
+    """
+    Mesure la latence d'un appel pour chaque argument (après quelques appels de chauffe).
+
+    Returns:
+        Dictionnaire des percentiles p50, p95, p99 et de la moyenne, en millisecondes
+    """
+    for argument in arguments[:warmup]:
+        function(argument)
+    timings = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        timings.append(1000 * (time.perf_counter() - start))
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'mean_ms': float(np.mean(timings)), 'requests': len(timings)}
+
+
+def run_case(dataset, case, scale=1.0, seed=0, requests=200, dtype='float32', dataset_path=None):
+    """
+    Mesure une configuration (à lancer dans un processus neuf pour un pic mémoire propre):
+    temps d'entraînement, chargement à froid puis à chaud depuis le cache d'artefacts,
+    latences des méthodes de recommandation et pic de mémoire résidente.
+
+    Returns:
+        Dictionnaire des mesures
+    """
+    # Processus neuf: initialiser Django avant d'importer services (qui importe les modèles)
+    import django
+    django.setup()
+
+    content_df, ratings_df, dataset_type = _load_dataset(dataset, scale, seed, dataset_path)
+    result = {'dataset': dataset, 'case': case['name'], 'engine': case['engine'], 'params': case['params'],
+              'ratings': int(len(ratings_df)), 'items': int(len(content_df)), 'data_rss_mb': _peak_rss_mb()}
+
+    # Entraînement sans cache
+    start = time.perf_counter()
+    recommender = _build(case, content_df, ratings_df, dataset_type, dtype)
+    result['fit_s'] = time.perf_counter() - start
+    del recommender
+
+    # Cache d'artefacts: sauvegarde, chargement à froid (fichiers retirés du cache de pages) puis à chaud
+    cache_dir = tempfile.mkdtemp(prefix='benchmark-')
+    try:
+        start = time.perf_counter()
+        _build(case, content_df, ratings_df, dataset_type, dtype, cache_dir)
+        result['fit_and_save_s'] = time.perf_counter() - start
+        result['page_cache_evicted'] = _evict_page_cache(cache_dir)
+        start = time.perf_counter()
+        _build(case, content_df, ratings_df, dataset_type, dtype, cache_dir)
+        result['cold_load_s'] = time.perf_counter() - start
+        start = time.perf_counter()
+        recommender = _build(case, content_df, ratings_df, dataset_type, dtype, cache_dir)
+        result['warm_load_s'] = time.perf_counter() - start
+
+        # Latences sur des utilisateurs et des items tirés au hasard (reproductible)
+        rng = np.random.default_rng(seed)
+        user_ids = rng.choice(ratings_df['user_id'].unique(), requests).tolist()
+        item_ids = rng.choice(content_df['item_id'].unique(), requests).tolist()
+        latency = {}
+        if case['engine'] == 'content':
+            latency['recommend'] = _latency(lambda item_id: recommender.recommend(item_id, top_n=10), item_ids)
+        else:
+            collaborative = recommender if case['engine'] == 'collaborative' else recommender.collaborative_recommender
+            known_users = [user_id for user_id in user_ids if collaborative.user_index(user_id) is not None]
+            latency['recommend_for_user'] = _latency(
+                lambda user_id: recommender.recommend_for_user(user_id, top_n=10), known_users)
+            if case['engine'] == 'hybrid' or case['params']['method'] != 'user_based':
+                known_items = [item_id for item_id in item_ids if item_id in collaborative.item_mapping]
+                latency['recommend_similar_items'] = _latency(
+                    lambda item_id: recommender.recommend_similar_items(item_id, top_n=10), known_items)
+            if case['params'].get('ann_lists'):
+                result['ann_recall'] = measure_recall(collaborative, known_users[:100], known_items[:100],
+                                                      probes=(1, 4, 8, 16, 32))
+        result['latency'] = latency
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def environment():
+    """Description de l'environnement de mesure, enregistrée avec les résultats."""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'scikit-learn': sklearn.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def run_benchmarks(datasets=BENCHMARK_DATASETS, cases=None, scale=1.0, seed=0, requests=200, dtype='float32',
+                   dataset_path=None):
+    """
+    Lance toutes les configurations demandées, chacune dans un processus neuf
+    (démarrage 'spawn'), de sorte que le pic mémoire mesuré soit celui de la configuration.
+
+    Args:
+        datasets: Datasets mesurés (voir BENCHMARK_DATASETS)
+        cases: Noms des configurations mesurées (toutes si None, voir benchmark_cases)
+        scale: Échelle du dataset synthétique
+        seed: Graine du dataset synthétique et des tirages de requêtes
+        requests: Nombre de requêtes par mesure de latence
+        dtype: Précision des modèles
+        dataset_path: Répertoire des datasets (celui de services si None)
+
+    Returns:
+        Rapport sérialisable en JSON (environnement, paramètres et mesures)
+    """
+    results = []
+    for dataset in datasets:
+        for case in benchmark_cases(dataset):
+            if cases and case['name'] not in cases:
+                continue
+            print(f"Benchmark {dataset} / {case['name']}...")
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                results.append(pool.submit(run_case, dataset, case, scale, seed, requests, dtype,
+                                           dataset_path).result())
+    return {
+        'environment': environment(),
+        'parameters': {'scale': scale, 'seed': seed, 'requests': requests, 'dtype': dtype},
+        'results': results
+    }
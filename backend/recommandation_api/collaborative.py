@@ -2,9 +2,21 @@
 import numpy as np
 import pandas as pd
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+from sklearn.utils.extmath import randomized_svd
+import scipy.sparse as sp
 from scipy.sparse.linalg import svds
 import os
-import pickle
+import threading
+import time
+
+from . import metrics
+from .ann import IVFIndex
+from .artifacts import (IdMapping, artifact_exists, evict_artifacts, fingerprint,
+                        load_artifact, save_artifact, touch_artifact)
+from .ranking import top_n_indices
+from .similarity import (compute_dtype, full_precision, is_sparse_similarity, load_similarity,
+                         similarity_arrays, store_similarity, top_k_similarity, top_k_similarity_rows)
 
 
 class CollaborativeFilteringRecommender:
@@ -18,7 +30,9 @@ class CollaborativeFilteringRecommender:
     """
     
     def __init__(self, ratings_df, user_id_col='user_id', item_id_col='item_id', 
-                 rating_col='rating', method='svd', n_factors=50, cache_dir=None):
+                 rating_col='rating', method='svd', n_factors=50, n_neighbors=None,
+                 similarity_top_k=None, svd_solver='arpack', ann_lists=None, ann_probes=8,
+                 dtype='float32', cache_dir=None, cache_size_limit=None):
         """
         Initialise le système de recommandation par filtrage collaboratif.
         
@@ -29,7 +43,24 @@ class CollaborativeFilteringRecommender:
             rating_col: Nom de la colonne contenant la note
             method: Méthode de recommandation ('svd', 'user_based', ou 'item_based')
             n_factors: Nombre de facteurs latents pour SVD
+            n_neighbors: Nombre maximal de voisins les plus similaires utilisés par la
+                méthode user_based (tous les voisins de similarité positive si None)
+            similarity_top_k: Si défini, les matrices de similarité (user_based, item_based)
+                ne conservent que les k voisins positifs de chaque ligne, stockés en CSR
+                float32 au lieu d'une matrice dense complète
+            svd_solver: Algorithme de SVD tronquée, appliqué directement à la matrice creuse:
+                'arpack' (scipy svds, exact) ou 'randomized' (SVD randomisée, plus rapide)
+            ann_lists: Si défini (méthode svd), nombre de listes de l'index approché (IVF)
+                construit sur les facteurs des items et utilisé par recommend_for_user et
+                recommend_similar_items au lieu d'un parcours de tout le catalogue
+            ann_probes: Nombre de listes parcourues par recherche approchée
+                (plus élevé: meilleur rappel, latence plus grande)
+            dtype: Précision des matrices du modèle: 'float32' (par défaut) ou 'float64';
+                'float16' ou 'int8' (quantifié, un facteur d'échelle par ligne) réduisent
+                en plus le stockage des matrices de similarité
             cache_dir: Répertoire pour mettre en cache les modèles
+            cache_size_limit: Budget disque du cache en octets; au-delà, les modèles
+                les moins récemment utilisés sont supprimés (illimité si None)
         """
         self.ratings_df = ratings_df
         self.user_id_col = user_id_col
@@ -37,9 +68,17 @@ class CollaborativeFilteringRecommender:
         self.rating_col = rating_col
         self.method = method
         self.n_factors = n_factors
+        self.n_neighbors = n_neighbors
+        self.similarity_top_k = similarity_top_k
+        self.svd_solver = svd_solver
+        self.ann_lists = ann_lists
+        self.ann_probes = ann_probes
+        self.dtype = dtype
         self.cache_dir = cache_dir
+        self.cache_size_limit = cache_size_limit
         
         # Vérification de la validité des données
+        self._compute_dtype = compute_dtype(dtype)
         required_cols = [user_id_col, item_id_col, rating_col]
         for col in required_cols:
             if col not in self.ratings_df.columns:
@@ -52,116 +91,223 @@ class CollaborativeFilteringRecommender:
         self.item_similarity = None
         self.user_factors = None
         self.item_factors = None
+        self.sigma = None
+        self.ann_index = None
+        self.ann_user_index = None
         self.user_mapping = None
         self.item_mapping = None
+        self.user_ids = None
+        self.item_ids = None
         self.mean_ratings = None
         
+        # Couche delta: notes reçues depuis l'entraînement du modèle de base, fusionnées
+        # avec la matrice de base au moment du calcul des scores
+        self.delta_ratings = {}       # {(user_id, item_id): note}, y compris les items inconnus
+        self.delta_rows = {}          # {indice utilisateur: {indice item: note}}, items connus
+        self.delta_user_ids = []      # utilisateurs absents du modèle de base
+        self.delta_user_index = {}    # {user_id: indice}, indices à partir du nombre d'utilisateurs de base
+        self.dirty_items = set()      # items dont la similarité doit être recalculée
+        self._delta_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Lignes recalculées d'une matrice dense de similarité entre items, lues par-dessus
+        # la matrice de base (projetée en mémoire, jamais copiée): tuple (indices triés
+        # des items, matrice len(indices) x n_items), remplacé en une affectation
+        self._similarity_overlay = None
+        self._item_sq_norms = None
+        
         # Initialiser le modèle
         self._fit()
     
     def _create_matrix(self):
         """
-        Crée la matrice d'évaluation utilisateur-item à partir du DataFrame.
+        Crée la matrice d'évaluation utilisateur-item (creuse, format CSR) à partir du DataFrame.
         """
-        # Créer un mapping des IDs aux indices de matrice
-        unique_users = self.ratings_df[self.user_id_col].unique()
-        unique_items = self.ratings_df[self.item_id_col].unique()
-        
-        self.user_mapping = {user_id: i for i, user_id in enumerate(unique_users)}
-        self.item_mapping = {item_id: i for i, item_id in enumerate(unique_items)}
-        
-        # Créer une matrice éparse utilisateur-item
-        self.user_item_matrix = np.zeros((len(unique_users), len(unique_items)))
-        
-        for _, row in self.ratings_df.iterrows():
-            user_idx = self.user_mapping.get(row[self.user_id_col])
-            item_idx = self.item_mapping.get(row[self.item_id_col])
-            
-            if user_idx is not None and item_idx is not None:
-                self.user_item_matrix[user_idx, item_idx] = row[self.rating_col]
-        
+        # Encoder les IDs en indices de matrice (ordre d'apparition, comme unique())
+        user_codes, unique_users = pd.factorize(self.ratings_df[self.user_id_col])
+        item_codes, unique_items = pd.factorize(self.ratings_df[self.item_id_col])
+        ratings = self.ratings_df[self.rating_col].to_numpy(dtype=self._compute_dtype)
+        n_users, n_items = len(unique_users), len(unique_items)
+
+        # Correspondance indice -> ID (tableaux numpy) et ID -> indice
+        self.user_ids = np.asarray(unique_users)
+        self.item_ids = np.asarray(unique_items)
+        self.user_mapping = IdMapping(self.user_ids)
+        self.item_mapping = IdMapping(self.item_ids)
+
+        # En cas de doublons (utilisateur, item), garder la dernière note
+        keys = user_codes.astype(np.int64) * n_items + item_codes
+        _, last_positions = np.unique(keys[::-1], return_index=True)
+        keep = len(keys) - 1 - last_positions
+
+        # Créer la matrice éparse utilisateur-item en une seule passe
+        self.user_item_matrix = sp.csr_matrix(
+            (ratings[keep], (user_codes[keep], item_codes[keep])),
+            shape=(n_users, n_items)
+        )
+        self.user_item_matrix.eliminate_zeros()
+
         # Créer la matrice transposée item-utilisateur
-        self.item_user_matrix = self.user_item_matrix.T
-        
+        self.item_user_matrix = self.user_item_matrix.T.tocsr()
+
         # Calculer la moyenne des évaluations par utilisateur
         self.mean_ratings = np.true_divide(
-            self.user_item_matrix.sum(1),
-            np.maximum(1, (self.user_item_matrix != 0).sum(1))
-        )
+            np.asarray(self.user_item_matrix.sum(1)).ravel(),
+            np.maximum(1, self.user_item_matrix.getnnz(axis=1))
+        ).astype(self._compute_dtype)
     
     def _fit_svd(self):
         """
         Entraîne un modèle de recommandation par factorisation de matrice (SVD).
         """
         # Normaliser la matrice: soustraire la moyenne de chaque utilisateur
+        # (uniquement sur les notes présentes, la structure creuse est conservée)
         normalized_matrix = self.user_item_matrix.copy()
-        for i, mean in enumerate(self.mean_ratings):
-            mask = normalized_matrix[i, :] != 0
-            normalized_matrix[i, mask] -= mean
-        
-        # Décomposition SVD
-        U, sigma, Vt = svds(normalized_matrix, k=min(self.n_factors, min(normalized_matrix.shape) - 1))
-        
-        # Convertir sigma en matrice diagonale
-        sigma_diag = np.diag(sigma)
-        
-        # Stocker les matrices de facteurs
-        self.user_factors = U
-        self.item_factors = Vt.T
+        normalized_matrix.data -= np.repeat(self.mean_ratings, np.diff(normalized_matrix.indptr))
         
-        # Stocker la matrice diagonale de valeurs singulières
-        self.sigma = sigma_diag
+        # Décomposition SVD tronquée de la matrice creuse (jamais densifiée)
+        n_factors = min(self.n_factors, min(normalized_matrix.shape) - 1)
+        if self.svd_solver == 'arpack':
+            U, sigma, Vt = svds(normalized_matrix, k=n_factors)
+        elif self.svd_solver == 'randomized':
+            U, sigma, Vt = randomized_svd(normalized_matrix, n_components=n_factors, random_state=0)
+        else:
+            raise ValueError(f"Solveur SVD '{self.svd_solver}' non reconnu")
         
-        # Reconstruire la matrice de prédiction
-        self.prediction_matrix = U.dot(sigma_diag).dot(Vt)
+        # Seuls les facteurs sont conservés: les scores sont calculés à la demande,
+        # sans matrice de prédiction utilisateurs x items
+        self.user_factors = U.astype(self._compute_dtype)
+        self.sigma = sigma.astype(self._compute_dtype)
+        self.item_factors = Vt.T.astype(self._compute_dtype)
         
-        # Ajouter les moyennes des utilisateurs
-        for i, mean in enumerate(self.mean_ratings):
-            self.prediction_matrix[i, :] += mean
+        # Index approchés des facteurs des items: par cosinus (items similaires)
+        # et par produit scalaire (recommandations utilisateur)
+        if self.ann_lists:
+            self.ann_index = IVFIndex.build(self.item_factors, self.ann_lists)
+            self.ann_user_index = IVFIndex.build(self.item_factors, self.ann_lists, inner_product=True)
     
     def _fit_user_based(self):
         """
         Entraîne un modèle de recommandation par filtrage collaboratif basé sur les utilisateurs.
         """
+        if self.similarity_top_k is not None:
+            # Ne conserver que les k plus proches voisins de chaque utilisateur (CSR)
+            self.user_similarity = store_similarity(
+                top_k_similarity(normalize(self.user_item_matrix), self.similarity_top_k), self.dtype)
+            return
+        
         # Calculer la similarité entre utilisateurs en utilisant la similarité cosinus
         self.user_similarity = cosine_similarity(self.user_item_matrix)
         
         # Pour chaque utilisateur, nous conservons uniquement les valeurs positives
         # et nous mettons à zéro la similarité de l'utilisateur avec lui-même
-        for i in range(self.user_similarity.shape[0]):
-            self.user_similarity[i, i] = 0
-            self.user_similarity[i][self.user_similarity[i] < 0] = 0
+        np.fill_diagonal(self.user_similarity, 0)
+        np.maximum(self.user_similarity, 0, out=self.user_similarity)
+        self.user_similarity = store_similarity(self.user_similarity, self.dtype)
     
     def _fit_item_based(self):
         """
         Entraîne un modèle de recommandation par filtrage collaboratif basé sur les items.
         """
+        if self.similarity_top_k is not None:
+            # Ne conserver que les k plus proches voisins de chaque item (CSR)
+            self.item_similarity = store_similarity(
+                top_k_similarity(normalize(self.item_user_matrix), self.similarity_top_k), self.dtype)
+            return
+        
         # Calculer la similarité entre items en utilisant la similarité cosinus
         self.item_similarity = cosine_similarity(self.item_user_matrix)
         
         # Pour chaque item, nous conservons uniquement les valeurs positives
         # et nous mettons à zéro la similarité de l'item avec lui-même
-        for i in range(self.item_similarity.shape[0]):
-            self.item_similarity[i, i] = 0
-            self.item_similarity[i][self.item_similarity[i] < 0] = 0
+        np.fill_diagonal(self.item_similarity, 0)
+        np.maximum(self.item_similarity, 0, out=self.item_similarity)
+        self.item_similarity = store_similarity(self.item_similarity, self.dtype)
+    
+    def _model_arrays(self):
+        """
+        Retourne les tableaux qui constituent le modèle entraîné.
+        """
+        model_data = {
+            'user_item_matrix': self.user_item_matrix,
+            'item_user_matrix': self.item_user_matrix,
+            'user_ids': self.user_ids,
+            'item_ids': self.item_ids,
+            'user_ids_order': self.user_mapping.order,
+            'item_ids_order': self.item_mapping.order,
+            'user_ids_sorted': self.user_mapping.sorted_ids,
+            'item_ids_sorted': self.item_mapping.sorted_ids,
+            'mean_ratings': self.mean_ratings
+        }
+        
+        if self.method == 'svd':
+            model_data.update({
+                'user_factors': self.user_factors,
+                'item_factors': self.item_factors,
+                'sigma': self.sigma
+            })
+            if self.ann_index is not None:
+                model_data.update(self.ann_index.arrays())
+                model_data.update(self.ann_user_index.arrays(prefix='ann_user_'))
+        elif self.method == 'user_based':
+            model_data.update(similarity_arrays('user_similarity', self.user_similarity))
+        elif self.method == 'item_based':
+            model_data.update(similarity_arrays('item_similarity', self.item_similarity))
+        return model_data
+    
+    def _cache_key(self):
+        """
+        Empreinte des notes et de tous les paramètres d'entraînement: un changement
+        de données ou de paramètres donne un nouveau modèle au lieu d'un cache périmé.
+        """
+        columns = [self.user_id_col, self.item_id_col, self.rating_col]
+        params = {
+            'engine': 'collaborative',
+            'columns': columns,
+            'method': self.method,
+            'n_factors': self.n_factors,
+            'similarity_top_k': self.similarity_top_k,
+            'svd_solver': self.svd_solver,
+            'ann_lists': self.ann_lists,
+            'dtype': self.dtype
+        }
+        return fingerprint([self.ratings_df[columns]], params)
+    
+    def _load_model(self, model_dir):
+        """
+        Charge le modèle depuis un artefact (tableaux projetés en mémoire, partagés
+        entre les processus).
+        """
+        arrays, _ = load_artifact(model_dir)
+        for key, value in arrays.items():
+            if not key.endswith(('_order', '_sorted', '_scales')) and not key.startswith('ann_'):
+                setattr(self, key, value)
+        for name in ('user_similarity', 'item_similarity'):
+            if name in arrays:
+                setattr(self, name, load_similarity(arrays, name))
+        self.ann_index = IVFIndex.from_arrays(arrays)
+        self.ann_user_index = IVFIndex.from_arrays(arrays, prefix='ann_user_')
+        self.user_mapping = IdMapping(self.user_ids, arrays['user_ids_order'], arrays.get('user_ids_sorted'))
+        self.item_mapping = IdMapping(self.item_ids, arrays['item_ids_order'], arrays.get('item_ids_sorted'))
     
     def _fit(self):
         """
         Entraîne le modèle de recommandation sélectionné.
         """
+        start = time.perf_counter()
         # Essaie de charger le modèle du cache si disponible
+        model_dir = None
         if self.cache_dir:
-            cache_file = os.path.join(self.cache_dir, f'collaborative_{self.method}_model.pkl')
-            if os.path.exists(cache_file):
-                try:
-                    with open(cache_file, 'rb') as f:
-                        cached_model = pickle.load(f)
-                        for key, value in cached_model.items():
-                            setattr(self, key, value)
-                    print(f"Modèle collaboratif ({self.method}) chargé depuis le cache")
-                    return
-                except Exception as e:
-                    print(f"Erreur lors du chargement du cache: {e}")
+            model_dir = os.path.join(self.cache_dir, f'collaborative_{self.method}-{self._cache_key()}')
+        if model_dir and artifact_exists(model_dir):
+            try:
+                self._load_model(model_dir)
+                touch_artifact(model_dir)
+                metrics.record_cache('collaborative_model', hit=True)
+                metrics.record_model_load('collaborative', 'cache', time.perf_counter() - start)
+                print(f"Modèle collaboratif ({self.method}) chargé depuis le cache")
+                return
+            except Exception as e:
+                print(f"Erreur lors du chargement du cache: {e}")
         
         # Créer la matrice utilisateur-item
         self._create_matrix()
@@ -177,34 +323,409 @@ class CollaborativeFilteringRecommender:
             raise ValueError(f"Méthode de recommandation '{self.method}' non reconnue")
         
         # Sauvegarder le modèle dans le cache si nécessaire
-        if self.cache_dir:
+        if model_dir:
             os.makedirs(self.cache_dir, exist_ok=True)
-            cache_file = os.path.join(self.cache_dir, f'collaborative_{self.method}_model.pkl')
+            save_artifact(model_dir, self._model_arrays(), metadata={'method': self.method, 'dtype': self.dtype})
+            evict_artifacts(self.cache_dir, self.cache_size_limit, keep=model_dir)
+            metrics.record_cache('collaborative_model', hit=False)
+        metrics.record_model_load('collaborative', 'fit', time.perf_counter() - start)
+    
+    def user_index(self, user_id):
+        """
+        Retourne l'indice d'un utilisateur (modèle de base ou couche delta), None s'il est inconnu.
+        """
+        user_idx = self.user_mapping.get(user_id)
+        if user_idx is None:
+            user_idx = self.delta_user_index.get(user_id)
+        return user_idx
+    
+    def add_rating(self, user_id, item_id, rating):
+        """
+        Ajoute (ou remplace) une note dans la couche delta. La note est prise en compte
+        immédiatement dans le profil de l'utilisateur; les similarités entre items
+        concernées sont recalculées par refresh_item_similarity.
+        
+        Args:
+            user_id: ID de l'utilisateur (un utilisateur inconnu est ajouté à la couche delta)
+            item_id: ID de l'item (un item inconnu du modèle n'est intégré qu'à la compaction)
+            rating: Note
+        """
+        with self._delta_lock:
+            self.delta_ratings[(user_id, item_id)] = float(rating)
             
-            # Créer un dictionnaire avec les attributs à sauvegarder
-            model_data = {
-                'user_item_matrix': self.user_item_matrix,
-                'item_user_matrix': self.item_user_matrix,
-                'user_mapping': self.user_mapping,
-                'item_mapping': self.item_mapping,
-                'mean_ratings': self.mean_ratings
-            }
+            user_idx = self.user_index(user_id)
+            if user_idx is None:
+                user_idx = self.user_item_matrix.shape[0] + len(self.delta_user_ids)
+                self.delta_user_ids.append(user_id)
+                self.delta_user_index[user_id] = user_idx
             
-            if self.method == 'svd':
-                model_data.update({
-                    'user_factors': self.user_factors,
-                    'item_factors': self.item_factors,
-                    'sigma': self.sigma,
-                    'prediction_matrix': self.prediction_matrix
-                })
-            elif self.method == 'user_based':
-                model_data['user_similarity'] = self.user_similarity
-            elif self.method == 'item_based':
-                model_data['item_similarity'] = self.item_similarity
+            item_idx = self.item_mapping.get(item_id)
+            if item_idx is not None:
+                # Copie du dictionnaire: les lecteurs concurrents ne voient jamais une ligne à moitié modifiée
+                row = dict(self.delta_rows.get(user_idx, {}))
+                row[item_idx] = float(rating)
+                self.delta_rows[user_idx] = row
+                self.dirty_items.add(item_idx)
+    
+    def remove_rating(self, user_id, item_id):
+        """
+        Retire une note de la couche delta (la note du modèle de base, s'il y en a une, redevient visible).
+        """
+        with self._delta_lock:
+            if self.delta_ratings.pop((user_id, item_id), None) is None:
+                return
+            user_idx = self.user_index(user_id)
+            item_idx = self.item_mapping.get(item_id)
+            if item_idx is not None and item_idx in self.delta_rows.get(user_idx, {}):
+                row = dict(self.delta_rows[user_idx])
+                del row[item_idx]
+                self.delta_rows[user_idx] = row
+                self.dirty_items.add(item_idx)
+    
+    def user_rows(self, user_indices):
+        """
+        Retourne les lignes de notes d'un lot d'utilisateurs, couche delta comprise:
+        une note delta remplace la note de base du même couple (utilisateur, item).
+        Le coût est proportionnel aux lignes demandées, pas à la taille du dataset.
+        
+        Args:
+            user_indices: Tableau des indices des utilisateurs
             
-            with open(cache_file, 'wb') as f:
-                pickle.dump(model_data, f)
+        Returns:
+            Matrice CSR (len(user_indices) x n_items) des notes
+        """
+        user_indices = np.asarray(user_indices, dtype=np.int64)
+        n_base_users, n_items = self.user_item_matrix.shape
+        in_base = user_indices < n_base_users
+        rows = self.user_item_matrix[np.where(in_base, user_indices, 0)]
+        if not in_base.all():
+            # Utilisateurs de la couche delta: aucune note de base
+            rows = sp.csr_matrix(sp.diags(in_base.astype(rows.dtype)) @ rows)
+        
+        delta_rows = self.delta_rows
+        touched = [(row, delta_rows[user_idx]) for row, user_idx in enumerate(user_indices.tolist())
+                   if delta_rows.get(user_idx)]
+        if not touched:
+            return rows
+        
+        row_positions = np.concatenate([np.full(len(entries), row) for row, entries in touched])
+        item_positions = np.concatenate([np.fromiter(entries.keys(), dtype=np.int64) for _, entries in touched])
+        values = np.concatenate([np.fromiter(entries.values(), dtype=rows.dtype) for _, entries in touched])
+        
+        overridden = sp.csr_matrix((np.ones(len(values)), (row_positions, item_positions)), shape=rows.shape)
+        delta = sp.csr_matrix((values, (row_positions, item_positions)), shape=rows.shape)
+        merged = sp.csr_matrix(rows - rows.multiply(overridden) + delta)
+        merged.eliminate_zeros()
+        return merged
+    
+    def _merged_item_vectors(self, item_indices):
+        """
+        Retourne les vecteurs (notes par utilisateur) d'un lot d'items, couche delta comprise,
+        dans l'espace de tous les utilisateurs (base puis delta).
+        """
+        n_users = self.user_item_matrix.shape[0] + len(self.delta_user_ids)
+        base = self.item_user_matrix[item_indices].tocoo()
+        positions = {item_idx: row for row, item_idx in enumerate(item_indices)}
+        
+        delta = [(positions[item_idx], user_idx, rating)
+                 for user_idx, entries in list(self.delta_rows.items())
+                 for item_idx, rating in entries.items() if item_idx in positions]
+        delta_rows, delta_users, delta_values = (np.array(values) for values in zip(*delta)) if delta else (
+            np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))
+        
+        # Écarter les notes de base remplacées par une note delta
+        keys = base.row.astype(np.int64) * n_users + base.col
+        replaced = np.isin(keys, delta_rows.astype(np.int64) * n_users + delta_users)
+        return sp.csr_matrix((
+            np.concatenate([base.data[~replaced], delta_values]),
+            (np.concatenate([base.row[~replaced], delta_rows]), np.concatenate([base.col[~replaced], delta_users]))
+        ), shape=(len(item_indices), n_users))
+    
+    def item_similarity_rows(self, item_indices):
+        """
+        Retourne les lignes de la matrice de similarité entre items (méthode item_based),
+        similarités recalculées par refresh_item_similarity comprises.
+        
+        Args:
+            item_indices: Tableau des indices des items
+            
+        Returns:
+            Matrice CSR (matrice des k plus proches voisins) ou tableau numpy dense
+            (len(item_indices) x n_items)
+        """
+        item_indices = np.asarray(item_indices, dtype=np.int64)
+        rows = self.item_similarity[item_indices]
+        overlay = self._similarity_overlay
+        if overlay is None or sp.issparse(rows):
+            return rows
+        
+        # L'indexation avancée retourne une copie: la matrice de base n'est pas modifiée.
+        # La similarité étant symétrique, les colonnes des items recalculés sont lues
+        # dans leurs lignes.
+        patched_items, patched_rows = overlay
+        rows[:, patched_items] = patched_rows[:, item_indices].T
+        positions = np.minimum(np.searchsorted(patched_items, item_indices), len(patched_items) - 1)
+        patched = patched_items[positions] == item_indices
+        rows[patched] = patched_rows[positions[patched]]
+        return rows
+    
+    @metrics.span('collaborative.refresh_similarity')
+    def refresh_item_similarity(self):
+        """
+        Recalcule les similarités (méthode item_based) des items touchés par la couche delta.
+        Seuls les utilisateurs ayant noté ces items sont parcourus: le coût dépend de
+        la taille du delta, pas du dataset. Conçu pour être lancé en tâche de fond;
+        les recalculs sont exécutés l'un après l'autre, et les items d'un recalcul
+        qui échoue restent à recalculer.
+        
+        Avec une matrice dense, les lignes recalculées sont conservées à part
+        (voir item_similarity_rows): la matrice de base n'est jamais copiée. Avec une
+        matrice des k plus proches voisins, seules les lignes des items touchés sont
+        remplacées (les listes des autres items le sont à la compaction).
+        
+        Returns:
+            Nombre d'items dont la similarité a été recalculée
+        """
+        if self.method != 'item_based':
+            return 0
+        with self._refresh_lock:
+            with self._delta_lock:
+                items = np.array(sorted(self.dirty_items), dtype=np.int64)
+                self.dirty_items.clear()
+            if len(items) == 0:
+                return 0
+            try:
+                self._refresh_items(items)
+            except Exception:
+                with self._delta_lock:
+                    self.dirty_items.update(items.tolist())
+                raise
+            return len(items)
+    
+    def _refresh_items(self, items):
+        """Recalcule et installe les similarités d'un lot d'items (voir refresh_item_similarity)."""
+        # Normes des vecteurs de tous les items: celles du modèle de base (calculées une fois),
+        # remplacées pour les items concernés par la couche delta
+        if self._item_sq_norms is None:
+            self._item_sq_norms = np.asarray(self.item_user_matrix.multiply(self.item_user_matrix).sum(axis=1)).ravel()
+        delta_items = np.array(sorted({item_idx for entries in list(self.delta_rows.values()) for item_idx in entries}),
+                               dtype=np.int64)
+        sq_norms = self._item_sq_norms.copy()
+        if len(delta_items):
+            delta_vectors = self._merged_item_vectors(delta_items)
+            sq_norms[delta_items] = np.asarray(delta_vectors.multiply(delta_vectors).sum(axis=1)).ravel()
+        norms = np.sqrt(sq_norms)
+        
+        # Produits scalaires des items touchés avec tous les items, via les lignes des
+        # seuls utilisateurs qui les ont notés
+        vectors = self._merged_item_vectors(items)
+        raters = np.unique(vectors.indices)
+        dots = vectors[:, raters] @ self.user_rows(raters)
+        dots = dots.toarray() if sp.issparse(dots) else np.asarray(dots)
+        
+        similarities = np.zeros(dots.shape)
+        denominator = norms[items][:, np.newaxis] * norms[np.newaxis, :]
+        np.divide(dots, denominator, out=similarities, where=denominator > 0)
+        similarities[np.arange(len(items)), items] = 0
+        np.maximum(similarities, 0, out=similarities)
+        
+        if not is_sparse_similarity(self.item_similarity):
+            self._patch_similarity_overlay(items, similarities)
+            return
+        
+        # Une matrice en précision réduite est mise à jour en float32, puis reconvertie
+        current = full_precision(self.item_similarity)
+        # Remplacer les lignes des items touchés par leurs k meilleurs voisins
+        top = top_k_similarity_rows(similarities, self.similarity_top_k)
+        kept = np.ones(current.shape[0], dtype=bool)
+        kept[items] = False
+        unchanged = sp.diags(kept.astype(current.dtype)) @ current
+        updated = sp.csr_matrix((top.data, top.indices, top.indptr), shape=(len(items), top.shape[1]))
+        placement = sp.csr_matrix((np.ones(len(items), dtype=current.dtype), (items, np.arange(len(items)))),
+                                  shape=(current.shape[0], len(items)))
+        item_similarity = sp.csr_matrix(unchanged + placement @ updated, dtype=current.dtype)
+        self.item_similarity = store_similarity(item_similarity, self.dtype)
+    
+    def _patch_similarity_overlay(self, items, similarities):
+        """
+        Ajoute les lignes recalculées d'items à la surcouche de la matrice dense.
+        Les lignes déjà présentes sont conservées, leurs colonnes des items recalculés
+        étant mises à jour (similarité symétrique). La taille de la surcouche dépend
+        du nombre d'items touchés depuis la dernière compaction.
+        """
+        n_items = similarities.shape[1]
+        overlay = self._similarity_overlay
+        old_items, old_rows = overlay if overlay is not None else (np.zeros(0, dtype=np.int64), None)
+        
+        patched_items = np.union1d(old_items, items)
+        patched_rows = np.empty((len(patched_items), n_items), dtype=self._compute_dtype)
+        if old_rows is not None:
+            patched_rows[np.searchsorted(patched_items, old_items)] = old_rows
+        patched_rows[:, items] = similarities[:, patched_items].T
+        patched_rows[np.searchsorted(patched_items, items)] = similarities
+        self._similarity_overlay = (patched_items, patched_rows)
+    
+    def _factor_scores(self, user_indices):
+        """
+        Calcule les scores SVD d'utilisateurs vus à l'entraînement, par un produit de
+        dimension k: score = moyenne + (facteurs utilisateur · Σ) · facteurs itemsᵀ.
+        """
+        user_indices = np.asarray(user_indices, dtype=np.int64)
+        weighted_factors = self.user_factors[user_indices] * self.sigma
+        return self.mean_ratings[user_indices][:, np.newaxis] + weighted_factors @ self.item_factors.T
+    
+    def _needs_fold_in(self, user_idx):
+        """
+        Indique si les scores SVD d'un utilisateur doivent être calculés par fold-in:
+        utilisateur inconnu à l'entraînement, ou ayant reçu des notes depuis.
+        """
+        return user_idx >= self.user_item_matrix.shape[0] or user_idx in self.delta_rows
+    
+    def fold_in_scores(self, user_rows):
+        """
+        Calcule les scores SVD d'utilisateurs à partir de leurs seules notes, sans réentraînement
+        (fold-in). Les notes centrées x de chaque utilisateur sont projetées sur les facteurs
+        des items: u·Σ = x·V est la solution des moindres carrés de min ||x - u·Σ·Vᵀ||
+        (les colonnes de V sont orthonormées), puis score = moyenne + (u·Σ)·Vᵀ.
+        Pour un utilisateur vu à l'entraînement, on retrouve ses scores (exactement
+        avec le solveur arpack, approximativement avec le solveur randomisé).
+        Coût: O(k · n_items) par utilisateur.
+        
+        Args:
+            user_rows: Matrice creuse (n_utilisateurs x n_items) des notes
+            
+        Returns:
+            Matrice numpy (n_utilisateurs x n_items) des scores
+        """
+        means, projection = self.fold_in_factors(user_rows)
+        return means[:, np.newaxis] + projection @ self.item_factors.T
+    
+    def fold_in_factors(self, user_rows):
+        """
+        Projette les notes d'utilisateurs sur les facteurs des items (voir fold_in_scores).
+        
+        Returns:
+            Tuple (moyennes des notes, matrice (n_utilisateurs x k) des vecteurs u·Σ)
+        """
+        user_rows = sp.csr_matrix(user_rows, dtype=np.float64)
+        counts = np.diff(user_rows.indptr)
+        means = np.zeros(len(counts))
+        np.divide(np.asarray(user_rows.sum(axis=1)).ravel(), counts, out=means, where=counts > 0)
+        
+        # Notes centrées sur la moyenne de l'utilisateur (la structure creuse est conservée)
+        centered = user_rows.copy()
+        centered.data -= np.repeat(means, counts)
+        
+        return means, np.asarray(centered @ self.item_factors)
     
+    def _ann_recommend(self, user_idx, user_row, top_n, rated_items):
+        """
+        Recommandations SVD approchées: recherche dans l'index IVF (produit scalaire) des
+        items de plus grand produit scalaire avec le vecteur u·Σ de l'utilisateur.
+        
+        Returns:
+            Tuple (indices des items, scores), ou None si l'index ne fournit pas assez de candidats
+        """
+        if self._needs_fold_in(user_idx):
+            means, queries = self.fold_in_factors(user_row)
+            mean, query = means[0], queries[0]
+        else:
+            mean, query = self.mean_ratings[user_idx], self.user_factors[user_idx] * self.sigma
+        top_item_indices, scores = self.ann_user_index.search(
+            query.astype(np.float32), self.item_factors, top_n, self.ann_probes, exclude=rated_items)
+        
+        available = self.item_factors.shape[0] - (len(rated_items) if rated_items is not None else 0)
+        if len(top_item_indices) < min(top_n, available):
+            return None
+        return top_item_indices, scores + mean
+    
+    def _ann_similar_items(self, item_idx, top_n):
+        """
+        Items similaires approchés: similarité cosinus avec les seuls candidats de l'index IVF
+        (les listes parcourues sont complétées pour disposer de top_n candidats hors l'item).
+        
+        Returns:
+            Tuple (indices des items, similarités), ou None si l'index ne fournit pas assez de candidats
+        """
+        query = self.item_factors[item_idx]
+        query = query / max(np.linalg.norm(query), np.finfo(np.float32).tiny)
+        candidates = self.ann_index.candidates(query, self.ann_probes, min_candidates=top_n + 1)
+        
+        if len(candidates) - 1 < min(top_n, self.item_factors.shape[0] - 1):
+            return None
+        candidate_similarity = cosine_similarity(query.reshape(1, -1), self.item_factors[candidates])[0]
+        top = top_n_indices(candidate_similarity, top_n, exclude=candidates == item_idx)
+        return candidates[top], candidate_similarity[top]
+    
+    def _score_user_based(self, user_idx):
+        """
+        Calcule en une passe les scores user-based de tous les items pour un utilisateur,
+        à partir de ses n_neighbors voisins les plus similaires:
+        score(j) = somme(sim[u, v] * note[v, j]) / somme(|sim[u, v]|) sur les voisins v ayant noté j.
+        
+        Args:
+            user_idx: Indice de l'utilisateur dans la matrice
+            
+        Returns:
+            Vecteur numpy des scores de tous les items
+        """
+        user_sim = self.user_similarity[user_idx]
+        if sp.issparse(user_sim):
+            # Matrice des k plus proches voisins: la ligne contient directement les voisins
+            neighbors = user_sim.indices[user_sim.data > 0]
+            neighbor_sim = user_sim.data[user_sim.data > 0]
+        else:
+            neighbors = np.flatnonzero(user_sim > 0)
+            neighbor_sim = user_sim[neighbors]
+        
+        # Restreindre aux K voisins les plus similaires si demandé
+        if self.n_neighbors is not None and len(neighbors) > self.n_neighbors:
+            top = np.argpartition(neighbor_sim, -self.n_neighbors)[-self.n_neighbors:]
+            neighbors = neighbors[top]
+            neighbor_sim = neighbor_sim[top]
+        
+        # Notes des voisins et indicatrice "a noté l'item"
+        neighbor_ratings = self.user_item_matrix[neighbors]
+        rated_mask = neighbor_ratings.copy()
+        rated_mask.data = np.ones_like(rated_mask.data)
+        
+        weighted_sum = neighbor_ratings.T @ neighbor_sim
+        sim_sum = rated_mask.T @ np.abs(neighbor_sim)
+        
+        # Éviter les divisions par zéro
+        scores = np.zeros(self.user_item_matrix.shape[1])
+        np.divide(weighted_sum, sim_sum, out=scores, where=sim_sum > 0)
+        return scores
+    
+    def _score_item_based(self, user_row):
+        """
+        Calcule en une passe les scores item-based de tous les items pour un utilisateur:
+        score(j) = somme(sim[j, r] * note[r]) / somme(|sim[j, r]|) sur les items r évalués.
+        
+        Args:
+            user_row: Ligne creuse (1 x n_items) des notes de l'utilisateur
+            
+        Returns:
+            Vecteur numpy des scores de tous les items
+        """
+        rated_items = user_row.indices
+        user_ratings = user_row.data
+        
+        # Similarités de chaque item avec les items évalués par l'utilisateur (une matrice
+        # dense est symétrique: ses lignes, contiguës en mémoire, sont lues au lieu des colonnes)
+        if is_sparse_similarity(self.item_similarity):
+            item_sim = self.item_similarity[:, rated_items]
+        else:
+            item_sim = self.item_similarity_rows(rated_items).T
+        weighted_sum = np.asarray(item_sim @ user_ratings).ravel()
+        sim_sum = np.asarray(abs(item_sim).sum(axis=1)).ravel()
+        
+        # Éviter les divisions par zéro
+        scores = np.zeros(len(sim_sum))
+        np.divide(weighted_sum, sim_sum, out=scores, where=sim_sum > 0)
+        return scores
+    
+    @metrics.span('collaborative.recommend')
     def recommend_for_user(self, user_id, top_n=5, exclude_rated=True, item_data=None):
         """
         Recommande des items pour un utilisateur spécifique.
@@ -218,86 +739,51 @@ class CollaborativeFilteringRecommender:
         Returns:
             DataFrame avec les items recommandés, triés par score
         """
-        # Vérifier si l'utilisateur existe
-        if user_id not in self.user_mapping:
+        # Vérifier si l'utilisateur existe (modèle de base ou couche delta)
+        user_idx = self.user_index(user_id)
+        if user_idx is None:
             raise ValueError(f"L'utilisateur avec l'ID {user_id} n'existe pas.")
         
-        user_idx = self.user_mapping[user_id]
+        user_row = self.user_rows([user_idx])
+        rated_items = user_row.indices if exclude_rated else None
         scores = None
         
-        if self.method == 'svd':
-            # Utiliser directement la matrice de prédiction
-            scores = self.prediction_matrix[user_idx, :]
+        # Recherche approchée si un index existe (repli sur le calcul exact sinon)
+        approximate = None
+        if self.method == 'svd' and self.ann_index is not None:
+            approximate = self._ann_recommend(user_idx, user_row, top_n, rated_items)
+        
+        if approximate is not None:
+            top_item_indices, recommendation_scores = approximate
+        
+        elif self.method == 'svd' and self._needs_fold_in(user_idx):
+            # Utilisateur inconnu à l'entraînement ou avec de nouvelles notes: projection sur les facteurs
+            scores = self.fold_in_scores(user_row)[0]
+        
+        elif self.method == 'svd':
+            # Scores à partir des facteurs latents
+            scores = self._factor_scores([user_idx])[0]
+        
+        elif user_idx >= self.user_item_matrix.shape[0] and self.method == 'user_based':
+            # Utilisateur de la couche delta: pas encore de voisins
+            scores = np.zeros(self.user_item_matrix.shape[1])
         
         elif self.method == 'user_based':
             # Calculer les scores en utilisant la similarité entre utilisateurs
-            user_ratings = self.user_item_matrix[user_idx, :]
-            user_sim = self.user_similarity[user_idx, :]
-            
-            # Pour chaque item non évalué, calculer une prédiction
-            scores = np.zeros(self.user_item_matrix.shape[1])
-            
-            for item_idx in range(self.user_item_matrix.shape[1]):
-                # Si l'utilisateur a déjà évalué cet item, on peut le sauter
-                if user_ratings[item_idx] > 0 and exclude_rated:
-                    scores[item_idx] = -np.inf
-                    continue
-                
-                # Trouver tous les utilisateurs qui ont évalué cet item
-                mask = self.user_item_matrix[:, item_idx] > 0
-                
-                # S'il n'y a pas d'évaluations pour cet item, continuer
-                if not np.any(mask):
-                    continue
-                
-                # Calculer la similarité pondérée
-                weighted_sum = np.sum(user_sim[mask] * self.user_item_matrix[mask, item_idx])
-                sim_sum = np.sum(np.abs(user_sim[mask]))
-                
-                # Éviter les divisions par zéro
-                if sim_sum > 0:
-                    scores[item_idx] = weighted_sum / sim_sum
-                else:
-                    scores[item_idx] = 0
+            scores = self._score_user_based(user_idx)
         
         elif self.method == 'item_based':
             # Calculer les scores en utilisant la similarité entre items
-            user_ratings = self.user_item_matrix[user_idx, :]
-            scores = np.zeros(self.user_item_matrix.shape[1])
-            
-            # Trouver les items que l'utilisateur a évalués
-            rated_items = np.where(user_ratings > 0)[0]
-            
-            for item_idx in range(self.user_item_matrix.shape[1]):
-                # Si l'utilisateur a déjà évalué cet item, on peut le sauter
-                if user_ratings[item_idx] > 0 and exclude_rated:
-                    scores[item_idx] = -np.inf
-                    continue
-                
-                # Calculer la similarité pondérée avec les items évalués
-                item_sim = self.item_similarity[item_idx, rated_items]
-                weighted_sum = np.sum(item_sim * user_ratings[rated_items])
-                sim_sum = np.sum(np.abs(item_sim))
-                
-                # Éviter les divisions par zéro
-                if sim_sum > 0:
-                    scores[item_idx] = weighted_sum / sim_sum
-                else:
-                    scores[item_idx] = 0
+            scores = self._score_item_based(user_row)
         
-        # Obtenir les indices des items avec les meilleurs scores
-        if exclude_rated:
-            # Masquer les items déjà évalués
-            rated_mask = self.user_item_matrix[user_idx, :] > 0
-            scores[rated_mask] = -np.inf
-        
-        # Obtenir les indices des items avec les meilleurs scores
-        top_item_indices = np.argsort(scores)[::-1][:top_n]
+        if approximate is None:
+            # Obtenir les indices des items avec les meilleurs scores
+            # (en masquant les items déjà évalués si demandé)
+            top_item_indices = top_n_indices(scores, top_n, exclude=rated_items)
+            recommendation_scores = scores[top_item_indices]
         
         # Convertir les indices en IDs d'items
-        reverse_item_mapping = {idx: item_id for item_id, idx in self.item_mapping.items()}
-        recommended_items = [reverse_item_mapping[idx] for idx in top_item_indices]
-        recommendation_scores = [scores[idx] for idx in top_item_indices]
+        recommended_items = self.item_ids[top_item_indices]
         
         # Créer un DataFrame avec les résultats
         results = pd.DataFrame({
@@ -311,6 +797,7 @@ class CollaborativeFilteringRecommender:
         
         return results.sort_values('score', ascending=False)
     
+    @metrics.span('collaborative.similar_items')
     def recommend_similar_items(self, item_id, top_n=5, item_data=None):
         """
         Recommande des items similaires à un item spécifié.
@@ -334,9 +821,20 @@ class CollaborativeFilteringRecommender:
         item_idx = self.item_mapping[item_id]
         similarity_scores = None
         
-        if self.method == 'item_based':
+        # Recherche approchée si un index existe (repli sur le calcul exact sinon)
+        approximate = None
+        if self.method == 'svd' and self.ann_index is not None:
+            approximate = self._ann_similar_items(item_idx, top_n)
+        
+        if approximate is not None:
+            top_item_indices, similarity_values = approximate
+        
+        elif self.method == 'item_based':
             # Utiliser directement la matrice de similarité entre items
-            similarity_scores = self.item_similarity[item_idx, :]
+            similarity_scores = self.item_similarity_rows([item_idx])
+            if sp.issparse(similarity_scores):
+                similarity_scores = similarity_scores.toarray()
+            similarity_scores = similarity_scores[0]
         
         elif self.method == 'svd':
             # Calculer la similarité cosinus entre les facteurs d'items
@@ -344,16 +842,13 @@ class CollaborativeFilteringRecommender:
             current_item_factors = item_factors[item_idx].reshape(1, -1)
             similarity_scores = cosine_similarity(current_item_factors, item_factors)[0]
         
-        # Masquer l'item lui-même
-        similarity_scores[item_idx] = -np.inf
-        
-        # Obtenir les indices des items les plus similaires
-        top_item_indices = np.argsort(similarity_scores)[::-1][:top_n]
+        if similarity_scores is not None:
+            # Obtenir les indices des items les plus similaires (en masquant l'item lui-même)
+            top_item_indices = top_n_indices(similarity_scores, top_n, exclude=[item_idx])
+            similarity_values = similarity_scores[top_item_indices]
         
         # Convertir les indices en IDs d'items
-        reverse_item_mapping = {idx: item_id for item_id, idx in self.item_mapping.items()}
-        similar_items = [reverse_item_mapping[idx] for idx in top_item_indices]
-        similarity_values = [similarity_scores[idx] for idx in top_item_indices]
+        similar_items = self.item_ids[top_item_indices]
         
         # Créer un DataFrame avec les résultats
         results = pd.DataFrame({
@@ -367,6 +862,155 @@ class CollaborativeFilteringRecommender:
         
         return results.sort_values('similarity', ascending=False)
     
+    @metrics.span('collaborative.score')
+    def score_users(self, user_indices):
+        """
+        Calcule la matrice des scores de tous les items pour un lot d'utilisateurs,
+        en un produit matriciel par lot (mêmes formules que recommend_for_user).
+        
+        Args:
+            user_indices: Tableau des indices des utilisateurs dans la matrice
+            
+        Returns:
+            Matrice numpy (len(user_indices) x n_items) des scores
+        """
+        user_indices = np.asarray(user_indices, dtype=np.int64)
+        n_base_users = self.user_item_matrix.shape[0]
+        
+        if self.method == 'svd':
+            folded = np.array([self._needs_fold_in(user_idx) for user_idx in user_indices.tolist()], dtype=bool)
+            scores = self._factor_scores(np.where(folded, 0, user_indices))
+            if folded.any():
+                scores[folded] = self.fold_in_scores(self.user_rows(user_indices[folded]))
+            return scores
+        
+        if self.method == 'user_based' and (user_indices >= n_base_users).any():
+            # Utilisateurs de la couche delta: pas encore de voisins (scores nuls)
+            in_base = user_indices < n_base_users
+            scores = np.zeros((len(user_indices), self.user_item_matrix.shape[1]))
+            if in_base.any():
+                scores[in_base] = self.score_users(user_indices[in_base])
+            return scores
+        
+        if self.method == 'item_based':
+            # score(u, j) = somme_r sim[j, r] * note[u, r] / somme_r sim[j, r] (sim >= 0)
+            user_rows = self.user_rows(user_indices)
+            rated_mask = user_rows.copy()
+            rated_mask.data = np.ones_like(rated_mask.data)
+            if is_sparse_similarity(self.item_similarity):
+                weighted_sum = (self.item_similarity @ user_rows.T).T
+                sim_sum = (self.item_similarity @ rated_mask.T).T
+            else:
+                # Matrice dense symétrique: seules les lignes des items notés par le lot sont lues
+                rated = np.unique(user_rows.indices)
+                item_sim = self.item_similarity_rows(rated)
+                weighted_sum = user_rows[:, rated] @ item_sim
+                sim_sum = rated_mask[:, rated] @ item_sim
+        else:
+            # Similarités positives des utilisateurs du lot avec tous les autres utilisateurs
+            user_sim = self.user_similarity[user_indices]
+            user_sim = user_sim.toarray() if sp.issparse(user_sim) else np.array(user_sim)
+            user_sim[user_sim < 0] = 0
+            
+            # Restreindre chaque ligne à ses K voisins les plus similaires si demandé
+            if self.n_neighbors is not None and self.n_neighbors < user_sim.shape[1]:
+                dropped = np.argpartition(user_sim, -self.n_neighbors, axis=1)[:, :-self.n_neighbors]
+                np.put_along_axis(user_sim, dropped, 0, axis=1)
+            
+            rated_mask = self.item_user_matrix.copy()
+            rated_mask.data = np.ones_like(rated_mask.data)
+            weighted_sum = (self.item_user_matrix @ user_sim.T).T
+            sim_sum = (rated_mask @ user_sim.T).T
+        
+        weighted_sum = weighted_sum.toarray() if sp.issparse(weighted_sum) else np.asarray(weighted_sum)
+        sim_sum = sim_sum.toarray() if sp.issparse(sim_sum) else np.asarray(sim_sum)
+        
+        # Éviter les divisions par zéro
+        scores = np.zeros(weighted_sum.shape)
+        np.divide(weighted_sum, sim_sum, out=scores, where=sim_sum > 0)
+        return scores
+    
+    def batch_recommend_for_users(self, user_ids, top_n=5, exclude_rated=True, batch_size=256):
+        """
+        Recommande des items pour un lot d'utilisateurs. Les scores sont calculés
+        par blocs de batch_size utilisateurs, chaque bloc en un seul produit matriciel.
+        
+        Args:
+            user_ids: Liste des IDs utilisateurs
+            top_n: Nombre de recommandations par utilisateur
+            exclude_rated: Exclure les items déjà évalués par chaque utilisateur
+            batch_size: Nombre d'utilisateurs traités par produit matriciel
+            
+        Returns:
+            Dictionnaire {user_id: DataFrame des items recommandés triés par score};
+            les utilisateurs inconnus sont ignorés
+        """
+        known_ids = [user_id for user_id in user_ids if self.user_index(user_id) is not None]
+        results = {}
+        
+        for start in range(0, len(known_ids), batch_size):
+            batch_ids = known_ids[start:start + batch_size]
+            user_indices = np.array([self.user_index(user_id) for user_id in batch_ids], dtype=np.int64)
+            scores = self.score_users(user_indices)
+            user_rows = self.user_rows(user_indices)
+            
+            for row, user_id in enumerate(batch_ids):
+                rated_items = user_rows[row].indices if exclude_rated else None
+                top_item_indices = top_n_indices(scores[row], top_n, exclude=rated_items)
+                results[user_id] = pd.DataFrame({
+                    self.item_id_col: self.item_ids[top_item_indices],
+                    'score': scores[row][top_item_indices]
+                })
+        return results
+    
+    def batch_recommend_similar_items(self, item_ids, top_n=5):
+        """
+        Recommande des items similaires pour un lot d'items, en un seul produit
+        matriciel. Fonctionne uniquement avec la méthode item_based ou svd.
+        
+        Args:
+            item_ids: Liste des IDs d'items
+            top_n: Nombre de recommandations par item
+            
+        Returns:
+            Dictionnaire {item_id: DataFrame des items similaires triés par similarité};
+            les items inconnus sont ignorés
+        """
+        return {
+            item_id: pd.DataFrame({self.item_id_col: similar_items, 'similarity': similarity_values})
+            for item_id, (similar_items, similarity_values) in self.similar_item_arrays(item_ids, top_n).items()
+        }
+    
+    def similar_item_arrays(self, item_ids, top_n=5):
+        """
+        Items similaires d'un lot d'items (voir batch_recommend_similar_items), sous forme
+        de tableaux, sans construire de DataFrame par item.
+        
+        Returns:
+            Dictionnaire {item_id: (IDs des items similaires, similarités)}
+        """
+        if self.method not in ['item_based', 'svd']:
+            raise ValueError("La recommandation d'items similaires n'est disponible qu'avec les méthodes 'item_based' ou 'svd'")
+        
+        known_ids = [item_id for item_id in item_ids if item_id in self.item_mapping]
+        item_indices = np.array([self.item_mapping[item_id] for item_id in known_ids], dtype=np.int64)
+        if len(item_indices) == 0:
+            return {}
+        
+        if self.method == 'item_based':
+            similarity_scores = self.item_similarity_rows(item_indices)
+            if sp.issparse(similarity_scores):
+                similarity_scores = similarity_scores.toarray()
+        else:
+            # Similarité cosinus entre les facteurs d'items
+            similarity_scores = cosine_similarity(self.item_factors[item_indices], self.item_factors)
+        
+        results = {}
+        for row, (item_id, item_idx) in enumerate(zip(known_ids, item_indices)):
+            top_item_indices = top_n_indices(similarity_scores[row], top_n, exclude=[item_idx])
+            results[item_id] = (self.item_ids[top_item_indices], similarity_scores[row][top_item_indices])
+        return results
+    
     def evaluate(self, test_df, top_n=10):
         """
         Évalue la qualité des recommandations à partir d'un ensemble de test.
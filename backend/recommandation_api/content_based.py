@@ -1,13 +1,22 @@
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 import os
-import pickle
+import re
+import time
+
+from . import metrics
+from .artifacts import (artifact_exists, evict_artifacts, fingerprint, load_artifact,
+                        save_artifact, touch_artifact)
+from .ranking import top_n_indices
+from .similarity import compute_dtype, load_similarity, similarity_arrays, store_similarity, top_k_similarity
 
 class ContentBasedRecommender:
     def __init__(self, dataframe, text_columns=['description'], weights=None, 
-                 item_id_col='item_id', cache_dir=None):
+                 item_id_col='item_id', similarity_mode='dense', top_k=None, 
+                 filter_columns=None, list_columns=None, dtype='float32', cache_dir=None, cache_size_limit=None):
         """
         Initialise le système de recommandation basé sur le contenu.
         
@@ -16,15 +25,40 @@ class ContentBasedRecommender:
             text_columns: Liste des colonnes textuelles à utiliser pour la recommandation
             weights: Poids à attribuer à chaque colonne textuelle (égaux par défaut)
             item_id_col: Nom de la colonne contenant l'ID unique de l'item
+            similarity_mode: 'dense' pour précalculer la matrice de similarité n x n,
+                'sparse' pour ne garder que la matrice TF-IDF pondérée et calculer
+                les similarités d'un item à la demande
+            top_k: En mode 'sparse', précalcule les k plus proches voisins de chaque item
+            filter_columns: Colonnes indexées dès l'initialisation pour les filtres de
+                recommend (les autres colonnes sont indexées à leur première utilisation)
+            list_columns: Colonnes filtrables dont chaque valeur est une liste d'éléments
+                (auteurs, ...): un filtre y désigne un élément entier, et non des mots
+            dtype: Précision des matrices: 'float32' (par défaut) ou 'float64'; 'float16' ou
+                'int8' (quantifié, un facteur d'échelle par ligne) réduisent en plus le stockage
+                de la matrice de similarité et des plus proches voisins
             cache_dir: Répertoire pour mettre en cache la matrice de similarité
+            cache_size_limit: Budget disque du cache en octets; au-delà, les modèles
+                les moins récemment utilisés sont supprimés (illimité si None)
         """
         self.df = dataframe
         self.text_columns = text_columns if isinstance(text_columns, list) else [text_columns]
         self.weights = weights if weights else [1.0] * len(self.text_columns)
         self.item_id_col = item_id_col
+        self.similarity_mode = similarity_mode
+        self.top_k = top_k
+        self.dtype = dtype
         self.cache_dir = cache_dir
+        self.cache_size_limit = cache_size_limit
         self.vectorizers = {}
         self.similarity_matrix = None
+        self.feature_matrix = None
+        self.neighbors = None
+        self.filter_indexes = {}
+        self.list_columns = set(list_columns or [])
+        
+        if self.similarity_mode not in ('dense', 'sparse'):
+            raise ValueError(f"Mode de similarité '{self.similarity_mode}' non reconnu")
+        self._compute_dtype = compute_dtype(dtype)
         
         # Vérification de la validité des données
         for col in self.text_columns:
@@ -35,7 +69,18 @@ class ContentBasedRecommender:
             
         # Nettoyage des données textuelles
         for col in self.text_columns:
-            self.df[col] = self.df[col].fillna('').astype('U')
+            self.df[col] = self.df[col].astype(object).fillna('').astype('U')
+        
+        # Correspondances ID -> position (première occurrence) et position -> ID
+        self.item_ids = self.df[self.item_id_col].to_numpy()
+        self.item_positions = {}
+        for position, current_id in enumerate(self.item_ids):
+            self.item_positions.setdefault(current_id, position)
+        
+        # Index des colonnes filtrables (genres, auteurs, ...)
+        for col in filter_columns or []:
+            if col in self.df.columns:
+                self._index_column(col)
             
         self._fit()
         
@@ -47,50 +92,229 @@ class ContentBasedRecommender:
         text = text.strip()  # enlever les espaces au début et à la fin
         return text.lower()
         
+    def _build_feature_matrix(self):
+        """
+        Construit la matrice TF-IDF empilée de toutes les colonnes textuelles.
+        Chaque bloc est normalisé (L2) puis multiplié par la racine de son poids,
+        de sorte que le produit scalaire de deux lignes soit égal à la somme pondérée
+        des similarités cosinus par colonne.
+        """
+        weights = np.array(self.weights, dtype=self._compute_dtype) / sum(self.weights)
+        blocks = []
+        
+        for col, weight in zip(self.text_columns, weights):
+            vectorizer = TfidfVectorizer(stop_words='english', 
+                                         max_features=5000,
+                                         ngram_range=(1, 2),
+                                         dtype=self._compute_dtype)
+            tfidf_matrix = vectorizer.fit_transform(self.df[col].apply(self._preprocess_text))
+            self.vectorizers[col] = vectorizer
+            blocks.append(normalize(tfidf_matrix) * np.sqrt(weight))
+            
+        return sp.hstack(blocks, format='csr')
+        
+    def _cache_key(self):
+        """
+        Empreinte des textes, des IDs et de tous les paramètres d'entraînement.
+        """
+        params = {
+            'engine': 'content',
+            'text_columns': self.text_columns,
+            'weights': list(self.weights),
+            'similarity_mode': self.similarity_mode,
+            'top_k': self.top_k,
+            'dtype': self.dtype
+        }
+        return fingerprint([self.df[[self.item_id_col] + self.text_columns]], params)
+        
     def _fit(self):
-        """Calcule la matrice de similarité entre les items"""
-        # Essaie de charger la matrice de similarité du cache si elle existe
-        if self.cache_dir and os.path.exists(os.path.join(self.cache_dir, 'similarity_matrix.pkl')):
+        """Calcule la matrice de similarité (ou la matrice TF-IDF pondérée) entre les items"""
+        start = time.perf_counter()
+        model_dir = None
+        if self.cache_dir:
+            model_dir = os.path.join(self.cache_dir, f'content_{self.similarity_mode}-{self._cache_key()}')
+        
+        # Essaie de charger le modèle du cache s'il existe (tableaux projetés en mémoire)
+        if model_dir and artifact_exists(model_dir):
             try:
-                with open(os.path.join(self.cache_dir, 'similarity_matrix.pkl'), 'rb') as f:
-                    self.similarity_matrix = pickle.load(f)
+                arrays, _ = load_artifact(model_dir)
+                self.similarity_matrix = load_similarity(arrays, 'similarity_matrix')
+                self.feature_matrix = arrays.get('feature_matrix')
+                self.neighbors = load_similarity(arrays, 'neighbors')
+                touch_artifact(model_dir)
+                metrics.record_cache('content_model', hit=True)
+                metrics.record_model_load('content', 'cache', time.perf_counter() - start)
                 print("Matrice de similarité chargée depuis le cache")
                 return
             except Exception as e:
                 print(f"Erreur lors du chargement du cache: {e}")
         
-        # Crée une matrice TF-IDF pour chaque colonne textuelle
-        tfidf_matrices = []
+        # Crée la matrice TF-IDF pondérée de toutes les colonnes textuelles
+        self.feature_matrix = self._build_feature_matrix()
         
-        for col in self.text_columns:
-            vectorizer = TfidfVectorizer(stop_words='english', 
-                                         max_features=5000,
-                                         ngram_range=(1, 2))
-            tfidf_matrix = vectorizer.fit_transform(self.df[col].apply(self._preprocess_text))
-            self.vectorizers[col] = vectorizer
-            tfidf_matrices.append(tfidf_matrix)
+        if self.similarity_mode == 'dense':
+            # Similarité pondérée de toutes les paires d'items
+            similarity_matrix = (self.feature_matrix @ self.feature_matrix.T).toarray()
+            self.similarity_matrix = store_similarity(similarity_matrix, self.dtype)
+            self.feature_matrix = None
+        elif self.top_k is not None:
+            # Précalcule les k plus proches voisins de chaque item
+            self.neighbors = store_similarity(top_k_similarity(self.feature_matrix, self.top_k), self.dtype)
+        
+        # Sauvegarde le modèle dans le cache si nécessaire
+        if model_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            save_artifact(model_dir, {
+                **similarity_arrays('similarity_matrix', self.similarity_matrix),
+                'feature_matrix': self.feature_matrix,
+                **similarity_arrays('neighbors', self.neighbors)
+            }, metadata={'similarity_mode': self.similarity_mode, 'top_k': self.top_k, 'dtype': self.dtype})
+            evict_artifacts(self.cache_dir, self.cache_size_limit, keep=model_dir)
+            metrics.record_cache('content_model', hit=False)
+        metrics.record_model_load('content', 'fit', time.perf_counter() - start)
+    
+    def _index_column(self, col):
+        """
+        Indexe une colonne pour les filtres. Une valeur peut contenir plusieurs éléments:
+        une colonne de mots-clés ("Adventure Animation Children") est découpée en mots,
+        une colonne de list_columns (liste d'auteurs) en éléments entiers (voir
+        _filter_tokens). L'index associe à chaque mot ou élément la ligne creuse des
+        items qui le contiennent.
+
+        Returns:
+            Tuple (matrice CSR booléenne mots x items, correspondance mot -> ligne)
+        """
+        # Découpage de chaque valeur distincte (et non de chaque item)
+        codes, values = pd.factorize(self.df[col])
+        elements = col in self.list_columns
+        value_tokens = [self._filter_tokens(value, elements) for value in values]
+        tokens = {}
+        rows, columns = [], []
+        for value_code, current_tokens in enumerate(value_tokens):
+            for token in current_tokens:
+                rows.append(value_code)
+                columns.append(tokens.setdefault(token, len(tokens)))
+        value_token_matrix = sp.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, columns)), shape=(len(values), len(tokens)))
+
+        # Items x valeurs (les valeurs manquantes, de code -1, n'ont aucun mot)
+        known = np.flatnonzero(codes >= 0)
+        item_value_matrix = sp.csr_matrix(
+            (np.ones(len(known), dtype=np.int32), (known, codes[known])), shape=(len(codes), len(values)))
+        token_items = (item_value_matrix @ value_token_matrix).T.tocsr().astype(bool)
+
+        index = (token_items, tokens)
+        self.filter_indexes[col] = index
+        return index
+
+    @staticmethod
+    def _filter_tokens(value, elements=False):
+        """
+        Mots d'une valeur de filtre ou de colonne: texte en minuscules découpé sur les
+        espaces et les séparateurs de liste (, | ; [ ] et guillemets). Avec elements,
+        seuls les séparateurs de liste découpent le texte: "['Stephen King', 'Carole Smith']"
+        donne les éléments 'stephen king' et 'carole smith'.
+        """
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return set()
+        text = str(value).lower()
+        if not elements:
+            return {token for token in re.split(r"[\s,|;\[\]'\"]+", text) if token}
+        # Crochets et guillemets d'une liste sérialisée retirés, espaces normalisés
+        text = re.sub(r"[\[\]'\"]", '', text)
+        return {' '.join(element.split()) for element in re.split(r'[,|;]', text) if element.strip()}
+
+    def _filter_mask(self, filters):
+        """
+        Construit le masque booléen des items qui satisfont tous les filtres.
+        Un item satisfait une valeur si sa colonne contient tous les mots de la valeur
+        (genres='Comedy' retient "Comedy Drama"), ou, pour une colonne de list_columns,
+        l'élément entier (authors='Stephen King' ne retient pas "Stephen Smith, Carole King");
+        les valeurs d'une liste sont combinées par OU, les colonnes par ET.
+        
+        Args:
+            filters: Dictionnaire de filtres {colonne: valeur ou liste de valeurs}
             
-        # Combine les matrices avec leurs poids respectifs
-        if len(tfidf_matrices) == 1:
-            combined_matrix = tfidf_matrices[0]
-        else:
-            # Normalise les poids
-            weights = np.array(self.weights) / sum(self.weights)
-            combined_matrix = np.zeros((self.df.shape[0], self.df.shape[0]))
+        Returns:
+            Masque booléen numpy (None si aucun filtre applicable)
+        """
+        mask = None
+        for col, value in filters.items():
+            if col not in self.df.columns:
+                continue
+            token_items, tokens = self.filter_indexes.get(col) or self._index_column(col)
             
-            # Calcule la similarité pondérée
-            for i, matrix in enumerate(tfidf_matrices):
-                sim_matrix = cosine_similarity(matrix)
-                combined_matrix += weights[i] * sim_matrix
-                
-        self.similarity_matrix = combined_matrix
+            column_mask = np.zeros(token_items.shape[1], dtype=bool)
+            for current in (value if isinstance(value, list) else [value]):
+                value_tokens = self._filter_tokens(current, col in self.list_columns)
+                if not value_tokens or not value_tokens <= tokens.keys():
+                    continue
+                # Nombre de mots de la valeur présents dans chaque item
+                counts = np.asarray(token_items[[tokens[token] for token in value_tokens]].sum(axis=0)).ravel()
+                column_mask |= counts == len(value_tokens)
+            
+            mask = column_mask if mask is None else mask & column_mask
+        return mask
+    
+    def _similarity_row(self, idx):
+        """
+        Retourne le vecteur des similarités de l'item d'indice idx avec tous les items.
+        """
+        if self.similarity_mode == 'dense':
+            return self.similarity_matrix[idx]
         
-        # Sauvegarde la matrice de similarité dans le cache si nécessaire
-        if self.cache_dir:
-            os.makedirs(self.cache_dir, exist_ok=True)
-            with open(os.path.join(self.cache_dir, 'similarity_matrix.pkl'), 'wb') as f:
-                pickle.dump(self.similarity_matrix, f)
+        if self.neighbors is not None:
+            # Seuls les k plus proches voisins ont une similarité non nulle
+            return self.neighbors[idx].toarray().ravel()
+        
+        # Produit scalaire creux de l'item avec toute la matrice pondérée
+        return (self.feature_matrix @ self.feature_matrix[idx].T).toarray().ravel()
+    
+    def _similarity_rows(self, indices):
+        """
+        Retourne la matrice dense (len(indices) x n_items) des similarités d'un lot d'items
+        avec tous les items: une seule tranche de lignes (ou un seul produit creux en mode
+        'sparse' sans plus proches voisins).
+        """
+        if self.similarity_mode == 'dense':
+            rows = self.similarity_matrix[indices]
+        elif self.neighbors is not None:
+            rows = self.neighbors[indices]
+        else:
+            rows = self.feature_matrix[indices] @ self.feature_matrix.T
+        return rows.toarray() if sp.issparse(rows) else np.asarray(rows)
                 
+    @metrics.span('content.score')
+    def profile_scores(self, profile_weights):
+        """
+        Calcule l'affinité de chaque item avec des profils d'utilisateurs, un profil étant
+        une combinaison pondérée d'items (par exemple les items notés, pondérés par la note):
+        affinité(p, j) = somme(poids[p, r] * sim(j, r)) / somme(|poids[p, r]|).
+        
+        Args:
+            profile_weights: Matrice creuse (n_profils x n_items) des poids, dans l'ordre
+                des lignes du DataFrame
+            
+        Returns:
+            Matrice numpy (n_profils x n_items) des affinités
+        """
+        profile_weights = sp.csr_matrix(profile_weights)
+        
+        if self.similarity_mode == 'dense':
+            affinity = profile_weights @ self.similarity_matrix
+        elif self.neighbors is not None:
+            affinity = profile_weights @ self.neighbors
+        else:
+            # Profil = somme pondérée des vecteurs TF-IDF, puis un seul produit avec le catalogue
+            affinity = (profile_weights @ self.feature_matrix) @ self.feature_matrix.T
+        affinity = affinity.toarray() if sp.issparse(affinity) else np.asarray(affinity)
+        
+        totals = np.asarray(abs(profile_weights).sum(axis=1)).ravel()
+        scores = np.zeros(affinity.shape)
+        np.divide(affinity, totals[:, np.newaxis], out=scores, where=totals[:, np.newaxis] > 0)
+        return scores
+        
+    @metrics.span('content.recommend')
     def recommend(self, item_id, top_n=5, filters=None):
         """
         Recommande des items similaires à l'item spécifié.
@@ -103,39 +327,52 @@ class ContentBasedRecommender:
         Returns:
             DataFrame avec les items recommandés, triés par similarité
         """
-        if item_id not in self.df[self.item_id_col].values:
+        if item_id not in self.item_positions:
             raise ValueError(f"L'item avec l'ID {item_id} n'existe pas.")
             
-        idx = self.df.index[self.df[self.item_id_col] == item_id][0]
+        idx = self.item_positions[item_id]
         
         # Récupère les scores de similarité
-        similarity_scores = list(enumerate(self.similarity_matrix[idx]))
-        similarity_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)
-        
-        # Exclut l'item lui-même
-        similarity_scores = [(i, score) for i, score in similarity_scores if i != idx ]
-        
-        # Applique les filtres si spécifiés
-        filtered_indices = range(len(self.df))
-        if filters:
-            for col, value in filters.items():
-                if col in self.df.columns:
-                    if isinstance(value, list):
-                        filtered_indices = [i for i in filtered_indices if self.df.iloc[i][col] in value]
-                    else:
-                        filtered_indices = [i for i in filtered_indices if self.df.iloc[i][col] == value]
-                        
-        filtered_scores = [(i, score) for i, score in similarity_scores if i in filtered_indices ]
-        
-        # Sélectionne les meilleurs matches
-        top_matches = filtered_scores[:top_n]  
+        similarity_scores = self._similarity_row(idx)
+        
+        # Applique les filtres si spécifiés (masque calculé à partir des index)
+        mask = self._filter_mask(filters) if filters else None
+        
+        # Sélectionne les meilleurs matches (en excluant l'item lui-même)
+        top_indices = top_n_indices(similarity_scores, top_n, exclude=[idx], mask=mask)
         
         # Crée un DataFrame de résultats avec score de similarité
-        recommended_items = self.df.iloc[[i[0] for i in top_matches]].copy()
-        recommended_items['similarity_score'] = [i[1] for i in top_matches]
+        recommended_items = self.df.iloc[top_indices].copy()
+        recommended_items['similarity_score'] = similarity_scores[top_indices]
         
         return recommended_items.sort_values('similarity_score', ascending=False)
         
+    @metrics.span('content.batch_recommend')
+    def batch_recommend(self, item_ids, top_n=5):
+        """
+        Recommande des items similaires pour un lot d'items, les similarités de tout
+        le lot étant lues en une fois (voir _similarity_rows).
+        
+        Args:
+            item_ids: Liste des IDs d'items
+            top_n: Nombre de recommandations par item
+            
+        Returns:
+            Dictionnaire {item_id: (IDs des items recommandés, scores de similarité)},
+            triés par similarité décroissante; les items inconnus sont ignorés
+        """
+        known_ids = [item_id for item_id in item_ids if item_id in self.item_positions]
+        if not known_ids:
+            return {}
+        indices = np.array([self.item_positions[item_id] for item_id in known_ids], dtype=np.int64)
+        similarity_scores = self._similarity_rows(indices)
+        
+        results = {}
+        for row, (item_id, idx) in enumerate(zip(known_ids, indices)):
+            top_indices = top_n_indices(similarity_scores[row], top_n, exclude=[idx])
+            results[item_id] = (self.item_ids[top_indices], similarity_scores[row][top_indices])
+        return results
+        
     def evaluate(self, test_items, actual_similar_items, top_n=10):
         """
         Évalue la qualité des recommandations à partir d'un ensemble de test.
@@ -152,7 +389,7 @@ class ContentBasedRecommender:
         recall_scores = []
         
         for item_id in test_items:
-            if item_id not in self.df[self.item_id_col].values:
+            if item_id not in self.item_positions:
                 continue
                 
             try:
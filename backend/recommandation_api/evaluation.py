@@ -0,0 +1,281 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import services
+from .ranking import top_n_indices
+
+# Systèmes évaluables: filtrage collaboratif seul, contenu seul (profil des items notés)
+# ou combinaison hybride (poids utilisés par les vues)
+EVALUATION_ENGINES = ('collaborative', 'content', 'hybrid')
+SPLIT_METHODS = ('temporal', 'random')
+
+# État partagé avec les processus de l'évaluation (hérité par fork, jamais sérialisé)
+_evaluation_state = {}
+
+
+def split_ratings(ratings_df, method='temporal', test_fraction=0.2, seed=0,
+                  user_id_col='user_id', timestamp_col='timestamp'):
+    """
+    Sépare les notes en jeux d'entraînement et de test, utilisateur par utilisateur:
+    pour chaque utilisateur, floor(test_fraction * nombre de notes) notes sont mises
+    de côté pour le test (les utilisateurs ayant trop peu de notes restent entièrement
+    dans l'entraînement).
+
+    Args:
+        ratings_df: DataFrame des notes
+        method: 'temporal' (les notes les plus récentes de chaque utilisateur) ou
+            'random' (des notes tirées au hasard)
+        test_fraction: Part des notes de chaque utilisateur mise de côté
+        seed: Graine du tirage (méthode random)
+        user_id_col: Nom de la colonne des IDs utilisateurs
+        timestamp_col: Nom de la colonne des dates (méthode temporal)
+
+    Returns:
+        Tuple (DataFrame d'entraînement, DataFrame de test)
+    """
+    if method not in SPLIT_METHODS:
+        raise ValueError(f"Méthode de séparation '{method}' non reconnue")
+    if method == 'temporal' and timestamp_col not in ratings_df.columns:
+        raise ValueError(f"La colonne '{timestamp_col}' n'existe pas dans le DataFrame")
+
+    user_codes, _ = pd.factorize(ratings_df[user_id_col])
+    if method == 'temporal':
+        # Ordre chronologique (à date égale, ordre du fichier)
+        sort_key = ratings_df[timestamp_col].to_numpy()
+    else:
+        sort_key = np.random.default_rng(seed).random(len(ratings_df))
+    order = np.lexsort((np.arange(len(ratings_df)), sort_key, user_codes))
+
+    # Rang de chaque note parmi celles de son utilisateur
+    counts = np.bincount(user_codes)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    ranks = np.empty(len(ratings_df), dtype=np.int64)
+    ranks[order] = np.arange(len(ratings_df)) - starts[user_codes[order]]
+
+    n_test = np.floor(counts * test_fraction).astype(np.int64)
+    is_test = ranks >= (counts - n_test)[user_codes]
+    return ratings_df[~is_test], ratings_df[is_test]
+
+
+def ranking_metrics(hits, n_relevant):
+    """
+    Calcule les métriques de classement de listes de recommandations, pour tous
+    les utilisateurs à la fois.
+
+    Args:
+        hits: Matrice booléenne (n_utilisateurs x top_n): la recommandation de rang k est pertinente
+        n_relevant: Nombre d'items pertinents de chaque utilisateur (> 0)
+
+    Returns:
+        Dictionnaire {métrique: vecteur des valeurs par utilisateur}
+        (precision, recall, ndcg, map, hit_rate)
+    """
+    hits = np.asarray(hits, dtype=np.float64)
+    n_relevant = np.asarray(n_relevant, dtype=np.float64)
+    top_n = hits.shape[1]
+    ranks = np.arange(1, top_n + 1)
+    n_hits = hits.sum(axis=1)
+
+    # DCG avec un gain de 1 par item pertinent, normalisé par le DCG d'un classement idéal
+    discounts = 1 / np.log2(ranks + 1)
+    ideal = np.cumsum(discounts)[np.minimum(n_relevant, top_n).astype(np.int64) - 1]
+
+    # Précision moyenne: moyenne des précisions aux rangs des items pertinents
+    precision_at_rank = np.cumsum(hits, axis=1) / ranks
+
+    return {
+        'precision': n_hits / top_n,
+        'recall': n_hits / n_relevant,
+        'ndcg': (hits @ discounts) / ideal,
+        'map': (precision_at_rank * hits).sum(axis=1) / np.minimum(n_relevant, top_n),
+        'hit_rate': (n_hits > 0).astype(np.float64)
+    }
+
+
+def _score_users(engine, recommender, user_indices):
+    """
+    Scores de tous les items (espace des items collaboratifs) pour un bloc d'utilisateurs.
+
+    Returns:
+        Tuple (matrice des scores, matrice CSR des notes des utilisateurs)
+    """
+    collaborative_recommender = recommender.collaborative_recommender
+    if engine == 'collaborative':
+        return collaborative_recommender.score_users(user_indices), collaborative_recommender.user_rows(user_indices)
+    if engine == 'content':
+        return recommender.score_users(user_indices, weight_content=1, weight_collaborative=0)
+    return recommender.score_users(user_indices)
+
+
+def _evaluate_users(bounds):
+    """
+    Évalue les utilisateurs [début, fin) de l'état partagé, par blocs de batch_size.
+
+    Returns:
+        Tuple (matrice booléenne des recommandations pertinentes, indices des items recommandés)
+    """
+    start, end = bounds
+    state = _evaluation_state
+    top_n = state['top_n']
+    hits = np.zeros((end - start, top_n), dtype=bool)
+    recommended = []
+
+    for block_start in range(start, end, state['batch_size']):
+        block_end = min(block_start + state['batch_size'], end)
+        scores, user_rows = _score_users(state['engine'], state['recommender'],
+                                         state['user_indices'][block_start:block_end])
+        for row in range(block_end - block_start):
+            top_items = top_n_indices(scores[row], top_n, exclude=user_rows[row].indices)
+            recommended.append(top_items)
+
+            # Clés (utilisateur, item) des recommandations, cherchées parmi celles du test
+            keys = (block_start + row) * state['n_items'] + top_items
+            positions = np.minimum(np.searchsorted(state['relevant_keys'], keys), len(state['relevant_keys']) - 1)
+            hits[block_start + row - start, :len(top_items)] = state['relevant_keys'][positions] == keys
+    recommended = np.unique(np.concatenate(recommended)) if recommended else np.zeros(0, dtype=np.int64)
+    return hits, recommended
+
+
+def evaluate_recommender(recommender, test_df, engine='hybrid', top_n=10, relevance_threshold=None,
+                         n_jobs=None, batch_size=256):
+    """
+    Évalue un recommandeur hybride (ou l'un de ses deux systèmes) sur un jeu de test:
+    les utilisateurs sont notés par blocs, les blocs étant répartis entre plusieurs
+    processus. Seuls les utilisateurs connus du modèle et ayant au moins un item
+    pertinent dans le test sont évalués.
+
+    Args:
+        recommender: HybridRecommender entraîné sur le jeu d'entraînement
+        test_df: DataFrame des notes de test (user_id, item_id, rating)
+        engine: Système évalué ('collaborative', 'content' ou 'hybrid')
+        top_n: Longueur des listes de recommandations
+        relevance_threshold: Note minimale d'un item de test pertinent (tous si None)
+        n_jobs: Nombre de processus (nombre de processeurs si None, 1 pour tout
+            calculer dans le processus courant)
+        batch_size: Nombre d'utilisateurs notés par produit matriciel
+
+    Returns:
+        Dictionnaire des métriques moyennes (precision, recall, ndcg, map, hit_rate,
+        coverage) et du nombre d'utilisateurs évalués et ignorés
+    """
+    if engine not in EVALUATION_ENGINES:
+        raise ValueError(f"Système '{engine}' non reconnu")
+    collaborative_recommender = recommender.collaborative_recommender
+    if relevance_threshold is not None:
+        test_df = test_df[test_df['rating'] >= relevance_threshold]
+
+    # Utilisateurs évaluables et nombre d'items pertinents de chacun (items inconnus du modèle compris)
+    n_relevant = test_df.groupby('user_id').size()
+    known = np.array([collaborative_recommender.user_index(user_id) is not None for user_id in n_relevant.index],
+                     dtype=bool)
+    user_ids = n_relevant.index[known]
+    n_relevant = n_relevant.to_numpy()[known]
+    user_indices = np.array([collaborative_recommender.user_index(user_id) for user_id in user_ids], dtype=np.int64)
+
+    # Clés triées (rang de l'utilisateur évalué, indice de l'item) des items pertinents connus
+    n_items = len(collaborative_recommender.item_ids)
+    user_rank = pd.Series(np.arange(len(user_ids)), index=user_ids)
+    test_df = test_df[test_df['user_id'].isin(user_ids)]
+    item_indices = collaborative_recommender.item_mapping.get_indexer(test_df['item_id'].to_numpy())
+    in_catalog = item_indices >= 0
+    relevant_keys = np.unique(user_rank[test_df['user_id'].to_numpy()[in_catalog]].to_numpy() * n_items
+                              + item_indices[in_catalog])
+
+    _evaluation_state.update({
+        'engine': engine, 'recommender': recommender, 'top_n': top_n, 'batch_size': batch_size,
+        'user_indices': user_indices, 'n_items': n_items,
+        'relevant_keys': relevant_keys if len(relevant_keys) else np.array([-1], dtype=np.int64)
+    })
+    try:
+        n_jobs = n_jobs or os.cpu_count() or 1
+        chunk = max(batch_size, -(-len(user_ids) // n_jobs))
+        bounds = [(start, min(start + chunk, len(user_ids))) for start in range(0, len(user_ids), chunk)]
+        if n_jobs > 1 and len(bounds) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            # Les processus héritent du modèle par fork (tableaux partagés en copie sur écriture)
+            with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('fork')) as pool:
+                results = list(pool.map(_evaluate_users, bounds))
+        else:
+            results = [_evaluate_users(current) for current in bounds]
+    finally:
+        _evaluation_state.clear()
+
+    hits = np.vstack([current[0] for current in results]) if results else np.zeros((0, top_n), dtype=bool)
+    recommended = np.unique(np.concatenate([current[1] for current in results])) if results else []
+    metrics = {name: float(values.mean()) if len(values) else 0.0
+               for name, values in ranking_metrics(hits, n_relevant).items()}
+    metrics['coverage'] = len(recommended) / n_items if n_items else 0.0
+    metrics['users_evaluated'] = int(len(user_ids))
+    metrics['users_skipped'] = int((~known).sum())
+    return metrics
+
+
+def run_evaluation(dataset_type, engine='hybrid', collaborative_method='item_based', split='temporal',
+                   test_fraction=0.2, top_n=10, relevance_threshold=None, n_jobs=None, seed=0, dtype=None):
+    """
+    Évaluation hors ligne complète d'un dataset: séparation des notes, entraînement
+    sur le jeu d'entraînement puis évaluation sur le jeu de test.
+
+    Args:
+        dataset_type: Type de dataset ('books' ou 'movies')
+        engine: Système évalué ('collaborative', 'content' ou 'hybrid')
+        collaborative_method: Méthode du filtrage collaboratif ('item_based', 'user_based' ou 'svd')
+        split: Séparation des notes ('temporal' ou 'random'; aléatoire si les notes n'ont pas de date)
+        test_fraction: Part des notes de chaque utilisateur mise de côté
+        top_n: Longueur des listes de recommandations
+        relevance_threshold: Note minimale d'un item de test pertinent (tous si None)
+        n_jobs: Nombre de processus de l'évaluation
+        seed: Graine de la séparation aléatoire
+        dtype: Précision des modèles (services.model_dtype si None)
+
+    Returns:
+        Rapport sérialisable en JSON (paramètres, métriques et durées)
+    """
+    timings = {}
+    start = time.perf_counter()
+    _, ratings_df = services.load_datasets(dataset_type)
+    if split == 'temporal' and 'timestamp' not in ratings_df.columns:
+        # Notes sans date (books): séparation aléatoire
+        print(f"Pas de colonne 'timestamp' dans les notes ({dataset_type}): séparation aléatoire")
+        split = 'random'
+    train_df, test_df = split_ratings(ratings_df, method=split, test_fraction=test_fraction, seed=seed)
+    timings['split'] = time.perf_counter() - start
+
+    # Modèles entraînés dans un répertoire temporaire: le cache de production et son
+    # budget disque ne sont ni remplis ni purgés par l'évaluation
+    with tempfile.TemporaryDirectory(prefix='evaluation-') as cache_dir:
+        start = time.perf_counter()
+        recommender = services.build_hybrid_recommender(
+            dataset_type,
+            weight_content=services.user_weight_content,
+            weight_collaborative=services.user_weight_collaborative,
+            dtype=dtype,
+            ratings_df=train_df,
+            collaborative_method=collaborative_method,
+            cache_dir=cache_dir
+        )
+        timings['fit'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        metrics = evaluate_recommender(recommender, test_df, engine=engine, top_n=top_n,
+                                       relevance_threshold=relevance_threshold, n_jobs=n_jobs)
+        timings['evaluate'] = time.perf_counter() - start
+
+    return {
+        'dataset': dataset_type,
+        'engine': engine,
+        'collaborative_method': collaborative_method,
+        'weights': {'content': services.user_weight_content,
+                    'collaborative': services.user_weight_collaborative},
+        'split': {'method': split, 'test_fraction': test_fraction, 'seed': seed,
+                  'train_ratings': int(len(train_df)), 'test_ratings': int(len(test_df))},
+        'top_n': top_n,
+        'relevance_threshold': relevance_threshold,
+        'metrics': metrics,
+        'timings': timings
+    }
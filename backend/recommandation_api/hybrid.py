@@ -1,7 +1,48 @@
+import numpy as np
 import pandas as pd
+import scipy.sparse as sp
+
+from . import metrics
+from .ranking import top_n_indices
+
+# Normalisations possibles des scores de chaque système avant combinaison
+SCORE_NORMALIZATIONS = ('none', 'max', 'minmax')
+
+
+def normalize_scores(scores, method='none'):
+    """
+    Normalise des scores (vecteur, ou matrice ligne par ligne) avant combinaison.
+
+    Args:
+        scores: Tableau numpy des scores (1 ou 2 dimensions)
+        method: 'none' (scores bruts), 'max' (division par le plus grand score absolu)
+            ou 'minmax' (ramène les scores dans [0, 1])
+
+    Returns:
+        Tableau numpy des scores normalisés
+    """
+    if method not in SCORE_NORMALIZATIONS:
+        raise ValueError(f"Normalisation inconnue: {method}. Valeurs possibles: {SCORE_NORMALIZATIONS}")
+    scores = np.asarray(scores, dtype=np.float64)
+    if method == 'none' or scores.size == 0:
+        return scores
+
+    if method == 'max':
+        offset = np.zeros(scores.shape[:-1] + (1,))
+        scale = np.abs(scores).max(axis=-1, keepdims=True)
+    else:
+        offset = scores.min(axis=-1, keepdims=True)
+        scale = scores.max(axis=-1, keepdims=True) - offset
+    # Un système sans variation de score ne départage aucun item
+    normalized = np.zeros(scores.shape)
+    np.divide(scores - offset, scale, out=normalized, where=scale > 0)
+    return normalized
+
+
 class HybridRecommender:
     def __init__(self, content_recommender, collaborative_recommender, 
-                 weight_content=0.5, weight_collaborative=0.5, item_data=None):
+                 weight_content=0.5, weight_collaborative=0.5, item_data=None, normalization='none',
+                 user_normalization='minmax'):
         """
         Initialise le système de recommandation hybride.
 
@@ -11,12 +52,36 @@ class HybridRecommender:
             weight_content: Poids pour la recommandation basée sur le contenu
             weight_collaborative: Poids pour la recommandation collaborative
             item_data: Dataset des donnée
+            normalization: Normalisation des similarités de chaque système avant la fusion
+                des items similaires ('none', 'max' ou 'minmax', voir normalize_scores)
+            user_normalization: Normalisation des vecteurs de scores de chaque système avant
+                combinaison pour un utilisateur. Les prédictions collaboratives sont sur l'échelle
+                des notes (0.5 à 5) et l'affinité de contenu dans [0, 1]: sans normalisation,
+                le contenu ne départage presque jamais les items.
         """
+        for current in (normalization, user_normalization):
+            if current not in SCORE_NORMALIZATIONS:
+                raise ValueError(f"Normalisation inconnue: {current}. Valeurs possibles: {SCORE_NORMALIZATIONS}")
         self.content_recommender = content_recommender
         self.collaborative_recommender = collaborative_recommender
         self.weight_content = weight_content
         self.weight_collaborative = weight_collaborative
         self.item_data = item_data
+        self.normalization = normalization
+        self.user_normalization = user_normalization
+
+        # Correspondance indices collaboratifs -> positions dans le système de contenu,
+        # sous forme de matrice creuse (n_items_collab x n_items_contenu)
+        collab_item_ids = collaborative_recommender.item_ids.tolist()
+        content_positions = np.array(
+            [content_recommender.item_positions.get(item_id, -1) for item_id in collab_item_ids],
+            dtype=np.int64
+        )
+        known = np.flatnonzero(content_positions >= 0)
+        self.collab_to_content = sp.csr_matrix(
+            (np.ones(len(known)), (known, content_positions[known])),
+            shape=(len(collab_item_ids), len(content_recommender.item_ids))
+        )
 
     def set_weights(self, weight_content, weight_collaborative):
         """
@@ -25,91 +90,254 @@ class HybridRecommender:
         self.weight_content = weight_content
         self.weight_collaborative = weight_collaborative
 
-    def recommend_for_user(self, user_id, top_n=5):
+    def _resolve_weights(self, weight_content=None, weight_collaborative=None):
+        """
+        Retourne les poids à utiliser pour un appel, sans modifier l'instance
+        (partagée entre les requêtes).
+        """
+        if weight_content is None:
+            weight_content = self.weight_content
+        if weight_collaborative is None:
+            weight_collaborative = self.weight_collaborative
+        return weight_content, weight_collaborative
+
+    def recommend_for_user(self, user_id, top_n=5, weight_content=None, weight_collaborative=None):
         """
         Recommande des items à un utilisateur en combinant les deux systèmes.
 
         Args:
             user_id: ID de l'utilisateur
             top_n: Nombre de recommandations à retourner
+            weight_content: Poids du contenu pour cet appel (poids de l'instance si None)
+            weight_collaborative: Poids collaboratif pour cet appel (poids de l'instance si None)
 
         Returns:
             DataFrame avec les items recommandés et leur score hybride
         """
-        # 1. Recommandations collaboratives
-        collab_recs = self.collaborative_recommender.recommend_for_user(user_id, top_n=top_n*2)
+        weight_content, weight_collaborative = self._resolve_weights(weight_content, weight_collaborative)
 
-        hybrid_scores = {}
+        user_idx = self.collaborative_recommender.user_index(user_id)
+        if user_idx is None:
+            raise ValueError(f"L'utilisateur avec l'ID {user_id} n'existe pas.")
 
-        # 2. Combiner avec contenu
-        for _, row in collab_recs.iterrows():
-            item_id = row['item_id']
-            collab_score = row.get('score', 1.0)
+        candidates = self._recommend_for_user_indices([user_id], [user_idx], top_n, weight_content, weight_collaborative)
+        return self._with_item_data(self._candidates_frame(candidates[user_id]))
 
-            # Cherche la similarité par contenu
-            content_recs = self.content_recommender.recommend(item_id, top_n=1)
-            if not content_recs.empty:
-                content_score = content_recs.iloc[0].get('similarity', 1.0)
-            else:
-                content_score = 0
+    def batch_recommend_for_users(self, user_ids, top_n=5, weight_content=None, weight_collaborative=None, batch_size=256):
+        """
+        Recommande des items à un lot d'utilisateurs, les scores de tout un bloc
+        d'utilisateurs étant calculés par produits matriciels.
 
-            # Score hybride
-            hybrid_score = (self.weight_collaborative * collab_score) + (self.weight_content * content_score)
-            hybrid_scores[item_id] = hybrid_score
+        Args:
+            user_ids: Liste des IDs utilisateurs
+            top_n: Nombre de recommandations par utilisateur
+            weight_content: Poids du contenu pour cet appel (poids de l'instance si None)
+            weight_collaborative: Poids collaboratif pour cet appel (poids de l'instance si None)
+            batch_size: Nombre d'utilisateurs traités par produit matriciel
 
-        # 3. Trier par score
-        sorted_items = sorted(hybrid_scores.items(), key=lambda x: x[1], reverse=True)
-        top_items = sorted_items[:top_n]
+        Returns:
+            Dictionnaire {user_id: DataFrame des items recommandés et leur score hybride};
+            les utilisateurs inconnus sont ignorés
+        """
+        return {
+            user_id: self._with_item_data(self._candidates_frame(candidates))
+            for user_id, candidates in self.recommendation_arrays(
+                user_ids, top_n, weight_content, weight_collaborative, batch_size).items()
+        }
+
+    def recommendation_arrays(self, user_ids, top_n=5, weight_content=None, weight_collaborative=None, batch_size=256):
+        """
+        Recommandations d'un lot d'utilisateurs (voir batch_recommend_for_users) sous forme
+        de tableaux, sans DataFrame ni jointure des informations des items.
+
+        Returns:
+            Dictionnaire {user_id: (IDs des items recommandés, scores hybrides)};
+            les utilisateurs inconnus sont ignorés
+        """
+        weight_content, weight_collaborative = self._resolve_weights(weight_content, weight_collaborative)
+
+        user_index = self.collaborative_recommender.user_index
+        known_ids = [user_id for user_id in user_ids if user_index(user_id) is not None]
+        results = {}
+        for start in range(0, len(known_ids), batch_size):
+            batch_ids = known_ids[start:start + batch_size]
+            user_indices = [user_index(user_id) for user_id in batch_ids]
+            results.update(self._recommend_for_user_indices(
+                batch_ids, user_indices, top_n, weight_content, weight_collaborative))
+        return results
+
+    @metrics.span('hybrid.score')
+    def score_users(self, user_indices, weight_content=None, weight_collaborative=None):
+        """
+        Calcule les scores hybrides de tous les items (espace des items collaboratifs)
+        pour un bloc d'utilisateurs:
+        score = poids_collaboratif * score collaboratif + poids_contenu * affinité de contenu,
+        l'affinité de contenu étant la similarité moyenne (pondérée par les notes)
+        de chaque item avec les items notés par l'utilisateur. Chaque vecteur est normalisé
+        (user_normalization) avant pondération. Un système de poids nul n'est pas calculé.
 
-        recommended_items = pd.DataFrame(top_items, columns=['item_id', 'hybrid_score'])
+        Args:
+            user_indices: Tableau des indices des utilisateurs dans le modèle collaboratif
+            weight_content: Poids du contenu (poids de l'instance si None)
+            weight_collaborative: Poids collaboratif (poids de l'instance si None)
+
+        Returns:
+            Tuple (matrice numpy (n_utilisateurs x n_items) des scores, matrice CSR des notes)
+        """
+        weight_content, weight_collaborative = self._resolve_weights(weight_content, weight_collaborative)
+        user_indices = np.asarray(user_indices, dtype=np.int64)
+        # Notes des utilisateurs, y compris les notes récentes de la couche delta
+        user_rows = self.collaborative_recommender.user_rows(user_indices)
+        hybrid_scores = np.zeros(user_rows.shape)
+
+        # 1. Vecteurs de scores collaboratifs (un produit matriciel pour tout le bloc)
+        if weight_collaborative:
+            collab_scores = self.collaborative_recommender.score_users(user_indices)
+            hybrid_scores += weight_collaborative * normalize_scores(collab_scores, self.user_normalization)
+
+        # 2. Vecteurs d'affinité de contenu avec le profil de chaque utilisateur,
+        #    ramenés dans l'espace des items collaboratifs
+        if weight_content:
+            content_scores = self.content_recommender.profile_scores(user_rows @ self.collab_to_content)
+            content_scores = np.asarray(self.collab_to_content @ content_scores.T).T
+            hybrid_scores += weight_content * normalize_scores(content_scores, self.user_normalization)
+        return hybrid_scores, user_rows
+
+    def _recommend_for_user_indices(self, user_ids, user_indices, top_n, weight_content, weight_collaborative):
+        """
+        Calcule les recommandations hybrides d'un bloc d'utilisateurs (voir score_users).
+
+        Returns:
+            Dictionnaire {user_id: (IDs des items recommandés, scores hybrides)}
+        """
+        hybrid_scores, user_rows = self.score_users(user_indices, weight_content, weight_collaborative)
+
+        results = {}
+        item_ids = self.collaborative_recommender.item_ids
+        for row, user_id in enumerate(user_ids):
+            # Exclure les items déjà notés par l'utilisateur
+            rated_items = user_rows[row].indices
+            top_items = top_n_indices(hybrid_scores[row], top_n, exclude=rated_items)
+            results[user_id] = (item_ids[top_items], hybrid_scores[row][top_items])
+        return results
+
+    @staticmethod
+    def _candidates_frame(candidates):
+        """Convertit un tuple (IDs des items, scores hybrides) en DataFrame."""
+        item_ids, hybrid_scores = candidates
+        return pd.DataFrame({'item_id': item_ids, 'hybrid_score': hybrid_scores})
+
+    @metrics.span('item_data')
+    def _with_item_data(self, recommended_items):
+        """
+        Joint les informations des items aux recommandations si elles sont disponibles.
+        """
         if self.item_data is not None:
             recommended_items = recommended_items.merge(self.item_data, on='item_id', how='left')
-
         return recommended_items
 
-    def recommend_similar_items(self, item_id, top_n=5):
+    def recommend_similar_items(self, item_id, top_n=5, weight_content=None, weight_collaborative=None):
         """
         Recommande des items similaires à un item donné en combinant les deux systèmes.
 
         Args:
             item_id: ID de l'item
             top_n: Nombre de recommandations à retourner
+            weight_content: Poids du contenu pour cet appel (poids de l'instance si None)
+            weight_collaborative: Poids collaboratif pour cet appel (poids de l'instance si None)
 
         Returns:
             DataFrame avec les items recommandés et leur score hybride
         """
+        weight_content, weight_collaborative = self._resolve_weights(weight_content, weight_collaborative)
+
         # 1. Recommandations par contenu
         content_recs = self.content_recommender.recommend(item_id, top_n=top_n*2)
+        content_candidates = (content_recs['item_id'].to_numpy(), content_recs['similarity_score'].to_numpy())
         
-        # 2. Recommandations par filtrage collaboratif (item-based ou SVD)
-        collab_recs = self.collaborative_recommender.recommend_similar_items(item_id, top_n=top_n*2)
+        # 2. Recommandations par filtrage collaboratif (item-based ou SVD); un item sans
+        #    note n'a pas de candidats collaboratifs: seuls ceux du contenu sont fusionnés
+        collab_candidates = None
+        if item_id in self.collaborative_recommender.item_mapping:
+            collab_recs = self.collaborative_recommender.recommend_similar_items(item_id, top_n=top_n*2)
+            collab_candidates = (collab_recs['item_id'].to_numpy(), collab_recs['similarity'].to_numpy())
+
+        return self._with_item_data(self._candidates_frame(self._fuse_similar_items(
+            content_candidates, collab_candidates, top_n, weight_content, weight_collaborative)))
+
+    def batch_recommend_similar_items(self, item_ids, top_n=5, weight_content=None, weight_collaborative=None):
+        """
+        Recommande des items similaires pour un lot d'items: les candidats par contenu et
+        collaboratifs de tout le lot sont calculés en une tranche de lignes (ou un produit
+        matriciel) par système, puis fusionnés item par item.
+
+        Args:
+            item_ids: Liste des IDs d'items
+            top_n: Nombre de recommandations par item
+            weight_content: Poids du contenu pour cet appel (poids de l'instance si None)
+            weight_collaborative: Poids collaboratif pour cet appel (poids de l'instance si None)
+
+        Returns:
+            Dictionnaire {item_id: DataFrame des items recommandés et leur score hybride};
+            les items inconnus du système de contenu sont ignorés
+        """
+        return {
+            item_id: self._with_item_data(self._candidates_frame(candidates))
+            for item_id, candidates in self.similar_item_arrays(
+                item_ids, top_n, weight_content, weight_collaborative).items()
+        }
 
-        hybrid_scores = {}
+    def similar_item_arrays(self, item_ids, top_n=5, weight_content=None, weight_collaborative=None):
+        """
+        Items similaires hybrides d'un lot d'items (voir batch_recommend_similar_items),
+        sous forme de tableaux, sans DataFrame ni jointure des informations des items.
 
-        # 3. Fusionner les deux
-        for _, row in content_recs.iterrows():
-            candidate_id = row['item_id']
-            content_score = row.get('similarity', 1.0)
+        Returns:
+            Dictionnaire {item_id: (IDs des items recommandés, scores hybrides)};
+            les items inconnus du système de contenu sont ignorés
+        """
+        weight_content, weight_collaborative = self._resolve_weights(weight_content, weight_collaborative)
 
-            # Vérifie si cet item existe aussi dans collab
-            collab_score_row = collab_recs[collab_recs['item_id'] == candidate_id]
-            if not collab_score_row.empty:
-                collab_score = collab_score_row.iloc[0].get('score', 1.0)
-            else:
-                collab_score = 0
+        content_recs = self.content_recommender.batch_recommend(item_ids, top_n=top_n*2)
+        collab_recs = self.collaborative_recommender.similar_item_arrays(item_ids, top_n=top_n*2)
+        return {
+            item_id: self._fuse_similar_items(content_candidates, collab_recs.get(item_id),
+                                              top_n, weight_content, weight_collaborative)
+            for item_id, content_candidates in content_recs.items()
+        }
 
-            hybrid_score = (self.weight_content * content_score) + (self.weight_collaborative * collab_score)
-            hybrid_scores[candidate_id] = hybrid_score
+    @metrics.span('hybrid.fuse')
+    def _fuse_similar_items(self, content_candidates, collab_candidates, top_n, weight_content, weight_collaborative):
+        """
+        Fusionne les candidats par contenu et collaboratifs d'un item, sur l'union
+        des deux listes: un candidat absent d'une liste y reçoit un score nul.
 
-        # 4. Trier par score
-        sorted_items = sorted(hybrid_scores.items(), key=lambda x: x[1], reverse=True)
-        top_items = sorted_items[:top_n]
+        Args:
+            content_candidates: Tuple (IDs, similarités) du système de contenu
+            collab_candidates: Tuple (IDs, similarités) du système collaboratif (ou None)
+            top_n: Nombre de recommandations à retourner
+            weight_content: Poids du contenu
+            weight_collaborative: Poids collaboratif
 
-        recommended_items = pd.DataFrame(top_items, columns=['item_id', 'hybrid_score'])
-        if self.item_data is not None:
-            recommended_items = recommended_items.merge(self.item_data, on='item_id', how='left')
+        Returns:
+            Tuple (IDs des items recommandés, scores hybrides), triés par score décroissant
+        """
+        content_ids, content_scores = content_candidates
+        content_scores = normalize_scores(content_scores, self.normalization)
+        if collab_candidates is None:
+            collab_ids, collab_scores = content_ids[:0], np.zeros(0)
+        else:
+            collab_ids, collab_scores = collab_candidates
+            collab_scores = normalize_scores(collab_scores, self.normalization)
 
-        return recommended_items
+        # Union des candidats (ordre de première apparition) et position de chaque candidat dans l'union
+        positions, candidate_ids = pd.factorize(np.concatenate([content_ids, collab_ids]))
+        hybrid_scores = np.zeros(len(candidate_ids))
+        np.add.at(hybrid_scores, positions[:len(content_ids)], weight_content * content_scores)
+        np.add.at(hybrid_scores, positions[len(content_ids):], weight_collaborative * collab_scores)
+
+        top_items = top_n_indices(hybrid_scores, top_n)
+        return np.asarray(candidate_ids)[top_items], hybrid_scores[top_items]
 
     def evaluate(self, user_test_df, top_n=10):
         """
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+
+def _last_occurrences(keys):
+    """
+    Positions de la dernière occurrence de chaque clé, triées par clé.
+    """
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    last = np.ones(len(keys), dtype=bool)
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=last[:-1])
+    return order[last]
+
+
+def read_ratings_chunked(path, user_id_col='user_id', item_id_col='item_id', rating_col='rating',
+                         min_item_count=1, chunksize=1_000_000):
+    """
+    Lit un fichier de notes CSV par blocs, sans jamais charger le fichier entier dans
+    un DataFrame pandas. Chaque bloc est dédoublonné puis conservé sous forme de tableaux
+    compacts (environ 20 octets par note: clé int64, position int64, note float32);
+    un seul dédoublonnage de l'ensemble des blocs est fait à la fin. La mémoire est
+    proportionnelle au nombre de notes distinctes de chaque bloc, et non au nombre de
+    lignes du fichier; le coût total est celui d'un tri des notes (O(N log N)).
+
+    Les doublons (utilisateur, item) sont supprimés en gardant la dernière note, puis
+    seuls les items ayant au moins `min_item_count` notes (après dédoublonnage) sont
+    conservés. Les notes retenues gardent l'ordre du fichier, comme avec
+    drop_duplicates(keep='last') suivi d'un filtre.
+
+    Args:
+        path: Chemin du fichier CSV
+        user_id_col: Nom de la colonne des IDs utilisateurs (entiers positifs)
+        item_id_col: Nom de la colonne des IDs d'items (entiers positifs)
+        rating_col: Nom de la colonne des notes
+        min_item_count: Nombre minimal de notes d'un item pour être conservé
+        chunksize: Nombre de lignes lues par bloc
+
+    Returns:
+        DataFrame (user_id_col, item_id_col, rating_col) en types compacts
+    """
+    dtypes = {user_id_col: np.int32, item_id_col: np.int32, rating_col: np.float32}
+    # Couples (utilisateur << 32 | item) de chaque bloc, avec la position de leur
+    # dernière occurrence dans le fichier et la note correspondante
+    key_blocks, position_blocks, rating_blocks = [], [], []
+    offset = 0
+
+    reader = pd.read_csv(path, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize)
+    for chunk in reader:
+        chunk_keys = chunk[user_id_col].to_numpy().astype(np.int64) << 32
+        chunk_keys |= chunk[item_id_col].to_numpy()
+
+        # Dernière note de chaque couple dans le bloc
+        last = _last_occurrences(chunk_keys)
+        key_blocks.append(chunk_keys[last])
+        position_blocks.append(last + offset)
+        rating_blocks.append(chunk[rating_col].to_numpy()[last])
+        offset += len(chunk)
+
+    keys = np.concatenate(key_blocks) if key_blocks else np.zeros(0, dtype=np.int64)
+    positions = np.concatenate(position_blocks) if position_blocks else np.zeros(0, dtype=np.int64)
+    ratings = np.concatenate(rating_blocks) if rating_blocks else np.zeros(0, dtype=np.float32)
+    del key_blocks, position_blocks, rating_blocks
+
+    # Dédoublonnage entre blocs: les blocs étant concaténés dans l'ordre du fichier,
+    # la dernière occurrence d'une clé (tri stable) est la plus récente
+    last = _last_occurrences(keys)
+    keys, positions, ratings = keys[last], positions[last], ratings[last]
+
+    # Ordre du fichier (position de la dernière occurrence de chaque couple)
+    order = np.argsort(positions)
+    del positions
+    keys, ratings = keys[order], ratings[order]
+    users = (keys >> 32).astype(np.int32)
+    items = (keys & 0xFFFFFFFF).astype(np.int32)
+    del keys, order
+
+    # Garder uniquement les items suffisamment notés
+    if min_item_count > 1 and len(items):
+        keep = np.bincount(items)[items] >= min_item_count
+        users, items, ratings = users[keep], items[keep], ratings[keep]
+
+    return pd.DataFrame({
+        user_id_col: users,
+        item_id_col: items,
+        rating_col: ratings
+    })
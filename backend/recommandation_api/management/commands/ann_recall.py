@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from recommandation_api import services
+from recommandation_api.ann import measure_recall
+from recommandation_api.collaborative import CollaborativeFilteringRecommender
+
+
+class Command(BaseCommand):
+    help = ("Mesure le rappel et la latence de l'index approché (IVF) des facteurs SVD "
+            "par rapport au calcul exact, pour plusieurs valeurs de ann_probes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset_type', choices=['books', 'movies'])
+        parser.add_argument('--lists', type=int, default=64,
+                            help="Nombre de listes de l'index (par défaut: 64)")
+        parser.add_argument('--probes', default='1,4,8,16,32',
+                            help="Valeurs de ann_probes mesurées, séparées par des virgules")
+        parser.add_argument('--sample', type=int, default=200,
+                            help="Nombre d'utilisateurs et d'items tirés au hasard (par défaut: 200)")
+        parser.add_argument('--top-n', type=int, default=10,
+                            help="Longueur des listes comparées (par défaut: 10)")
+        parser.add_argument('--json', action='store_true', help="Sortie JSON")
+
+    def handle(self, *args, **options):
+        dataset_type = options['dataset_type']
+        _, ratings_df = services.load_datasets(dataset_type)
+        recommender = CollaborativeFilteringRecommender(
+            ratings_df=ratings_df,
+            method='svd',
+            n_factors=50,
+            ann_lists=options['lists'],
+            dtype=services.model_dtype,
+            cache_dir=f'{services.dataset_path}/{dataset_type}/collaborative/',
+            cache_size_limit=services.cache_size_limit
+        )
+
+        rng = np.random.default_rng(0)
+        user_ids = rng.choice(recommender.user_ids, min(options['sample'], len(recommender.user_ids)), replace=False)
+        item_ids = rng.choice(recommender.item_ids, min(options['sample'], len(recommender.item_ids)), replace=False)
+        probes = [int(value) for value in options['probes'].split(',')]
+        report = measure_recall(recommender, user_ids.tolist(), item_ids.tolist(), options['top_n'], probes)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(f"{'probes':>8} {'rappel util.':>13} {'rappel items':>13} {'ms util.':>9} {'ms items':>9}")
+        for row in report:
+            self.stdout.write(f"{row['probes']:>8} {row['user_recall']:>13.3f} {row['item_recall']:>13.3f} "
+                              f"{row['user_ms']:>9.3f} {row['item_ms']:>9.3f}")
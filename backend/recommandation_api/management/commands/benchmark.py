@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from recommandation_api import benchmark, services
+
+
+class Command(BaseCommand):
+    help = ("Mesure les performances des recommandeurs (entraînement, chargement à froid et à chaud, "
+            "latences p50/p95/p99, pic mémoire) sur le dataset movies et sur un dataset synthétique "
+            "de la taille de books, et écrit les résultats en JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--datasets', nargs='+', choices=benchmark.BENCHMARK_DATASETS,
+                            default=list(benchmark.BENCHMARK_DATASETS),
+                            help="Datasets mesurés (par défaut: tous)")
+        parser.add_argument('--cases', nargs='+', default=None,
+                            help="Configurations mesurées (par défaut: toutes), par exemple collaborative_svd hybrid")
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help="Échelle du dataset synthétique (par défaut: 1, taille de books)")
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Graine du dataset synthétique et des requêtes (par défaut: 0)")
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Nombre de requêtes par mesure de latence (par défaut: 200)")
+        parser.add_argument('--dtype', default=services.model_dtype,
+                            help=f"Précision des modèles (par défaut: {services.model_dtype})")
+        parser.add_argument('--output', default='benchmark_results.json',
+                            help="Fichier des résultats JSON (par défaut: benchmark_results.json)")
+
+    def handle(self, *args, **options):
+        report = benchmark.run_benchmarks(
+            datasets=options['datasets'],
+            cases=options['cases'],
+            scale=options['scale'],
+            seed=options['seed'],
+            requests=options['requests'],
+            dtype=options['dtype'],
+            dataset_path=services.dataset_path
+        )
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+        self.stdout.write(f"{'dataset':<16} {'configuration':<26} {'fit s':>7} {'froid s':>8} {'chaud s':>8} "
+                          f"{'p50 ms':>7} {'p99 ms':>7} {'pic Mo':>7}")
+        for result in report['results']:
+            # Latence principale: recommandations utilisateur (items similaires pour le contenu)
+            latency = result['latency'].get('recommend_for_user') or result['latency'].get('recommend')
+            self.stdout.write(
+                f"{result['dataset']:<16} {result['case']:<26} {result['fit_s']:>7.2f} {result['cold_load_s']:>8.3f} "
+                f"{result['warm_load_s']:>8.3f} {latency['p50_ms']:>7.2f} {latency['p99_ms']:>7.2f} "
+                f"{result['peak_rss_mb']:>7.0f}")
+        self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['output']}"))
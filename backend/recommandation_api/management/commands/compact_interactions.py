@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recommandation_api import services
+
+
+class Command(BaseCommand):
+    help = ("Intègre les notes de la table Interaction au modèle de base d'un dataset "
+            "(nouvel artefact, couche delta vidée). À lancer périodiquement, par exemple via cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset_type', choices=['books', 'movies'])
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        interactions_until = services.compact_interactions(options['dataset_type'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Interactions compactées jusqu'à l'ID {interactions_until} en {time.perf_counter() - start:.1f}s"))
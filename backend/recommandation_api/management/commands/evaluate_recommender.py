@@ -0,0 +1,57 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand
+
+from recommandation_api import evaluation
+
+
+class Command(BaseCommand):
+    help = ("Évaluation hors ligne d'un système de recommandation: séparation temporelle ou "
+            "aléatoire des notes, entraînement puis métriques de classement (precision, recall, "
+            "NDCG, MAP, couverture) écrites dans un rapport JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset_type', choices=['books', 'movies'])
+        parser.add_argument('--engine', choices=evaluation.EVALUATION_ENGINES, default='hybrid',
+                            help="Système évalué (par défaut: hybrid)")
+        parser.add_argument('--method', choices=['item_based', 'user_based', 'svd'], default='item_based',
+                            help="Méthode du filtrage collaboratif (par défaut: item_based)")
+        parser.add_argument('--split', choices=evaluation.SPLIT_METHODS, default='temporal',
+                            help="Séparation des notes (par défaut: temporal)")
+        parser.add_argument('--test-fraction', type=float, default=0.2,
+                            help="Part des notes de chaque utilisateur mise de côté (par défaut: 0.2)")
+        parser.add_argument('--top-n', type=int, default=10,
+                            help="Longueur des listes évaluées (par défaut: 10)")
+        parser.add_argument('--relevance-threshold', type=float, default=None,
+                            help="Note minimale d'un item de test pertinent (par défaut: tous)")
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Graine de la séparation aléatoire (par défaut: 0)")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Nombre de processus de calcul (par défaut: nombre de coeurs)")
+        parser.add_argument('--output', default=None,
+                            help="Fichier du rapport JSON (sortie standard si absent)")
+
+    def handle(self, *args, **options):
+        report = evaluation.run_evaluation(
+            options['dataset_type'],
+            engine=options['engine'],
+            collaborative_method=options['method'],
+            split=options['split'],
+            test_fraction=options['test_fraction'],
+            top_n=options['top_n'],
+            relevance_threshold=options['relevance_threshold'],
+            n_jobs=options['workers'],
+            seed=options['seed']
+        )
+        content = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(content)
+            metrics = report['metrics']
+            self.stdout.write(self.style.SUCCESS(
+                f"Rapport écrit dans {options['output']}: precision@{report['top_n']}={metrics['precision']:.4f}, "
+                f"ndcg@{report['top_n']}={metrics['ndcg']:.4f}, {metrics['users_evaluated']} utilisateurs "
+                f"en {report['timings']['evaluate']:.1f}s"))
+        else:
+            self.stdout.write(content)
@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from recommandation_api import services
+from recommandation_api.precomputed import PrecomputedRecommendations
+
+# Recommandeur partagé avec les processus de calcul (hérité par fork, sans copie)
+_recommender = None
+
+
+# Les blocs retournent des tableaux (IDs des items, scores): seuls ces tableaux sont
+# stockés, sans jointure des informations des items ni DataFrame à renvoyer au parent
+def _user_block(user_ids, top_n, weight_content, weight_collaborative):
+    return _recommender.recommendation_arrays(
+        user_ids, top_n=top_n, weight_content=weight_content, weight_collaborative=weight_collaborative)
+
+
+def _item_block(item_ids, top_n, weight_content, weight_collaborative):
+    return _recommender.similar_item_arrays(
+        item_ids, top_n=top_n, weight_content=weight_content, weight_collaborative=weight_collaborative)
+
+
+class Command(BaseCommand):
+    help = ("Précalcule les top-N recommandations hybrides de tous les utilisateurs et de tous "
+            "les items d'un dataset, servies ensuite par simple lecture.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset_type', choices=['books', 'movies'])
+        parser.add_argument('--top-n', type=int, default=50,
+                            help="Longueur des listes stockées (par défaut: 50)")
+        parser.add_argument('--block-size', type=int, default=256,
+                            help="Nombre d'utilisateurs ou d'items par bloc de calcul (par défaut: 256)")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Nombre de processus de calcul (par défaut: nombre de coeurs)")
+
+    def _run_blocks(self, function, ids, options, weights):
+        blocks = [ids[start:start + options['block_size']] for start in range(0, len(ids), options['block_size'])]
+        results = {}
+        if options['workers'] <= 1:
+            for block in blocks:
+                results.update(function(block, options['top_n'], *weights))
+            return results
+
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=context) as executor:
+            futures = [executor.submit(function, block, options['top_n'], *weights) for block in blocks]
+            for future in futures:
+                results.update(future.result())
+        return results
+
+    def handle(self, *args, **options):
+        global _recommender
+        dataset_type = options['dataset_type']
+
+        start = time.perf_counter()
+        # Les processus de calcul sont créés par fork: pas de thread de recalcul en tâche
+        # de fond, les similarités touchées sont recalculées ici avant les blocs
+        services.disable_similarity_refresh()
+        _recommender = services.get_hybrid_recommender(dataset_type)
+        # Intégrer toutes les interactions enregistrées jusqu'ici: les utilisateurs ayant
+        # noté des items après cette lecture seront servis par le calcul en direct
+        services.sync_interactions(dataset_type, force=True)
+        interactions_until = services.interactions_read_until(dataset_type)
+        _recommender.collaborative_recommender.refresh_item_similarity()
+        # Les processus enfants ne doivent pas partager la connexion à la base
+        connections.close_all()
+        self.stdout.write(f"Modèle chargé en {time.perf_counter() - start:.1f}s")
+
+        # Utilisateurs du modèle de base et de la couche delta (notes non encore compactées)
+        collaborative_recommender = _recommender.collaborative_recommender
+        user_ids = collaborative_recommender.user_ids.tolist() + list(collaborative_recommender.delta_user_ids)
+        item_ids = _recommender.content_recommender.item_ids.tolist()
+
+        start = time.perf_counter()
+        user_weights = (services.user_weight_content, services.user_weight_collaborative)
+        user_recommendations = self._run_blocks(_user_block, user_ids, options, user_weights)
+        self.stdout.write(f"{len(user_recommendations)} utilisateurs calculés en {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        item_weights = (services.item_weight_content, services.item_weight_collaborative)
+        item_recommendations = self._run_blocks(_item_block, item_ids, options, item_weights)
+        self.stdout.write(f"{len(item_recommendations)} items calculés en {time.perf_counter() - start:.1f}s")
+
+        catalog = np.concatenate([
+            _recommender.collaborative_recommender.item_ids,
+            _recommender.content_recommender.item_ids
+        ])
+        directory = services.precomputed_dir(dataset_type)
+        PrecomputedRecommendations.save(
+            directory, catalog, user_recommendations, item_recommendations, options['top_n'],
+            metadata={
+                'user_weights': list(user_weights),
+                'item_weights': list(item_weights),
+                'normalization': _recommender.normalization,
+                'user_normalization': _recommender.user_normalization,
+                'interactions_until': interactions_until,
+                'created_at': time.time()
+            }
+        )
+        self.stdout.write(self.style.SUCCESS(f"Recommandations précalculées enregistrées dans {directory}"))
@@ -0,0 +1,264 @@
+import contextlib
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+# Bornes (en secondes) des histogrammes de durée
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Métriques du processus: chaque worker publie les siennes, agrégées par Prometheus
+_lock = threading.Lock()
+_stage_durations = {}
+_request_durations = {}
+_cache_requests = {}
+_model_loads = {}
+_local = threading.local()
+
+
+class Histogram:
+    """Histogramme de durées à bornes fixes (format Prometheus)."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = np.zeros(len(buckets) + 1, dtype=np.int64)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[np.searchsorted(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def copy(self):
+        histogram = Histogram(self.buckets)
+        histogram.counts = self.counts.copy()
+        histogram.sum = self.sum
+        return histogram
+
+    def cumulative_counts(self):
+        """Nombre d'observations inférieures ou égales à chaque borne (+Inf en dernier)."""
+        return np.cumsum(self.counts).tolist()
+
+
+def _observe(histograms, key, seconds):
+    with _lock:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+def observe_stage(stage, seconds):
+    """
+    Enregistre la durée d'une étape dans son histogramme et, pendant une requête
+    suivie par ServerTimingMiddleware, dans les durées de la requête.
+    """
+    _observe(_stage_durations, stage, seconds)
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextlib.contextmanager
+def span(stage):
+    """
+    Mesure la durée d'une étape (bloc `with` ou décorateur de fonction).
+
+    Args:
+        stage: Nom de l'étape ('load_datasets', 'collaborative.score', ...)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def record_cache(cache, hit):
+    """
+    Compte un accès à un cache.
+
+    Args:
+        cache: Nom du cache ('results', 'datasets', 'content_model', ...)
+        hit: True si la valeur a été trouvée dans le cache
+    """
+    key = (cache, 'hit' if hit else 'miss')
+    with _lock:
+        _cache_requests[key] = _cache_requests.get(key, 0) + 1
+
+
+def record_model_load(engine, source, seconds):
+    """
+    Enregistre la durée du dernier chargement d'un modèle.
+
+    Args:
+        engine: Nom du moteur ('content' ou 'collaborative')
+        source: 'cache' (artefact projeté en mémoire) ou 'fit' (entraînement)
+        seconds: Durée du chargement
+    """
+    with _lock:
+        _model_loads[(engine, source)] = seconds
+
+
+@contextlib.contextmanager
+def request_timings():
+    """
+    Collecte les durées des étapes exécutées dans le thread courant.
+
+    Returns:
+        Dictionnaire {étape: durée cumulée en secondes}, rempli à la sortie du bloc
+    """
+    timings = {}
+    previous = getattr(_local, 'timings', None)
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+def server_timing_header(timings, total=None):
+    """
+    Formate les durées d'une requête pour l'en-tête Server-Timing (en millisecondes).
+    """
+    entries = list(timings.items())
+    if total is not None:
+        entries.append(('total', total))
+    return ', '.join(f'{name};dur={seconds * 1000:.2f}' for name, seconds in entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Ajoute aux réponses l'en-tête Server-Timing (durée de chaque étape mesurée par
+    span pendant la requête) et enregistre la durée totale des requêtes par vue.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with request_timings() as timings:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = server_timing_header(timings, total)
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.url_name:
+            _observe(_request_durations, match.url_name, total)
+        return response
+
+
+def _nbytes(value, seen):
+    """Taille en octets des tableaux d'un attribut de modèle (chaque tableau compté une fois)."""
+    if value is None or id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if sp.issparse(value):
+        return sum(_nbytes(getattr(value, part, None), seen) for part in ('data', 'indices', 'indptr'))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=False).sum())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(part, seen) for part in value)
+    # QuantizedMatrix, IdMapping, IVFIndex: somme de leurs tableaux
+    if type(value).__module__.startswith(__package__) and hasattr(value, '__dict__'):
+        return sum(_nbytes(part, seen) for part in vars(value).values())
+    return 0
+
+
+def model_memory(recommender):
+    """
+    Taille des tableaux de chaque moteur d'un recommandeur hybride (les tableaux
+    projetés en mémoire sont comptés pour leur taille complète).
+
+    Returns:
+        Dictionnaire {moteur: octets}
+    """
+    seen = set()
+    engines = {
+        'content': recommender.content_recommender,
+        'collaborative': recommender.collaborative_recommender,
+    }
+    sizes = {name: sum(_nbytes(value, seen) for value in vars(engine).values())
+             for name, engine in engines.items()}
+    sizes['hybrid'] = sum(_nbytes(value, seen) for name, value in vars(recommender).items()
+                          if name not in ('content_recommender', 'collaborative_recommender'))
+    return sizes
+
+
+def _labels(**labels):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def _render_histograms(lines, name, help_text, label, histograms):
+    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for key, histogram in sorted(histograms.items()):
+        bounds = [f'{bound:g}' for bound in histogram.buckets] + ['+Inf']
+        for bound, count in zip(bounds, histogram.cumulative_counts()):
+            lines.append(f'{name}_bucket{_labels(**{label: key, "le": bound})} {count}')
+        lines.append(f'{name}_sum{_labels(**{label: key})} {histogram.sum:.6f}')
+        lines.append(f'{name}_count{_labels(**{label: key})} {histogram.count}')
+
+
+def render_metrics(recommenders=None):
+    """
+    Exporte les métriques du processus au format texte de Prometheus.
+
+    Args:
+        recommenders: Dictionnaire {dataset: HybridRecommender} des modèles chargés,
+            dont la taille mémoire est publiée
+
+    Returns:
+        Texte de l'exposition
+    """
+    with _lock:
+        stage_durations = {key: value.copy() for key, value in _stage_durations.items()}
+        request_durations = {key: value.copy() for key, value in _request_durations.items()}
+        cache_requests = dict(_cache_requests)
+        model_loads = dict(_model_loads)
+
+    lines = []
+    _render_histograms(lines, 'recommender_stage_duration_seconds',
+                       'Durée des étapes de recommandation.', 'stage', stage_durations)
+    _render_histograms(lines, 'recommender_request_duration_seconds',
+                       'Durée totale des requêtes par vue.', 'view', request_durations)
+
+    lines += ['# HELP recommender_cache_requests_total Accès aux caches.',
+              '# TYPE recommender_cache_requests_total counter']
+    for (cache, result), count in sorted(cache_requests.items()):
+        lines.append(f'recommender_cache_requests_total{_labels(cache=cache, result=result)} {count}')
+
+    lines += ['# HELP recommender_cache_hit_ratio Proportion des accès trouvés dans chaque cache.',
+              '# TYPE recommender_cache_hit_ratio gauge']
+    for cache in sorted({cache for cache, _ in cache_requests}):
+        hits = cache_requests.get((cache, 'hit'), 0)
+        ratio = hits / (hits + cache_requests.get((cache, 'miss'), 0))
+        lines.append(f'recommender_cache_hit_ratio{_labels(cache=cache)} {ratio:.6f}')
+
+    lines += ['# HELP recommender_model_load_seconds Durée du dernier chargement de chaque modèle.',
+              '# TYPE recommender_model_load_seconds gauge']
+    for (engine, source), seconds in sorted(model_loads.items()):
+        lines.append(f'recommender_model_load_seconds{_labels(engine=engine, source=source)} {seconds:.6f}')
+
+    lines += ['# HELP recommender_model_memory_bytes Taille des tableaux des modèles chargés.',
+              '# TYPE recommender_model_memory_bytes gauge']
+    for dataset, recommender in sorted((recommenders or {}).items()):
+        for engine, size in model_memory(recommender).items():
+            lines.append(f'recommender_model_memory_bytes{_labels(dataset=dataset, engine=engine)} {size}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    """Remet à zéro toutes les métriques du processus."""
+    with _lock:
+        for registry in (_stage_durations, _request_durations, _cache_requests, _model_loads):
+            registry.clear()
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+from .artifacts import artifact_exists, load_artifact, save_artifact
+
+
+class PrecomputedRecommendations:
+    """
+    Listes de recommandations précalculées (top-N par utilisateur et par item),
+    stockées sous forme de tableaux int32/float32 projetés en mémoire.
+    Servir une recommandation revient à lire une ligne de ces tableaux.
+
+    Les listes sont figées au moment du précalcul: les interactions suivantes ne les
+    modifient pas (voir services.precomputed_recommend_for_user pour les utilisateurs);
+    les listes d'items similaires ne sont mises à jour qu'en relançant la commande.
+    """
+
+    def __init__(self, arrays, metadata, item_data=None):
+        """
+        Args:
+            arrays: Tableaux de l'artefact (voir save)
+            metadata: Métadonnées de l'artefact (poids, top_n, ...)
+            item_data: DataFrame optionnel contenant les informations sur les items
+                (doit contenir une colonne 'item_id')
+        """
+        self.catalog = arrays['catalog']
+        self.user_ids = arrays['user_ids']
+        self.user_items = arrays['user_items']
+        self.user_scores = arrays['user_scores']
+        self.item_ids = arrays['item_ids']
+        self.item_items = arrays['item_items']
+        self.item_scores = arrays['item_scores']
+        self.metadata = metadata
+        self.top_n = metadata['top_n']
+        # Dernière interaction intégrée au modèle lors du précalcul (toutes les
+        # interactions sont considérées comme nouvelles pour un ancien instantané)
+        self.interactions_until = metadata.get('interactions_until', 0)
+        self.item_data = item_data
+        
+        # Informations des items indexées par ID, pour éviter une jointure à chaque lecture
+        self.item_details = None
+        if item_data is not None:
+            self.item_details = item_data.drop_duplicates('item_id').set_index('item_id')
+
+    @classmethod
+    def load(cls, directory, item_data=None):
+        """
+        Charge les recommandations précalculées d'un répertoire (None s'il n'existe pas).
+        """
+        if not artifact_exists(directory):
+            return None
+        arrays, metadata = load_artifact(directory)
+        return cls(arrays, metadata, item_data=item_data)
+
+    @staticmethod
+    def _to_arrays(ids, recommendations, catalog, top_n):
+        """
+        Convertit un dictionnaire {id: (IDs des items, scores hybrides)} en tableaux
+        triés par ID: positions des items dans le catalogue (-1 en bourrage) et scores.
+        """
+        ids = np.sort(np.asarray([key for key in ids if key in recommendations]))
+        items = np.full((len(ids), top_n), -1, dtype=np.int32)
+        scores = np.full((len(ids), top_n), np.nan, dtype=np.float32)
+        for row, key in enumerate(ids):
+            item_ids, hybrid_scores = recommendations[key]
+            length = min(len(item_ids), top_n)
+            items[row, :length] = np.searchsorted(catalog, item_ids[:length])
+            scores[row, :length] = hybrid_scores[:length]
+        return ids, items, scores
+
+    @classmethod
+    def save(cls, directory, catalog, user_recommendations, item_recommendations, top_n, metadata=None):
+        """
+        Sauvegarde des listes de recommandations précalculées.
+
+        Args:
+            directory: Répertoire de l'artefact
+            catalog: IDs de tous les items pouvant être recommandés
+            user_recommendations: Dictionnaire {user_id: (IDs des items, scores hybrides)}
+            item_recommendations: Dictionnaire {item_id: (IDs des items, scores hybrides)}
+            top_n: Longueur maximale des listes stockées
+            metadata: Métadonnées supplémentaires (poids utilisés, ...)
+        """
+        catalog = np.unique(np.asarray(catalog))
+        user_ids, user_items, user_scores = cls._to_arrays(
+            user_recommendations.keys(), user_recommendations, catalog, top_n)
+        item_ids, item_items, item_scores = cls._to_arrays(
+            item_recommendations.keys(), item_recommendations, catalog, top_n)
+        save_artifact(directory, {
+            'catalog': catalog,
+            'user_ids': user_ids,
+            'user_items': user_items,
+            'user_scores': user_scores,
+            'item_ids': item_ids,
+            'item_items': item_items,
+            'item_scores': item_scores
+        }, metadata={'top_n': top_n, **(metadata or {})})
+
+    def _lookup(self, ids, items, scores, key, top_n):
+        """
+        Lit la liste précalculée d'un ID (None si l'ID est absent ou si top_n dépasse
+        la longueur stockée).
+        """
+        if top_n > self.top_n:
+            return None
+        try:
+            row = np.searchsorted(ids, key)
+        except TypeError:
+            return None
+        if row >= len(ids) or ids[row] != key:
+            return None
+
+        positions = items[row, :top_n]
+        valid = positions >= 0
+        item_ids = self.catalog[positions[valid]]
+        hybrid_scores = scores[row, :top_n][valid].astype(np.float64)
+
+        if self.item_details is None:
+            return pd.DataFrame({'item_id': item_ids, 'hybrid_score': hybrid_scores})
+        recommended_items = self.item_details.reindex(item_ids).reset_index()
+        recommended_items.insert(1, 'hybrid_score', hybrid_scores)
+        return recommended_items
+
+    def recommend_for_user(self, user_id, top_n=5):
+        """
+        Retourne les recommandations précalculées d'un utilisateur (None si absentes).
+        """
+        return self._lookup(self.user_ids, self.user_items, self.user_scores, user_id, top_n)
+
+    def recommend_similar_items(self, item_id, top_n=5):
+        """
+        Retourne les items similaires précalculés d'un item (None si absents).
+        """
+        return self._lookup(self.item_ids, self.item_items, self.item_scores, item_id, top_n)
@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def top_n_indices(scores, top_n, exclude=None, mask=None):
+    """
+    Sélectionne les indices des top_n meilleurs scores, triés par score décroissant.
+    La sélection utilise np.partition (O(n)); seuls les top_n candidats sont triés.
+
+    Args:
+        scores: Vecteur numpy des scores (n'est jamais modifié)
+        top_n: Nombre d'indices à retourner
+        exclude: Indices (ou masque booléen) des éléments à exclure
+        mask: Masque booléen des éléments autorisés (tous si None)
+
+    Returns:
+        Tableau numpy des indices retenus (les éléments exclus ou de score -inf
+        ne sont jamais retournés, le résultat peut donc contenir moins de top_n indices)
+    """
+    scores = np.asarray(scores)
+    if exclude is not None or mask is not None:
+        scores = scores.astype(np.float64, copy=True)
+        if mask is not None:
+            scores[~np.asarray(mask, dtype=bool)] = -np.inf
+        if exclude is not None:
+            scores[exclude] = -np.inf
+
+    n = len(scores)
+    top_n = min(top_n, n)
+    if top_n <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if top_n < n:
+        # Seuil = top_n-ième meilleur score; à égalité au seuil, les plus petits indices sont retenus
+        threshold = np.partition(scores, n - top_n)[n - top_n]
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[:top_n - len(above)]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(n)
+
+    # Tri stable: à score égal, l'indice le plus petit passe en premier
+    candidates = np.sort(candidates)
+    order = np.argsort(-scores[candidates], kind='stable')
+    candidates = candidates[order]
+    return candidates[scores[candidates] > -np.inf]
@@ -61,4 +61,15 @@ class ItemRecommendParamsSerializer(serializers.Serializer):
     dataset_type = serializers.ChoiceField(choices=['books', 'movies'])
     top_n = serializers.IntegerField(required=False, default=5)
     # weight_content = serializers.FloatField(required=False, default=0.5)
-    # weight_collaborative = serializers.FloatField(required=False, default=0.5)
\ No newline at end of file
+    # weight_collaborative = serializers.FloatField(required=False, default=0.5)
+
+
+class BatchUserRecommendParamsSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    dataset_type = serializers.ChoiceField(choices=['books', 'movies'])
+    top_n = serializers.IntegerField(required=False, default=5)
+
+class BatchItemRecommendParamsSerializer(serializers.Serializer):
+    item_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+    dataset_type = serializers.ChoiceField(choices=['books', 'movies'])
+    top_n = serializers.IntegerField(required=False, default=5)
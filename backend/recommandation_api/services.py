@@ -1,31 +1,164 @@
+import json
 import os
+import threading
+import time
 
+import numpy as np
 import pandas as pd
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError
 from . import collaborative
 from . import content_based
 from . import hybrid
+from . import ingestion
+from . import metrics
+from .models import Interaction
+from .artifacts import MANIFEST_FILE, artifact_exists, load_frame, load_metadata, save_frame
+from .precomputed import PrecomputedRecommendations
 dataset_dir = '../../datasets/'
 script_dir = os.path.dirname(__file__)
 dataset_path = os.path.abspath(os.path.join(script_dir, dataset_dir))
 
-# Fonction pour charger les datasets dynamiquement
+# Budget disque de chaque répertoire de cache de modèles (éviction LRU au-delà)
+cache_size_limit = 2 * 1024 ** 3
+
+# Poids de combinaison utilisés par les vues (et par les recommandations précalculées)
+user_weight_content = 0.3
+user_weight_collaborative = 0.7
+item_weight_content = 0.5
+item_weight_collaborative = 0.5
+# Normalisation des scores de chaque système avant combinaison ('none', 'max' ou 'minmax'):
+# similarités des items similaires, et vecteurs de scores des recommandations utilisateur
+# (notes et affinités de contenu n'ont pas la même échelle)
+score_normalization = 'none'
+user_score_normalization = 'minmax'
+# Précision des matrices des modèles ('float32', 'float64', 'float16' ou 'int8', voir similarity.MODEL_DTYPES)
+model_dtype = 'float32'
+
+# Version du nettoyage des datasets: à incrémenter quand load_datasets change,
+# pour invalider les datasets nettoyés déjà sauvegardés
+dataset_cache_version = 2
+
+# Type des items Django (Item.content_type) correspondant à chaque dataset; les IDs des
+# utilisateurs et des items Django sont ceux des datasets
+interaction_content_types = {'books': 'book', 'movies': 'movie'}
+# Intervalle minimal (en secondes) entre deux lectures des nouvelles interactions
+interaction_sync_interval = 2.0
+# Délai (en secondes) avant le recalcul en tâche de fond des similarités touchées
+similarity_refresh_delay = 1.0
+# Recalculs en tâche de fond autorisés (désactivés avant un fork, voir disable_similarity_refresh)
+similarity_refresh_enabled = True
+
+# Registre des recommandeurs construits, partagés par toutes les requêtes du processus
+_recommenders = {}
+_interactions_state = {}
+_refresh_timers = {}
+_precomputed = {}
+_recommenders_locks = {}
+_registry_lock = threading.Lock()
+
+# Colonnes textuelles et colonnes filtrables du système de contenu de chaque dataset
+content_columns = {
+    'books': {'text_columns': ['description', 'genres', 'title'], 'filter_columns': ['genres', 'authors'],
+              'list_columns': ['authors']},
+    'movies': {'text_columns': ['title', 'genres', 'tag'], 'filter_columns': ['genres'], 'list_columns': []},
+}
+
+# Fichiers sources de chaque dataset
+dataset_sources = {
+    'books': ['books/books_enriched.csv', 'books/ratings.csv'],
+    'movies': ['movies/movies.csv', 'movies/tags.csv', 'movies/ratings.csv'],
+}
+
+
+def cleaned_dataset_dir(dataset_type):
+    """Répertoire des datasets nettoyés d'un type de dataset."""
+    return f'{dataset_path}/{dataset_type}/cleaned'
+
+
+def _sources_signature(dataset_type):
+    """
+    Signature des fichiers sources (taille et date de modification): elle change
+    dès qu'un CSV est remplacé ou modifié.
+    """
+    signature = []
+    for source in dataset_sources[dataset_type]:
+        stat = os.stat(os.path.join(dataset_path, source))
+        signature.append([source, stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def _compact_dtypes(df):
+    """
+    Convertit les colonnes d'un dataset nettoyé en types compacts: IDs en int32,
+    notes en float32 et genres en catégorie.
+    """
+    df = df.reset_index(drop=True)
+    for col in ('item_id', 'user_id'):
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+            if df[col].abs().max() <= np.iinfo(np.int32).max:
+                df[col] = df[col].astype(np.int32)
+    if 'rating' in df.columns:
+        df['rating'] = df['rating'].astype(np.float32)
+    if 'genres' in df.columns:
+        df['genres'] = df['genres'].astype('category')
+    return df
+
+
+@metrics.span('load_datasets')
 def load_datasets(dataset_type):
+    """
+    Charge les datasets nettoyés (contenu et notes) d'un type de dataset.
+
+    Le premier chargement lit et nettoie les CSV, puis sauvegarde les DataFrames
+    nettoyés au format colonne avec des types compacts; les chargements suivants
+    lisent directement cette sauvegarde, tant que les CSV sources n'ont pas changé.
+
+    Args:
+        dataset_type: Type de dataset ('books' ou 'movies')
+
+    Returns:
+        Tuple (DataFrame du contenu, DataFrame des notes)
+    """
+    if dataset_type not in dataset_sources:
+        raise ValueError("Invalid dataset type")
+
+    directory = cleaned_dataset_dir(dataset_type)
+    content_dir = os.path.join(directory, 'content')
+    ratings_dir = os.path.join(directory, 'ratings')
+    signature = {'version': dataset_cache_version, 'sources': _sources_signature(dataset_type)}
+
+    cached = all(artifact_exists(path) and load_metadata(path) == signature for path in (content_dir, ratings_dir))
+    metrics.record_cache('datasets', hit=cached)
+    if cached:
+        print("Datasets nettoyés chargés depuis le cache")
+    else:
+        content_df, ratings_df = _read_datasets(dataset_type)
+        save_frame(content_dir, _compact_dtypes(content_df), metadata=signature)
+        save_frame(ratings_dir, _compact_dtypes(ratings_df), metadata=signature)
+        print("Datasets nettoyés sauvegardés")
+
+    # Relire la sauvegarde même après l'avoir écrite: le premier appel retourne
+    # exactement les mêmes DataFrames que les suivants
+    content_df, _ = load_frame(content_dir)
+    ratings_df, _ = load_frame(ratings_dir)
+    return content_df, ratings_df
+
+
+# Fonction pour lire et nettoyer les datasets à partir des CSV
+def _read_datasets(dataset_type):
     if dataset_type == 'books':
         content_df = pd.read_csv(f'{dataset_path}/books/books_enriched.csv', usecols=["book_id", "best_book_id", "isbn","authors", "title", "description", "genres", "small_image_url"])
         content_df = content_df.rename(columns={'book_id': 'item_id'})
         content_df = content_df.drop_duplicates('title', ignore_index=True) # Suppression des titres doublons
         
-        ratings_df = pd.read_csv(f'{dataset_path}/books/ratings.csv', nrows=500000)
+        # Lecture par blocs de tout le fichier de notes: suppression des multiples notations
+        # d'un même livre par un utilisateur (dernière note gardée) et conservation
+        # des livres notés au moins 5 fois
+        ratings_df = ingestion.read_ratings_chunked(
+            f'{dataset_path}/books/ratings.csv', item_id_col='book_id', min_item_count=5)
         ratings_df = ratings_df.rename(columns={'book_id': 'item_id'})
-        # Supprimer les multiples notations d'un meme livre par un utilisateur
-        ratings_df = ratings_df.drop_duplicates(subset=['item_id', 'user_id'], ignore_index=True,  keep='last')
-
-        # Calculer le nombre de notes par item
-        item_counts = ratings_df['item_id'].value_counts()
-        # Garder uniquement les item_id qui ont été notés au moins 5 fois
-        items_to_keep = item_counts[item_counts >= 5].index
-        # Filtrer le dataset   F:\recommandation_system_G6\datasets\movies\movies.csv
-        ratings_df = ratings_df[ratings_df['item_id'].isin(items_to_keep)]
     elif dataset_type == 'movies':  
         content_df = pd.read_csv(f'{dataset_path}/movies/movies.csv')
         content_df = content_df.rename(columns={'movieId': 'item_id'})
@@ -52,23 +185,87 @@ def load_datasets(dataset_type):
         raise ValueError("Invalid dataset type")
     return content_df, ratings_df
 
-def build_hybrid_recommender(dataset_type, weight_content=0.5, weight_collaborative=0.5):
-    content_df, ratings_df = load_datasets(dataset_type)
-    if dataset_type == 'books':
-        text_columns = ['description','genres', 'title']
+def compaction_state_path(dataset_type):
+    """Fichier indiquant jusqu'à quelle interaction le modèle de base a été compacté."""
+    return f'{dataset_path}/{dataset_type}/interactions.json'
+
+
+def compacted_until(dataset_type):
+    """ID de la dernière interaction intégrée au modèle de base (0 si aucune compaction)."""
+    try:
+        with open(compaction_state_path(dataset_type)) as f:
+            return json.load(f)['compacted_until']
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+def load_interactions(dataset_type, after_id=0, until_id=None):
+    """
+    Lit les notes de la table Interaction pour un type de dataset (les clics sans note sont ignorés).
+
+    Args:
+        dataset_type: Type de dataset ('books' ou 'movies')
+        after_id: Ne lire que les interactions d'ID strictement supérieur
+        until_id: Ne lire que les interactions d'ID inférieur ou égal (toutes si None)
+
+    Returns:
+        DataFrame (id, user_id, item_id, rating) trié par ID
+    """
+    queryset = Interaction.objects.filter(
+        rating__isnull=False,
+        item__content_type=interaction_content_types[dataset_type],
+        id__gt=after_id
+    )
+    if until_id is not None:
+        queryset = queryset.filter(id__lte=until_id)
+    try:
+        rows = list(queryset.order_by('id').values_list('id', 'user_id', 'item_id', 'rating'))
+    except DatabaseError:
+        # Base de données indisponible ou non migrée: aucune interaction
+        rows = []
+    return pd.DataFrame(rows, columns=['id', 'user_id', 'item_id', 'rating'])
+
+
+@metrics.span('build_recommender')
+def build_hybrid_recommender(dataset_type, weight_content=0.5, weight_collaborative=0.5, interactions_until=None,
+                             dtype=None, ratings_df=None, collaborative_method='item_based', cache_dir=None):
+    content_df, dataset_ratings_df = load_datasets(dataset_type)
+    dtype = dtype or model_dtype
+    # Artefacts des modèles: cache du dataset, sauf répertoire dédié (évaluation hors ligne)
+    cache_dir = cache_dir or f'{dataset_path}/{dataset_type}'
+
+    # Notes fournies (jeu d'entraînement d'une évaluation hors ligne): utilisées telles quelles
+    if ratings_df is None:
+        ratings_df = dataset_ratings_df
+        # Intégrer aux notes les interactions déjà compactées; les suivantes sont
+        # ajoutées ensuite à la couche delta du modèle collaboratif
+        if interactions_until is None:
+            interactions_until = compacted_until(dataset_type)
     else:
-        text_columns = ['title','genres', 'tag']
+        interactions_until = 0
+    if interactions_until:
+        interactions = load_interactions(dataset_type, until_id=interactions_until)
+        interactions = interactions[interactions['item_id'].isin(content_df['item_id'])]
+        ratings_df = pd.concat([ratings_df, interactions[['user_id', 'item_id', 'rating']]], ignore_index=True)
+
     content_recommender = content_based.ContentBasedRecommender(
         dataframe=content_df,
-        text_columns=text_columns,
+        text_columns=content_columns[dataset_type]['text_columns'],
         weights= [0.4, 0.3, 0.3],
-        cache_dir=f'{dataset_path}/{dataset_type}/content/'    
+        similarity_mode='sparse',
+        filter_columns=content_columns[dataset_type]['filter_columns'],
+        list_columns=content_columns[dataset_type]['list_columns'],
+        dtype=dtype,
+        cache_dir=os.path.join(cache_dir, 'content'),
+        cache_size_limit=cache_size_limit
     )
     collaborative_recommender = collaborative.CollaborativeFilteringRecommender(
         ratings_df=ratings_df,
-        method='item_based',
+        method=collaborative_method,
         n_factors=50,
-        cache_dir=f'{dataset_path}/{dataset_type}/collaborative/'
+        dtype=dtype,
+        cache_dir=os.path.join(cache_dir, 'collaborative'),
+        cache_size_limit=cache_size_limit
     )
 
     hybrid_recommender = hybrid.HybridRecommender(
@@ -76,6 +273,392 @@ def build_hybrid_recommender(dataset_type, weight_content=0.5, weight_collaborat
         collaborative_recommender=collaborative_recommender,
         weight_content=weight_content,
         weight_collaborative=weight_collaborative,
-        item_data= content_df
+        item_data= content_df,
+        normalization=score_normalization,
+        user_normalization=user_score_normalization
     )
     return hybrid_recommender
+
+
+def get_hybrid_recommender(dataset_type):
+    """
+    Retourne le recommandeur hybride partagé pour un type de dataset.
+
+    Le modèle est construit (ou chargé depuis le cache disque) une seule fois par
+    processus, puis la même instance est servie en lecture seule à toutes les requêtes.
+    Les poids de combinaison sont passés à chaque appel de recommandation.
+
+    Args:
+        dataset_type: Type de dataset ('books' ou 'movies')
+
+    Returns:
+        Instance de HybridRecommender
+    """
+    recommender = _recommenders.get(dataset_type)
+    if recommender is not None:
+        return recommender
+
+    # Un verrou par dataset: la construction de 'books' ne bloque pas 'movies'
+    with _registry_lock:
+        lock = _recommenders_locks.setdefault(dataset_type, threading.Lock())
+
+    with lock:
+        recommender = _recommenders.get(dataset_type)
+        if recommender is None:
+            interactions_until = compacted_until(dataset_type)
+            recommender = build_hybrid_recommender(dataset_type, interactions_until=interactions_until)
+            _install_recommender(dataset_type, recommender, interactions_until)
+    sync_interactions(dataset_type)
+    return recommender
+
+
+def _install_recommender(dataset_type, recommender, interactions_until):
+    """Enregistre un recommandeur dans le registre, avec l'état de lecture des interactions."""
+    with _registry_lock:
+        _recommenders[dataset_type] = recommender
+        _interactions_state[dataset_type] = {
+            'compacted_until': interactions_until,
+            'last_id': interactions_until,
+            'synced_at': 0.0
+        }
+
+
+def interactions_read_until(dataset_type):
+    """ID de la dernière interaction intégrée au recommandeur partagé (0 s'il n'est pas construit)."""
+    state = _interactions_state.get(dataset_type)
+    return state['last_id'] if state else 0
+
+
+def loaded_recommenders():
+    """Retourne les recommandeurs déjà construits par ce processus ({dataset: HybridRecommender})."""
+    with _registry_lock:
+        return dict(_recommenders)
+
+
+def reset_recommenders(dataset_type=None):
+    """
+    Oublie les recommandeurs du registre pour forcer leur reconstruction.
+
+    Args:
+        dataset_type: Type de dataset à oublier (tous si None)
+    """
+    with _registry_lock:
+        if dataset_type is None:
+            _recommenders.clear()
+            _precomputed.clear()
+            _interactions_state.clear()
+        else:
+            _recommenders.pop(dataset_type, None)
+            _precomputed.pop(dataset_type, None)
+            _interactions_state.pop(dataset_type, None)
+
+
+@metrics.span('sync_interactions')
+def sync_interactions(dataset_type, force=False):
+    """
+    Ajoute à la couche delta du recommandeur partagé les interactions enregistrées
+    depuis la dernière lecture (y compris par d'autres processus). La lecture est limitée
+    à une fois toutes les interaction_sync_interval secondes; son coût dépend du
+    nombre de nouvelles interactions, pas de la taille du dataset.
+
+    Args:
+        dataset_type: Type de dataset ('books' ou 'movies')
+        force: Lire même si la dernière lecture est récente
+
+    Returns:
+        Nombre d'interactions lues
+    """
+    recommender = _recommenders.get(dataset_type)
+    state = _interactions_state.get(dataset_type)
+    if recommender is None or state is None:
+        return 0
+    now = time.monotonic()
+    if not force and now - state['synced_at'] < interaction_sync_interval:
+        return 0
+    state['synced_at'] = now
+
+    # Une compaction faite par un autre processus rend le modèle de base obsolète
+    if compacted_until(dataset_type) != state['compacted_until']:
+        reset_recommenders(dataset_type)
+        return 0
+
+    interactions = load_interactions(dataset_type, after_id=state['last_id'])
+    if interactions.empty:
+        return 0
+    collaborative_recommender = recommender.collaborative_recommender
+    for user_id, item_id, rating in interactions[['user_id', 'item_id', 'rating']].itertuples(index=False):
+        collaborative_recommender.add_rating(user_id, item_id, rating)
+    state['last_id'] = max(state['last_id'], int(interactions['id'].max()))
+
+    for user_id in interactions['user_id'].unique():
+        invalidate_user_recommendations(user_id)
+    _schedule_similarity_refresh(dataset_type, recommender)
+    return len(interactions)
+
+
+def record_interaction(interaction, deleted=False):
+    """
+    Répercute immédiatement une interaction créée, modifiée ou supprimée sur la couche
+    delta du recommandeur partagé de ce processus (s'il est déjà construit).
+    Une interaction déjà compactée dans le modèle de base n'en est retirée qu'à
+    la compaction suivante.
+
+    Args:
+        interaction: Instance de Interaction
+        deleted: L'interaction vient d'être supprimée
+    """
+    dataset_types = {content_type: dataset_type for dataset_type, content_type in interaction_content_types.items()}
+    try:
+        dataset_type = dataset_types.get(interaction.item.content_type)
+    except Interaction.item.RelatedObjectDoesNotExist:
+        return
+    recommender = _recommenders.get(dataset_type)
+    if recommender is None:
+        return
+
+    collaborative_recommender = recommender.collaborative_recommender
+    if deleted or interaction.rating is None:
+        collaborative_recommender.remove_rating(interaction.user_id, interaction.item_id)
+    else:
+        collaborative_recommender.add_rating(interaction.user_id, interaction.item_id, interaction.rating)
+    _schedule_similarity_refresh(dataset_type, recommender)
+
+
+def _schedule_similarity_refresh(dataset_type, recommender):
+    """
+    Planifie le recalcul en tâche de fond des similarités des items touchés par la couche
+    delta. Les notes reçues pendant le délai sont traitées ensemble.
+    """
+    with _registry_lock:
+        if not similarity_refresh_enabled or dataset_type in _refresh_timers:
+            return
+        timer = threading.Timer(similarity_refresh_delay, _refresh_similarity, args=(dataset_type, recommender))
+        timer.daemon = True
+        _refresh_timers[dataset_type] = timer
+    timer.start()
+
+
+def disable_similarity_refresh():
+    """
+    Désactive les recalculs de similarités en tâche de fond de ce processus, annule ceux
+    qui sont planifiés et attend la fin de ceux qui sont en cours. À appeler avant de
+    créer des processus par fork: aucun thread de recalcul ne détient alors de verrou
+    (registre, recommandeur) qui resterait pris dans les processus enfants. Les items
+    touchés restent à recalculer (refresh_item_similarity).
+    """
+    global similarity_refresh_enabled
+    with _registry_lock:
+        similarity_refresh_enabled = False
+        timers = list(_refresh_timers.values())
+        _refresh_timers.clear()
+    for timer in timers:
+        timer.cancel()
+        timer.join()
+
+
+def _refresh_similarity(dataset_type, recommender):
+    with _registry_lock:
+        _refresh_timers.pop(dataset_type, None)
+    try:
+        count = recommender.collaborative_recommender.refresh_item_similarity()
+    except Exception as e:
+        # Les items concernés restent à recalculer au prochain recalcul planifié
+        print(f"Erreur lors du recalcul des similarités ({dataset_type}): {e}")
+        return
+    if count:
+        print(f"Similarités recalculées pour {count} items ({dataset_type})")
+
+
+def compact_interactions(dataset_type):
+    """
+    Intègre toutes les notes de la table Interaction au modèle de base: le modèle est
+    réentraîné sur les notes du dataset et des interactions, puis sauvegardé comme
+    nouvel artefact et installé dans le registre avec une couche delta vide.
+    Les autres processus le chargent à leur prochaine lecture des interactions.
+    À lancer périodiquement (commande compact_interactions).
+
+    Args:
+        dataset_type: Type de dataset ('books' ou 'movies')
+
+    Returns:
+        ID de la dernière interaction intégrée
+    """
+    interactions = load_interactions(dataset_type)
+    interactions_until = int(interactions['id'].max()) if len(interactions) else compacted_until(dataset_type)
+    recommender = build_hybrid_recommender(dataset_type, interactions_until=interactions_until)
+
+    # Écriture atomique de l'état de compaction
+    state_path = compaction_state_path(dataset_type)
+    tmp_path = f'{state_path}.tmp-{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        json.dump({'compacted_until': interactions_until, 'compacted_at': time.time()}, f)
+    os.replace(tmp_path, state_path)
+
+    _install_recommender(dataset_type, recommender, interactions_until)
+    return interactions_until
+
+
+def precomputed_dir(dataset_type):
+    """Répertoire des recommandations précalculées d'un dataset."""
+    return f'{dataset_path}/{dataset_type}/precomputed'
+
+
+def get_precomputed_recommendations(dataset_type):
+    """
+    Retourne les recommandations précalculées partagées pour un type de dataset
+    (générées par la commande precompute_recommendations), ou None si elles n'existent pas.
+    Un nouvel instantané écrit par la commande est rechargé automatiquement.
+    Les informations des items sont lues dans les datasets nettoyés: le modèle
+    hybride n'est ni construit ni chargé.
+
+    Args:
+        dataset_type: Type de dataset ('books' ou 'movies')
+
+    Returns:
+        Instance de PrecomputedRecommendations ou None
+    """
+    manifest = os.path.join(precomputed_dir(dataset_type), MANIFEST_FILE)
+    version = os.path.getmtime(manifest) if os.path.exists(manifest) else None
+
+    cached = _precomputed.get(dataset_type)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    precomputed = None
+    if version is not None:
+        item_data, _ = load_datasets(dataset_type)
+        precomputed = PrecomputedRecommendations.load(precomputed_dir(dataset_type), item_data=item_data)
+    with _registry_lock:
+        _precomputed[dataset_type] = (version, precomputed)
+    return precomputed
+
+
+def has_new_ratings(dataset_type, user_id, after_id):
+    """
+    Indique si un utilisateur a enregistré des notes d'ID supérieur à after_id
+    (une base de données indisponible est considérée comme sans nouvelle note).
+    """
+    queryset = Interaction.objects.filter(
+        user_id=user_id,
+        rating__isnull=False,
+        item__content_type=interaction_content_types[dataset_type],
+        id__gt=after_id
+    )
+    try:
+        return queryset.exists()
+    except DatabaseError:
+        return False
+
+
+def precomputed_recommend_for_user(dataset_type, user_id, top_n=5):
+    """
+    Recommandations précalculées d'un utilisateur, ou None si elles sont absentes ou
+    obsolètes: un utilisateur ayant noté des items depuis le précalcul (notes absentes
+    de l'instantané, voir la couche delta) doit être servi par le calcul en direct.
+    Seules les nouvelles notes sont détectées: la modification d'une note plus ancienne
+    n'est prise en compte qu'au précalcul suivant.
+
+    Args:
+        dataset_type: Type de dataset ('books' ou 'movies')
+        user_id: ID de l'utilisateur
+        top_n: Nombre de recommandations à retourner
+
+    Returns:
+        DataFrame avec les items recommandés et leur score hybride, ou None
+    """
+    precomputed = get_precomputed_recommendations(dataset_type)
+    if precomputed is None or has_new_ratings(dataset_type, user_id, precomputed.interactions_until):
+        return None
+    return precomputed.recommend_for_user(user_id, top_n=top_n)
+
+
+def _result_cache():
+    """Cache des résultats de recommandation (alias 'recommendations' s'il est configuré)."""
+    return caches['recommendations' if 'recommendations' in settings.CACHES else 'default']
+
+
+def _user_cache_version(user_id):
+    """
+    Version des résultats en cache d'un utilisateur. Elle change à chaque nouvelle
+    interaction, ce qui rend ses anciennes entrées inaccessibles (elles expirent ensuite).
+    """
+    cache = _result_cache()
+    key = f'recommendations:user-version:{user_id}'
+    # Version initiale unique: si la clé est évincée, les anciennes entrées ne sont pas réutilisées
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key, 0)
+
+
+def invalidate_user_recommendations(user_id):
+    """
+    Invalide les recommandations en cache d'un utilisateur (après une nouvelle interaction).
+    """
+    cache = _result_cache()
+    key = f'recommendations:user-version:{user_id}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def recommend_for_user(dataset_type, user_id, top_n=5, weight_content=None, weight_collaborative=None):
+    """
+    Recommandations hybrides d'un utilisateur, servies depuis le cache de résultats
+    quand une réponse identique a déjà été calculée.
+
+    Args:
+        dataset_type: Type de dataset ('books' ou 'movies')
+        user_id: ID de l'utilisateur
+        top_n: Nombre de recommandations à retourner
+        weight_content: Poids du contenu
+        weight_collaborative: Poids collaboratif
+
+    Returns:
+        DataFrame avec les items recommandés et leur score hybride
+    """
+    cache = _result_cache()
+    key = (f'recommendations:user:{dataset_type}:{user_id}:{_user_cache_version(user_id)}:'
+           f'{top_n}:{weight_content}:{weight_collaborative}')
+    with metrics.span('result_cache'):
+        df = cache.get(key)
+    metrics.record_cache('results', hit=df is not None)
+    if df is None:
+        df = get_hybrid_recommender(dataset_type).recommend_for_user(
+            user_id=user_id,
+            top_n=top_n,
+            weight_content=weight_content,
+            weight_collaborative=weight_collaborative
+        )
+        cache.set(key, df)
+    return df
+
+
+def recommend_similar_items(dataset_type, item_id, top_n=5, weight_content=None, weight_collaborative=None):
+    """
+    Items similaires à un item, servis depuis le cache de résultats quand une réponse
+    identique a déjà été calculée.
+
+    Args:
+        dataset_type: Type de dataset ('books' ou 'movies')
+        item_id: ID de l'item
+        top_n: Nombre de recommandations à retourner
+        weight_content: Poids du contenu
+        weight_collaborative: Poids collaboratif
+
+    Returns:
+        DataFrame avec les items recommandés et leur score hybride
+    """
+    cache = _result_cache()
+    key = f'recommendations:item:{dataset_type}:{item_id}:{top_n}:{weight_content}:{weight_collaborative}'
+    with metrics.span('result_cache'):
+        df = cache.get(key)
+    metrics.record_cache('results', hit=df is not None)
+    if df is None:
+        df = get_hybrid_recommender(dataset_type).recommend_similar_items(
+            item_id=item_id,
+            top_n=top_n,
+            weight_content=weight_content,
+            weight_collaborative=weight_collaborative
+        )
+        cache.set(key, df)
+    return df
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Interaction
+from .services import invalidate_user_recommendations, record_interaction
+
+
+@receiver(post_save, sender=Interaction)
+@receiver(post_delete, sender=Interaction)
+def invalidate_recommendations_on_interaction(sender, instance, **kwargs):
+    """
+    Une nouvelle interaction (note, clic) rend obsolètes les recommandations
+    en cache de l'utilisateur concerné.
+    """
+    invalidate_user_recommendations(instance.user_id)
+
+
+@receiver(post_save, sender=Interaction)
+def record_interaction_on_save(sender, instance, **kwargs):
+    """
+    Une nouvelle note est ajoutée à la couche delta du modèle collaboratif,
+    et influence les recommandations sans réentraînement.
+    """
+    record_interaction(instance)
+
+
+@receiver(post_delete, sender=Interaction)
+def record_interaction_on_delete(sender, instance, **kwargs):
+    record_interaction(instance, deleted=True)
@@ -0,0 +1,273 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+def top_k_similarity(vectors, k, block_size=512):
+    """
+    Calcule, bloc de lignes par bloc de lignes, la similarité par produit scalaire
+    vectors · vectors.T en ne conservant que les k voisins positifs les plus proches
+    de chaque ligne (la similarité d'une ligne avec elle-même est ignorée).
+    La matrice complète n x n n'est jamais matérialisée.
+
+    Pour une similarité cosinus, les lignes de `vectors` doivent être normalisées (L2).
+
+    Args:
+        vectors: Matrice (dense ou creuse) des vecteurs, une ligne par élément
+        k: Nombre maximal de voisins conservés par ligne
+        block_size: Nombre de lignes traitées à la fois
+
+    Returns:
+        Matrice CSR n x n (indices int32, valeurs float32) des k plus proches voisins
+    """
+    vectors = sp.csr_matrix(vectors) if sp.issparse(vectors) else np.asarray(vectors)
+    n = vectors.shape[0]
+    k = max(0, min(k, n - 1))
+
+    indices_blocks = []
+    data_blocks = []
+    counts = np.zeros(n, dtype=np.int64)
+
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        block = vectors[start:end] @ vectors.T
+        block = block.toarray() if sp.issparse(block) else np.asarray(block)
+
+        # Ignorer la similarité de chaque élément avec lui-même
+        rows = np.arange(end - start)
+        block[rows, rows + start] = 0
+
+        if k == 0:
+            continue
+
+        counts[start:end], indices, data = _select_top_k(block, k)
+        indices_blocks.append(indices)
+        data_blocks.append(data)
+
+    return _assemble_csr(counts, indices_blocks, data_blocks, n)
+
+
+def _select_top_k(block, k):
+    """
+    Sélectionne les k plus grandes valeurs positives de chaque ligne d'un bloc dense.
+
+    Returns:
+        Tuple (nombre de voisins retenus par ligne, indices int32, valeurs float32),
+        les voisins de chaque ligne étant triés par similarité décroissante
+    """
+    # Sélectionner les k meilleurs voisins de chaque ligne sans trier toute la ligne
+    top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(block, top, axis=1)
+
+    # Trier les voisins par similarité décroissante et garder les valeurs positives
+    order = np.argsort(-values, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    values = np.take_along_axis(values, order, axis=1)
+    positive = values > 0
+    return positive.sum(axis=1), top[positive].astype(np.int32), values[positive].astype(np.float32)
+
+
+def _assemble_csr(counts, indices_blocks, data_blocks, n_columns):
+    indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    if indptr[-1] <= np.iinfo(np.int32).max:
+        indptr = indptr.astype(np.int32)
+
+    indices = np.concatenate(indices_blocks) if indices_blocks else np.zeros(0, dtype=np.int32)
+    data = np.concatenate(data_blocks) if data_blocks else np.zeros(0, dtype=np.float32)
+    return sp.csr_matrix((data, indices, indptr), shape=(len(counts), n_columns))
+
+
+def top_k_similarity_rows(similarities, k):
+    """
+    Conserve les k voisins positifs les plus proches de chaque ligne d'une matrice
+    dense de similarités déjà calculée (mise à jour de quelques lignes d'une matrice
+    produite par top_k_similarity).
+
+    Args:
+        similarities: Matrice numpy (n_lignes x n) des similarités
+        k: Nombre maximal de voisins conservés par ligne
+
+    Returns:
+        Matrice CSR n_lignes x n (indices int32, valeurs float32)
+    """
+    similarities = np.asarray(similarities)
+    n_rows, n_columns = similarities.shape
+    k = max(0, min(k, n_columns - 1))
+    if k == 0 or n_rows == 0:
+        return _assemble_csr(np.zeros(n_rows, dtype=np.int64), [], [], n_columns)
+    counts, indices, data = _select_top_k(similarities, k)
+    return _assemble_csr(counts, [indices], [data], n_columns)
+
+
+# Précisions de stockage des modèles: 'float64' et 'float32' pour toutes les matrices;
+# 'float16' et 'int8' réduisent en plus le stockage des matrices de similarité
+# (les autres matrices restent alors en float32)
+MODEL_DTYPES = ('float64', 'float32', 'float16', 'int8')
+
+
+def compute_dtype(dtype):
+    """
+    Retourne le type numpy des matrices calculées (notes, facteurs, TF-IDF) pour une précision.
+    """
+    if dtype not in MODEL_DTYPES:
+        raise ValueError(f"Précision '{dtype}' non reconnue")
+    return np.float64 if dtype == 'float64' else np.float32
+
+
+class QuantizedMatrix:
+    """
+    Matrice de similarité stockée en précision réduite:
+    - float16 (matrice dense uniquement, scipy ne gère pas les matrices creuses float16);
+    - int8 avec un facteur d'échelle par ligne: valeur = code * échelle[ligne],
+      l'échelle valant le maximum (en valeur absolue) de la ligne divisé par 127.
+
+    L'indexation retourne des valeurs float32 (tableau numpy ou matrice CSR selon le
+    stockage) et les produits matriciels sont calculés par blocs, de sorte que la
+    matrice complète n'est jamais convertie d'un seul coup.
+    """
+
+    def __init__(self, values, scales=None, block_size=2 ** 24):
+        """
+        Args:
+            values: Tableau numpy float16 ou int8, ou matrice CSR int8
+            scales: Facteurs d'échelle float32 de chaque ligne (stockage int8)
+            block_size: Nombre de valeurs converties en float32 à la fois par les produits
+        """
+        self.values = values
+        self.scales = scales
+        self.block_size = block_size
+
+    @classmethod
+    def quantize(cls, matrix, dtype):
+        """
+        Convertit une matrice (dense ou CSR) dans la précision réduite demandée.
+
+        Args:
+            matrix: Matrice numpy ou creuse des similarités
+            dtype: 'float16' ou 'int8'
+
+        Returns:
+            Instance de QuantizedMatrix
+        """
+        if dtype == 'float16':
+            return cls(np.asarray(matrix, dtype=np.float16))
+
+        if sp.issparse(matrix):
+            matrix = sp.csr_matrix(matrix, dtype=np.float32)
+            row_max = np.asarray(abs(matrix).max(axis=1).todense()).ravel()
+        else:
+            matrix = np.asarray(matrix, dtype=np.float32)
+            row_max = np.abs(matrix).max(axis=1, initial=0)
+        scales = (row_max / 127).astype(np.float32)
+        inverse = np.divide(1, scales, out=np.zeros_like(scales), where=scales > 0)
+
+        if sp.issparse(matrix):
+            values = sp.csr_matrix(matrix, copy=True)
+            values.data = np.rint(values.data * np.repeat(inverse, np.diff(values.indptr)))
+            values = values.astype(np.int8)
+        else:
+            # Conversion par blocs de lignes (pas de copie float32 intermédiaire complète)
+            values = np.empty(matrix.shape, dtype=np.int8)
+            step = max(1, 2 ** 22 // max(1, matrix.shape[1]))
+            for start in range(0, matrix.shape[0], step):
+                block = slice(start, start + step)
+                values[block] = np.rint(matrix[block] * inverse[block, np.newaxis])
+        return cls(values, scales)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def dtype(self):
+        return np.dtype(np.float32)
+
+    def __getitem__(self, key):
+        part = self.values[key]
+        if self.scales is None:
+            return part.astype(np.float32)
+
+        row_scales = self.scales[key[0] if isinstance(key, tuple) else key]
+        if sp.issparse(part):
+            return sp.csr_matrix(sp.diags(np.atleast_1d(row_scales)) @ part, dtype=np.float32)
+        if np.ndim(part) == 2:
+            row_scales = np.asarray(row_scales).reshape(-1, 1)
+        return (part * row_scales).astype(np.float32)
+
+    def _block_rows(self):
+        return max(1, self.block_size // max(1, self.shape[1]))
+
+    def __matmul__(self, other):
+        """Produit self @ other, calculé par blocs de lignes."""
+        step = self._block_rows()
+        blocks = [self[start:start + step] @ other for start in range(0, self.shape[0], step)]
+        if all(sp.issparse(block) for block in blocks):
+            return sp.vstack(blocks, format='csr')
+        return np.vstack([block.toarray() if sp.issparse(block) else np.asarray(block) for block in blocks])
+
+    def __rmatmul__(self, other):
+        """Produit other @ self, calculé par blocs de colonnes."""
+        step = max(1, self.block_size // max(1, self.shape[0]))
+        blocks = [other @ self[:, start:start + step] for start in range(0, self.shape[1], step)]
+        if all(sp.issparse(block) for block in blocks):
+            return sp.hstack(blocks, format='csr')
+        return np.hstack([block.toarray() if sp.issparse(block) else np.asarray(block) for block in blocks])
+
+    def dequantize(self):
+        """Retourne la matrice complète en float32."""
+        return self[:]
+
+    def arrays(self, name):
+        """Tableaux de la matrice, pour les sauvegarder avec le modèle."""
+        arrays = {name: self.values}
+        if self.scales is not None:
+            arrays[f'{name}_scales'] = self.scales
+        return arrays
+
+
+def store_similarity(matrix, dtype):
+    """
+    Convertit une matrice de similarité (dense ou CSR) dans sa précision de stockage.
+
+    Args:
+        matrix: Matrice numpy ou creuse (None accepté)
+        dtype: Précision du modèle (voir MODEL_DTYPES)
+
+    Returns:
+        Matrice numpy, matrice CSR ou QuantizedMatrix
+    """
+    if matrix is None or isinstance(matrix, QuantizedMatrix):
+        return matrix
+    if dtype == 'int8' or (dtype == 'float16' and not sp.issparse(matrix)):
+        return QuantizedMatrix.quantize(matrix, dtype)
+    return matrix.astype(compute_dtype(dtype), copy=False)
+
+
+def is_sparse_similarity(matrix):
+    """Indique si une matrice de similarité (éventuellement en précision réduite) est creuse."""
+    return sp.issparse(matrix.values if isinstance(matrix, QuantizedMatrix) else matrix)
+
+
+def full_precision(matrix):
+    """Retourne une matrice de similarité en pleine précision (float32 si elle est réduite)."""
+    return matrix.dequantize() if isinstance(matrix, QuantizedMatrix) else matrix
+
+
+def similarity_arrays(name, matrix):
+    """Tableaux d'une matrice de similarité à sauvegarder dans un artefact."""
+    if isinstance(matrix, QuantizedMatrix):
+        return matrix.arrays(name)
+    return {name: matrix}
+
+
+def load_similarity(arrays, name):
+    """
+    Reconstruit une matrice de similarité à partir des tableaux d'un artefact
+    (None si elle est absente).
+    """
+    matrix = arrays.get(name)
+    if f'{name}_scales' in arrays:
+        return QuantizedMatrix(matrix, arrays[f'{name}_scales'])
+    if matrix is not None and not sp.issparse(matrix) and matrix.dtype == np.float16:
+        return QuantizedMatrix(matrix)
+    return matrix
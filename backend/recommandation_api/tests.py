@@ -1,3 +1,1000 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from .ann import measure_recall
+from .artifacts import MANIFEST_FILE, evict_artifacts, load_frame, save_artifact, save_frame, touch_artifact
+from .benchmark import synthetic_books
+from .collaborative import CollaborativeFilteringRecommender
+from .content_based import ContentBasedRecommender
+from .evaluation import ranking_metrics, run_evaluation, split_ratings
+from .hybrid import HybridRecommender
+from .ingestion import read_ratings_chunked
+from .ranking import top_n_indices
+from . import metrics
+from . import services
+from .models import CustomUser, Interaction, Item
+from .precomputed import PrecomputedRecommendations
+from .similarity import QuantizedMatrix, full_precision, store_similarity
+
+
+def synthetic_ratings(n_ratings=4000, n_users=300, n_items=200, seed=0):
+    """Notes aléatoires (0.5 à 5 étoiles) pour les tests."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'user_id': rng.integers(0, n_users, n_ratings),
+        'item_id': rng.integers(0, n_items, n_ratings),
+        'rating': rng.integers(1, 11, n_ratings) / 2
+    })
+
+
+def synthetic_items(n_items=300, seed=0):
+    """Descriptions aléatoires tirées d'un petit vocabulaire, pour les tests."""
+    rng = np.random.default_rng(seed)
+    vocabulary = [f'word{i}' for i in range(120)]
+    return pd.DataFrame({
+        'item_id': np.arange(n_items),
+        'description': [' '.join(rng.choice(vocabulary, 8)) for _ in range(n_items)]
+    })
+
+
+def dense_ratings(model):
+    """Matrice dense (utilisateurs x items) des notes d'un modèle collaboratif, dans l'ordre de ses indices."""
+    matrix = np.zeros((len(model.user_ids), len(model.item_ids)))
+    users = model.user_mapping.get_indexer(model.ratings_df['user_id'].to_numpy())
+    items = model.item_mapping.get_indexer(model.ratings_df['item_id'].to_numpy())
+    matrix[users, items] = model.ratings_df['rating'].to_numpy()
+    return matrix
+
+
+class CollaborativeScoringTests(SimpleTestCase):
+    """
+    Régression des scores collaboratifs vectorisés: mêmes recommandations que le
+    calcul de référence (boucle sur les items et tri complet des scores).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ratings = synthetic_ratings().drop_duplicates(['user_id', 'item_id'], keep='last')
+
+    def test_top_n_indices_matches_full_sort(self):
+        rng = np.random.default_rng(6)
+        # Scores arrondis: beaucoup d'égalités, départagées par le plus petit indice
+        scores = np.round(rng.random(500), 2)
+        exclude = rng.choice(500, 50, replace=False)
+        reference = np.argsort(-scores, kind='stable')
+        reference = reference[~np.isin(reference, exclude)]
+        for top_n in (1, 10, 100, 450, 600):
+            with self.subTest(top_n=top_n):
+                np.testing.assert_array_equal(top_n_indices(scores, top_n, exclude=exclude), reference[:top_n])
+
+    def test_item_based_recommendations_match_reference(self):
+        model = CollaborativeFilteringRecommender(self.ratings, method='item_based', dtype='float64')
+        matrix = dense_ratings(model)
+        similarity = cosine_similarity(matrix.T)
+        np.fill_diagonal(similarity, 0)
+        similarity[similarity < 0] = 0
+
+        for user_id in model.user_ids[:20]:
+            user_ratings = matrix[model.user_index(user_id)]
+            rated = np.flatnonzero(user_ratings > 0)
+            scores = np.zeros(len(user_ratings))
+            for item_idx in range(len(user_ratings)):
+                sim_sum = np.abs(similarity[item_idx, rated]).sum()
+                if sim_sum > 0:
+                    scores[item_idx] = (similarity[item_idx, rated] * user_ratings[rated]).sum() / sim_sum
+            scores[rated] = -np.inf
+            top = np.argsort(-scores, kind='stable')[:10]
+
+            recs = model.recommend_for_user(user_id, top_n=10)
+            np.testing.assert_allclose(recs['score'], scores[top])
+            np.testing.assert_array_equal(recs['item_id'], model.item_ids[top])
+
+    def test_user_based_scores_match_neighbour_loop(self):
+        # Petit jeu dense: 40 utilisateurs x 30 items, environ 40 % de notes
+        rng = np.random.default_rng(4)
+        users, items = np.nonzero(rng.random((40, 30)) < 0.4)
+        ratings = pd.DataFrame({'user_id': users, 'item_id': items,
+                                'rating': rng.integers(1, 6, len(users)).astype(float)})
+
+        for n_neighbors, top_k in ((None, None), (5, None), (None, 8), (5, 8)):
+            with self.subTest(n_neighbors=n_neighbors, similarity_top_k=top_k):
+                model = CollaborativeFilteringRecommender(ratings, method='user_based', dtype='float64',
+                                                          n_neighbors=n_neighbors, similarity_top_k=top_k)
+                matrix = dense_ratings(model)
+                similarity = cosine_similarity(matrix)
+                np.fill_diagonal(similarity, 0)
+                similarity[similarity < 0] = 0
+
+                reference = np.zeros(matrix.shape)
+                for user_idx in range(len(matrix)):
+                    # Voisins retenus: les top_k du modèle, puis les n_neighbors plus similaires
+                    user_sim = similarity[user_idx].copy()
+                    for limit in (top_k, n_neighbors):
+                        if limit is not None:
+                            user_sim[np.argsort(-user_sim, kind='stable')[limit:]] = 0
+                    # Boucle de référence: pour chaque item, les voisins l'ayant noté
+                    for item_idx in range(matrix.shape[1]):
+                        raters = np.flatnonzero(matrix[:, item_idx] > 0)
+                        sim_sum = np.abs(user_sim[raters]).sum()
+                        if sim_sum > 0:
+                            reference[user_idx, item_idx] = (user_sim[raters] * matrix[raters, item_idx]).sum() / sim_sum
+
+                rtol = 1e-12 if top_k is None else 1e-6
+                for user_idx in range(len(matrix)):
+                    np.testing.assert_allclose(model._score_user_based(user_idx), reference[user_idx], rtol=rtol)
+                np.testing.assert_allclose(model.score_users(np.arange(len(matrix))), reference, rtol=rtol)
+
+    def test_dense_similarity_rows_match_column_slices(self):
+        # Lecture des lignes des items notés (matrice symétrique) au lieu des colonnes: mêmes
+        # scores (en int8, l'échelle propre à chaque ligne rompt la symétrie exacte)
+        for dtype, atol in (('float64', 1e-12), ('float16', 1e-6)):
+            with self.subTest(dtype=dtype):
+                model = CollaborativeFilteringRecommender(self.ratings, method='item_based', dtype=dtype)
+                similarity = np.asarray(full_precision(model.item_similarity), dtype=np.float64)
+                user_indices = np.arange(20)
+                user_rows = model.user_rows(user_indices)
+
+                reference = np.zeros((len(user_indices), similarity.shape[0]))
+                for row in range(len(user_indices)):
+                    columns = similarity[:, user_rows[row].indices]
+                    sim_sum = np.abs(columns).sum(axis=1)
+                    np.divide(columns @ user_rows[row].data, sim_sum, out=reference[row], where=sim_sum > 0)
+                    np.testing.assert_allclose(model._score_item_based(user_rows[row]), reference[row], atol=atol)
+                np.testing.assert_allclose(model.score_users(user_indices), reference, atol=atol)
+
+
+class IngestionTests(SimpleTestCase):
+    """Lecture par blocs du fichier de notes."""
+
+    def test_chunked_reading_matches_pandas(self):
+        # Beaucoup de doublons (utilisateur, item), répartis sur plusieurs blocs
+        ratings = synthetic_ratings(n_ratings=5000, n_users=40, n_items=60, seed=8)
+        ratings.columns = ['user_id', 'book_id', 'rating']
+        with tempfile.NamedTemporaryFile(suffix='.csv') as f:
+            ratings.to_csv(f.name, index=False)
+            result = read_ratings_chunked(f.name, item_id_col='book_id', min_item_count=35, chunksize=700)
+
+        expected = ratings.drop_duplicates(['user_id', 'book_id'], keep='last')
+        counts = expected['book_id'].value_counts()
+        expected = expected[expected['book_id'].isin(counts[counts >= 35].index)]
+        pd.testing.assert_frame_equal(result, expected.reset_index(drop=True), check_dtype=False)
+        self.assertEqual(result['user_id'].dtype, np.int32)
+
+
+class ContentSimilarityTests(SimpleTestCase):
+    """
+    Régression de la matrice TF-IDF empilée: mêmes similarités et recommandations que
+    la somme pondérée des similarités cosinus calculées colonne par colonne.
+    """
+
+    def test_stacked_tfidf_matches_weighted_cosine(self):
+        items = synthetic_items()
+        rng = np.random.default_rng(7)
+        items['genres'] = [' '.join(rng.choice(['drama', 'comedy', 'horror', 'action'], 2)) for _ in range(len(items))]
+        items['title'] = [f'title{i % 40} word{i % 7}' for i in range(len(items))]
+        columns, weights = ['description', 'genres', 'title'], [0.4, 0.3, 0.3]
+
+        reference = np.zeros((len(items), len(items)))
+        for column, weight in zip(columns, weights):
+            vectorizer = TfidfVectorizer(stop_words='english', max_features=5000, ngram_range=(1, 2))
+            reference += weight * cosine_similarity(vectorizer.fit_transform(items[column].str.lower()))
+
+        for mode in ('dense', 'sparse'):
+            model = ContentBasedRecommender(items.copy(), text_columns=columns, weights=weights,
+                                            similarity_mode=mode, dtype='float64')
+            for item_id in (0, 17, 123):
+                with self.subTest(mode=mode, item_id=item_id):
+                    np.testing.assert_allclose(model._similarity_row(item_id), reference[item_id], atol=1e-12)
+                    order = np.argsort(-reference[item_id], kind='stable')
+                    top = order[order != item_id][:10]
+                    recs = model.recommend(item_id, top_n=10)
+                    np.testing.assert_allclose(recs['similarity_score'], reference[item_id, top], atol=1e-12)
+                    np.testing.assert_array_equal(np.sort(recs['item_id']), np.sort(top))
+
+    def test_batch_recommend_matches_single_item_calls(self):
+        items = synthetic_items()
+        item_ids = [0, 17, 123, 299, 5000]
+        for mode, top_k in (('dense', None), ('sparse', None), ('sparse', 20)):
+            model = ContentBasedRecommender(items.copy(), similarity_mode=mode, top_k=top_k, dtype='float64')
+            batch = model.batch_recommend(item_ids, top_n=10)
+            self.assertEqual(list(batch), item_ids[:-1])
+            for item_id, (recommended, scores) in batch.items():
+                with self.subTest(mode=mode, top_k=top_k, item_id=item_id):
+                    recs = model.recommend(item_id, top_n=10)
+                    np.testing.assert_allclose(scores, recs['similarity_score'], atol=1e-12)
+                    self.assertEqual(set(recommended), set(recs['item_id']))
+
+
+class ContentFilterTests(SimpleTestCase):
+    """Filtres de recommend sur des colonnes à plusieurs valeurs (genres, auteurs)."""
+
+    def test_filters_match_tokens_of_multi_valued_columns(self):
+        items = pd.DataFrame({
+            'item_id': range(5),
+            'description': ['apple banana', 'banana cherry', 'cherry date', 'date elder', 'elder fig'],
+            'genres': pd.Categorical(['Comedy Drama', 'Comedy', 'Drama', 'Sci-Fi Action', None]),
+            'authors': ["['J.K. Rowling', 'Mary GrandPré']", 'Stephen King', 'J.K. Rowling',
+                        'Stephen Smith, Carole King', np.nan]
+        })
+        model = ContentBasedRecommender(items, filter_columns=['genres'], list_columns=['authors'])
+        expected = [
+            ({'genres': 'Comedy'}, [0, 1]),
+            ({'genres': ['drama', 'Sci-Fi']}, [0, 2, 3]),
+            ({'genres': 'Comedy Drama'}, [0]),
+            ({'authors': 'J.K. Rowling'}, [0, 2]),
+            ({'genres': 'Horror'}, []),
+            ({'genres': 'Drama', 'authors': 'j.k.  rowling'}, [0, 2]),
+            # Auteurs: élément entier, pas de correspondance par mots entre deux auteurs
+            ({'authors': 'Stephen King'}, [1]),
+            ({'authors': 'King'}, []),
+            ({'authors': ['carole king', 'Mary GrandPré']}, [0, 3]),
+        ]
+        for filters, item_ids in expected:
+            with self.subTest(filters=filters):
+                np.testing.assert_array_equal(np.flatnonzero(model._filter_mask(filters)), item_ids)
+        self.assertEqual(model.recommend(1, top_n=5, filters={'genres': 'Comedy'})['item_id'].tolist(), [0])
+
+
+class ArtifactTests(SimpleTestCase):
+    """Modèles rechargés depuis leurs artefacts projetés en mémoire."""
+
+    def test_id_mappings_are_memory_mapped(self):
+        ratings = synthetic_ratings()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            fitted = CollaborativeFilteringRecommender(ratings, method='item_based', cache_dir=cache_dir)
+            loaded = CollaborativeFilteringRecommender(ratings, method='item_based', cache_dir=cache_dir)
+            for mapping, fitted_mapping in ((loaded.user_mapping, fitted.user_mapping),
+                                            (loaded.item_mapping, fitted.item_mapping)):
+                # Tableaux partagés entre processus: aucune copie privée des IDs triés
+                self.assertIsInstance(mapping.sorted_ids, np.memmap)
+                ids = np.concatenate([fitted_mapping.ids, [-1, 10 ** 6]])
+                np.testing.assert_array_equal(mapping.get_indexer(ids), fitted_mapping.get_indexer(ids))
+
+    def test_cache_key_changes_with_ratings_and_parameters(self):
+        ratings = synthetic_ratings()
+        key = CollaborativeFilteringRecommender(ratings.copy(), method='item_based')._cache_key()
+        self.assertEqual(CollaborativeFilteringRecommender(ratings.copy(), method='item_based')._cache_key(), key)
+
+        changed = ratings.copy()
+        changed.loc[0, 'rating'] = changed.loc[0, 'rating'] % 5 + 1
+        self.assertNotEqual(CollaborativeFilteringRecommender(changed, method='item_based')._cache_key(), key)
+        for params in ({'method': 'user_based'}, {'similarity_top_k': 10}, {'dtype': 'float64'}):
+            with self.subTest(**params):
+                model = CollaborativeFilteringRecommender(ratings.copy(), **{'method': 'item_based', **params})
+                self.assertNotEqual(model._cache_key(), key)
+
+    def test_unchanged_models_are_loaded_instead_of_refitted(self):
+        ratings, items = synthetic_ratings(), synthetic_items()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            CollaborativeFilteringRecommender(ratings, method='item_based', cache_dir=cache_dir)
+            ContentBasedRecommender(items.copy(), cache_dir=cache_dir)
+            with mock.patch.object(CollaborativeFilteringRecommender, '_fit_item_based', side_effect=AssertionError), \
+                    mock.patch.object(ContentBasedRecommender, '_build_feature_matrix', side_effect=AssertionError):
+                collaborative_model = CollaborativeFilteringRecommender(ratings, method='item_based', cache_dir=cache_dir)
+                content_model = ContentBasedRecommender(items.copy(), cache_dir=cache_dir)
+            self.assertIsInstance(collaborative_model.item_similarity, np.memmap)
+            self.assertIsInstance(content_model.similarity_matrix, np.memmap)
+
+    def test_eviction_removes_least_recently_used_artifacts(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            directories = [os.path.join(cache_dir, f'model-{position}') for position in range(4)]
+            for position, directory in enumerate(directories):
+                save_artifact(directory, {'values': np.zeros(10_000)})
+                # Dernière utilisation: model-0 la plus ancienne, model-3 la plus récente
+                os.utime(os.path.join(directory, MANIFEST_FILE), (1000 + position, 1000 + position))
+            touch_artifact(directories[0])
+            size = sum(entry.stat().st_size for entry in os.scandir(directories[0]))
+
+            removed = evict_artifacts(cache_dir, 2 * size, keep=directories[1])
+            # model-0 vient d'être utilisé et model-1 est protégé: model-2 puis model-3 sont supprimés
+            self.assertEqual(sorted(removed), directories[2:])
+            self.assertEqual(sorted(os.listdir(cache_dir)), ['model-0', 'model-1'])
+            self.assertEqual(evict_artifacts(cache_dir, 2 * size), [])
+
+
+class DeltaLayerTests(SimpleTestCase):
+    """
+    Couche delta: des notes ajoutées après l'entraînement donnent les mêmes scores
+    qu'un modèle réentraîné sur toutes les notes.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        ratings = synthetic_ratings().drop_duplicates(['user_id', 'item_id'], keep='last')
+        # Notes récentes: des utilisateurs connus et un nouvel utilisateur, sur des items connus
+        cls.recent = pd.concat([
+            ratings.iloc[-40:],
+            pd.DataFrame({'user_id': 5000, 'item_id': ratings['item_id'].iloc[:6].to_numpy(), 'rating': 4.0})
+        ])
+        cls.base = ratings.iloc[:-40]
+        cls.full = pd.concat([cls.base, cls.recent], ignore_index=True)
+
+    def add_recent(self, model):
+        for user_id, item_id, rating in self.recent.itertuples(index=False):
+            model.add_rating(user_id, item_id, rating)
+
+    def test_refreshed_item_similarity_matches_retrained_model(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            CollaborativeFilteringRecommender(self.base, method='item_based', dtype='float64', cache_dir=cache_dir)
+            model = CollaborativeFilteringRecommender(self.base, method='item_based', dtype='float64',
+                                                      cache_dir=cache_dir)
+            base_similarity = np.array(model.item_similarity)
+            self.add_recent(model)
+            self.assertEqual(model.refresh_item_similarity(), self.recent['item_id'].nunique())
+
+            retrained = CollaborativeFilteringRecommender(self.full, method='item_based', dtype='float64')
+            item_ids = retrained.item_ids
+            expected = retrained.item_similarity_rows(retrained.item_mapping.get_indexer(item_ids))
+            np.testing.assert_allclose(model.item_similarity_rows(model.item_mapping.get_indexer(item_ids)),
+                                       expected, atol=1e-12)
+
+            user_ids = self.recent['user_id'].unique()
+            np.testing.assert_allclose(model.score_users([model.user_index(user_id) for user_id in user_ids]),
+                                       retrained.score_users([retrained.user_index(user_id) for user_id in user_ids]),
+                                       atol=1e-9)
+            # La matrice de base, projetée en mémoire, n'est jamais modifiée
+            self.assertIsInstance(model.item_similarity, np.memmap)
+            np.testing.assert_array_equal(model.item_similarity, base_similarity)
+
+    def test_failed_refresh_keeps_items_dirty(self):
+        model = CollaborativeFilteringRecommender(self.base, method='item_based')
+        self.add_recent(model)
+        dirty = set(model.dirty_items)
+        with mock.patch.object(model, '_refresh_items', side_effect=MemoryError):
+            with self.assertRaises(MemoryError):
+                model.refresh_item_similarity()
+        self.assertEqual(model.dirty_items, dirty)
+        self.assertEqual(model.refresh_item_similarity(), len(dirty))
+        self.assertEqual(model.dirty_items, set())
+
+    def test_removed_rating_restores_base_rating(self):
+        model = CollaborativeFilteringRecommender(self.base, method='item_based')
+        user_id, item_id, rating = self.base.iloc[0]
+        user_idx = model.user_index(user_id)
+        model.add_rating(user_id, item_id, 1.0)
+        self.assertEqual(model.user_rows([user_idx])[0, model.item_mapping[item_id]], 1.0)
+        model.remove_rating(user_id, item_id)
+        self.assertEqual(model.user_rows([user_idx])[0, model.item_mapping[item_id]], rating)
+
+
+class RegistryTests(SimpleTestCase):
+    """Registre des recommandeurs partagés: une seule construction par dataset et par processus."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(services.reset_recommenders)
+        services.reset_recommenders()
+        self.builds = []
+        self.release = {'books': threading.Event(), 'movies': threading.Event()}
+
+        def build(dataset_type, interactions_until=None):
+            self.builds.append(dataset_type)
+            self.release[dataset_type].wait(5)
+            return mock.Mock(name=dataset_type)
+
+        for target, value in (('dataset_path', directory.name), ('build_hybrid_recommender', build),
+                              ('sync_interactions', mock.Mock(return_value=0))):
+            patcher = mock.patch.object(services, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_calls_return_the_same_instance(self):
+        self.release['movies'].set()
+        recommender = services.get_hybrid_recommender('movies')
+        self.assertIs(services.get_hybrid_recommender('movies'), recommender)
+        self.assertEqual(self.builds, ['movies'])
+
+    def test_concurrent_first_calls_build_once(self):
+        barrier = threading.Barrier(8)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(services.get_hybrid_recommender('movies'))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        # Pendant la construction de 'movies', 'books' est construit sans attendre
+        self.release['books'].set()
+        books = services.get_hybrid_recommender('books')
+        self.release['movies'].set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.builds.count('movies'), 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertIsNot(books, results[0])
+
+
+class CompactionTests(TestCase):
+    """Compaction des interactions dans le modèle de base."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(services.reset_recommenders)
+        items = synthetic_items()
+        content = pd.DataFrame({'item_id': items['item_id'], 'title': items['description'],
+                                'genres': 'drama comedy', 'tag': 'classic movie'})
+        for target, value in (('dataset_path', directory.name),
+                              ('load_datasets', mock.Mock(return_value=(content, synthetic_ratings()))),
+                              ('similarity_refresh_delay', 3600)):
+            patcher = mock.patch.object(services, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_compaction_moves_interactions_into_base_model(self):
+        user = CustomUser.objects.create(id=5000, username='reader')
+        for position in range(3):
+            item = Item.objects.create(title=f'item{position}', description='', content_type='movie')
+            Interaction.objects.create(user=user, item=item, rating=5)
+
+        collaborative_model = services.get_hybrid_recommender('movies').collaborative_recommender
+        self.assertIn(user.id, collaborative_model.delta_user_index)
+        self.assertNotIn(user.id, collaborative_model.user_mapping)
+
+        last_id = services.compact_interactions('movies')
+        self.assertEqual(last_id, Interaction.objects.latest('id').id)
+        self.assertEqual(services.compacted_until('movies'), last_id)
+        collaborative_model = services.get_hybrid_recommender('movies').collaborative_recommender
+        self.assertIn(user.id, collaborative_model.user_mapping)
+        self.assertEqual(collaborative_model.delta_ratings, {})
+        self.assertEqual(collaborative_model.user_rows([collaborative_model.user_index(user.id)]).nnz, 3)
+
+
+class FoldInTests(SimpleTestCase):
+    """Fold-in SVD des utilisateurs inconnus ou ayant reçu des notes depuis l'entraînement."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ratings = synthetic_ratings().drop_duplicates(['user_id', 'item_id'], keep='last')
+
+    def model(self):
+        return CollaborativeFilteringRecommender(self.ratings, method='svd', n_factors=20, dtype='float64')
+
+    def test_fold_in_matches_factor_scores_of_known_users(self):
+        model = self.model()
+        user_indices = np.arange(50)
+        # Avec arpack, X·V = U·Σ exactement: le fold-in retrouve les scores des facteurs
+        np.testing.assert_allclose(model.fold_in_scores(model.user_rows(user_indices)),
+                                   model._factor_scores(user_indices), atol=1e-9)
+
+    def test_new_user_is_scored_by_fold_in(self):
+        model = self.model()
+        item_ids = model.item_ids[:8]
+        for item_id in item_ids:
+            model.add_rating(9999, item_id, 5.0)
+        user_idx = model.user_index(9999)
+        self.assertIsNotNone(user_idx)
+
+        expected = model.fold_in_scores(model.user_rows([user_idx]))
+        np.testing.assert_allclose(model.score_users([user_idx]), expected)
+        recommendations = model.recommend_for_user(9999, top_n=5)
+        self.assertEqual(len(recommendations), 5)
+        self.assertFalse(recommendations['item_id'].isin(item_ids).any())
+
+    def test_new_ratings_switch_known_user_to_fold_in(self):
+        model = self.model()
+        user_id = model.user_ids[0]
+        user_idx = model.user_index(user_id)
+        self.assertFalse(model._needs_fold_in(user_idx))
+
+        unrated = np.setdiff1d(np.arange(len(model.item_ids)), model.user_item_matrix[user_idx].indices)[0]
+        model.add_rating(user_id, model.item_ids[unrated], 1.0)
+        self.assertTrue(model._needs_fold_in(user_idx))
+        scores = model.score_users([user_idx])
+        np.testing.assert_allclose(scores, model.fold_in_scores(model.user_rows([user_idx])))
+        self.assertFalse(np.allclose(scores, model._factor_scores([user_idx])))
+
+
+class ApproximateSearchTests(SimpleTestCase):
+    """Index IVF des facteurs SVD: candidats, rappel et repli sur le calcul exact."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        ratings = synthetic_ratings().drop_duplicates(['user_id', 'item_id'], keep='last')
+        cls.model = CollaborativeFilteringRecommender(ratings, method='svd', n_factors=20, ann_lists=8)
+        cls.exact = CollaborativeFilteringRecommender(ratings, method='svd', n_factors=20)
+
+    def test_candidates_are_completed_to_min_candidates(self):
+        index = self.model.ann_index
+        query = self.model.item_factors[0]
+        self.assertEqual(len(index.candidates(query, index.n_lists)), len(self.model.item_ids))
+        for min_candidates in (1, 50, 150):
+            candidates = index.candidates(query, 1, min_candidates=min_candidates)
+            self.assertGreaterEqual(len(candidates), min_candidates)
+            self.assertEqual(len(np.unique(candidates)), len(candidates))
+
+        excluded = index.candidates(query, 1)
+        candidates = index.candidates(query, 1, exclude=excluded, min_candidates=10)
+        self.assertGreaterEqual(len(np.setdiff1d(candidates, excluded)), 10)
+
+    def test_probing_every_list_matches_exact_search(self):
+        with mock.patch.object(self.model, 'ann_probes', self.model.ann_index.n_lists):
+            for item_id in self.model.item_ids[:20]:
+                self.assertEqual(list(self.model.recommend_similar_items(item_id, 10)['item_id']),
+                                 list(self.exact.recommend_similar_items(item_id, 10)['item_id']))
+            for user_id in self.model.user_ids[:20]:
+                self.assertEqual(set(self.model.recommend_for_user(user_id, 10)['item_id']),
+                                 set(self.exact.recommend_for_user(user_id, 10)['item_id']))
+
+        report = measure_recall(self.model, self.model.user_ids[:20], self.model.item_ids[:20],
+                                probes=(1, self.model.ann_index.n_lists))
+        self.assertEqual(report[-1]['user_recall'], 1.0)
+        self.assertEqual(report[-1]['item_recall'], 1.0)
+
+    def test_similar_items_fall_back_to_exact_search(self):
+        item_id = self.model.item_ids[0]
+        item_idx = self.model.item_mapping[item_id]
+        # L'index ne renvoie que l'item lui-même: pas assez de candidats
+        with mock.patch.object(self.model.ann_index, 'candidates', return_value=np.array([item_idx])):
+            recommendations = self.model.recommend_similar_items(item_id, 10)
+        self.assertEqual(list(recommendations['item_id']),
+                         list(self.exact.recommend_similar_items(item_id, 10)['item_id']))
+
+
+class DatasetCacheTests(SimpleTestCase):
+    """Datasets nettoyés sauvegardés au format colonne et invalidés avec leurs sources."""
+
+    def test_frame_round_trip_keeps_dtypes_text_and_missing_values(self):
+        frame = pd.DataFrame({
+            'item_id': np.array([1, 2, 3], dtype=np.int32),
+            'big_id': np.array([1, 2 ** 40, 3], dtype=np.int64),
+            'rating': np.array([1.5, np.nan, 3], dtype=np.float32),
+            'score': [0.1, np.nan, 2.5],
+            'flag': [True, False, True],
+            'genres': pd.Categorical(['Drama', None, 'Comedy']),
+            'description': pd.Series(['été', np.nan, ''], dtype=object),
+            'title': pd.Series(['Toy Story', None, 'Heat']),
+        })
+        with tempfile.TemporaryDirectory() as directory:
+            save_frame(os.path.join(directory, 'frame'), frame, metadata={'version': 1})
+            loaded, metadata = load_frame(os.path.join(directory, 'frame'))
+        pd.testing.assert_frame_equal(loaded, frame)
+        self.assertEqual(metadata, {'version': 1})
+
+    def test_source_changes_and_version_invalidate_cleaned_datasets(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        movies_dir = os.path.join(directory.name, 'movies')
+        os.makedirs(movies_dir)
+        pd.DataFrame({'movieId': [1, 2], 'title': ['Toy Story (1995)', 'Heat (1995)'],
+                      'genres': ['Animation|Comedy', 'Action']}).to_csv(os.path.join(movies_dir, 'movies.csv'), index=False)
+        pd.DataFrame({'userId': [1], 'movieId': [1], 'tag': ['pixar'], 'timestamp': [0]}).to_csv(
+            os.path.join(movies_dir, 'tags.csv'), index=False)
+        ratings_path = os.path.join(movies_dir, 'ratings.csv')
+        pd.DataFrame({'userId': range(12), 'movieId': 1, 'rating': 4.0, 'timestamp': 0}).to_csv(ratings_path, index=False)
+
+        read_datasets = mock.Mock(wraps=services._read_datasets)
+        for target, value in (('dataset_path', directory.name), ('_read_datasets', read_datasets)):
+            patcher = mock.patch.object(services, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        content, ratings = services.load_datasets('movies')
+        services.load_datasets('movies')
+        self.assertEqual(read_datasets.call_count, 1)
+        self.assertEqual(content['genres'].dtype, 'category')
+        self.assertEqual(ratings['rating'].dtype, np.float32)
+        self.assertEqual(len(ratings), 12)
+
+        # Date de modification d'une source
+        stat = os.stat(ratings_path)
+        os.utime(ratings_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        services.load_datasets('movies')
+        self.assertEqual(read_datasets.call_count, 2)
+
+        # Taille d'une source (note ajoutée)
+        with open(ratings_path, 'a') as f:
+            f.write('12,1,5.0,0\n')
+        _, ratings = services.load_datasets('movies')
+        self.assertEqual(read_datasets.call_count, 3)
+        self.assertEqual(len(ratings), 13)
+
+        # Nouvelle version du nettoyage
+        with mock.patch.object(services, 'dataset_cache_version', services.dataset_cache_version + 1):
+            services.load_datasets('movies')
+        self.assertEqual(read_datasets.call_count, 4)
+        # La sauvegarde porte la version qui l'a écrite: l'ancienne version relit aussi les CSV
+        services.load_datasets('movies')
+        self.assertEqual(read_datasets.call_count, 5)
+
+
+class ModelDtypeTests(SimpleTestCase):
+    """
+    Régression de la précision des modèles: les scores calculés en float32, float16
+    ou int8 restent proches de ceux du modèle float64.
+    """
+
+    # Écart maximal toléré sur les scores (échelle des notes de 0.5 à 5) pour chaque précision
+    score_tolerance = {'float32': 1e-4, 'float16': 5e-3, 'int8': 0.25}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ratings = synthetic_ratings()
+        cls.items = synthetic_items()
+
+    def assert_scores_close(self, scores, reference, dtype):
+        self.assertLessEqual(np.abs(scores - reference).max(), self.score_tolerance[dtype])
+
+    def test_quantization_error_is_bounded_by_scale(self):
+        rng = np.random.default_rng(1)
+        dense = rng.random((50, 40)).astype(np.float32)
+        for matrix in (dense, sp.csr_matrix(np.where(dense > 0.7, dense, 0))):
+            quantized = QuantizedMatrix.quantize(matrix, 'int8')
+            full = matrix.toarray() if sp.issparse(matrix) else matrix
+            restored = quantized.dequantize()
+            restored = restored.toarray() if sp.issparse(restored) else restored
+            # Erreur d'arrondi au plus d'un demi-pas par ligne
+            bound = quantized.scales[:, np.newaxis] / 2 + 1e-6
+            self.assertTrue((np.abs(restored - full) <= bound).all())
+
+    def test_reduced_precision_products_match_dequantized(self):
+        rng = np.random.default_rng(2)
+        matrix = rng.random((30, 30)).astype(np.float32)
+        weights = sp.random(5, 30, density=0.2, random_state=3, format='csr')
+        for dtype in ('float16', 'int8'):
+            stored = store_similarity(matrix, dtype)
+            full = stored.dequantize()
+            np.testing.assert_allclose(weights @ stored, weights @ full, rtol=1e-5, atol=1e-6)
+            np.testing.assert_allclose(stored @ weights.T, full @ weights.T, rtol=1e-5, atol=1e-6)
+
+    def test_collaborative_scores_match_float64(self):
+        configurations = [
+            {'method': 'svd', 'n_factors': 10},
+            {'method': 'item_based'},
+            {'method': 'item_based', 'similarity_top_k': 20},
+            {'method': 'user_based'},
+            {'method': 'user_based', 'similarity_top_k': 20},
+        ]
+        user_ids = self.ratings['user_id'].unique()[:50]
+        for params in configurations:
+            reference = CollaborativeFilteringRecommender(self.ratings, dtype='float64', **params)
+            user_indices = [reference.user_index(user_id) for user_id in user_ids]
+            reference_scores = reference.score_users(user_indices)
+
+            # La SVD ne stocke pas de matrice de similarité: seule la précision float32 la concerne
+            dtypes = ('float32',) if params['method'] == 'svd' else ('float32', 'float16', 'int8')
+            for dtype in dtypes:
+                with self.subTest(dtype=dtype, **params):
+                    model = CollaborativeFilteringRecommender(self.ratings, dtype=dtype, **params)
+                    self.assert_scores_close(model.score_users(user_indices), reference_scores, dtype)
+
+    def test_content_scores_match_float64(self):
+        profiles = sp.random(20, len(self.items), density=0.02, random_state=4, format='csr')
+        for params in ({'similarity_mode': 'dense'}, {'similarity_mode': 'sparse', 'top_k': 20}):
+            reference = ContentBasedRecommender(self.items.copy(), dtype='float64', **params)
+            reference_scores = reference.profile_scores(profiles)
+            for dtype in ('float32', 'float16', 'int8'):
+                with self.subTest(dtype=dtype, **params):
+                    model = ContentBasedRecommender(self.items.copy(), dtype=dtype, **params)
+                    # Affinités dans [0, 1]: tolérance ramenée à cette échelle
+                    tolerance = self.score_tolerance[dtype] / 5
+                    self.assertLessEqual(np.abs(model.profile_scores(profiles) - reference_scores).max(), tolerance)
+
+    def test_reduced_precision_models_reload_from_cache(self):
+        user_ids = self.ratings['user_id'].unique()[:20]
+        for dtype in ('float16', 'int8'):
+            with self.subTest(dtype=dtype), tempfile.TemporaryDirectory() as cache_dir:
+                fitted = CollaborativeFilteringRecommender(self.ratings, method='item_based', dtype=dtype,
+                                                           cache_dir=cache_dir)
+                loaded = CollaborativeFilteringRecommender(self.ratings, method='item_based', dtype=dtype,
+                                                           cache_dir=cache_dir)
+                self.assertIsInstance(loaded.item_similarity, QuantizedMatrix)
+                user_indices = [fitted.user_index(user_id) for user_id in user_ids]
+                np.testing.assert_array_equal(loaded.score_users(user_indices), fitted.score_users(user_indices))
+
+    def test_unknown_dtype_is_rejected(self):
+        with self.assertRaises(ValueError):
+            CollaborativeFilteringRecommender(self.ratings, dtype='float8')
+
+
+class HybridTests(SimpleTestCase):
+    """Fusion des recommandations de contenu et collaboratives."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Items 200 à 299: décrits par le contenu mais jamais notés
+        cls.hybrid = HybridRecommender(
+            ContentBasedRecommender(synthetic_items()),
+            CollaborativeFilteringRecommender(synthetic_ratings(), method='item_based')
+        )
+
+    def test_similar_items_of_content_only_item(self):
+        recs = self.hybrid.recommend_similar_items(250, top_n=5)
+        content_recs = self.hybrid.content_recommender.recommend(250, top_n=5)
+
+        self.assertEqual(recs['item_id'].tolist(), content_recs['item_id'].tolist())
+        np.testing.assert_allclose(recs['hybrid_score'], 0.5 * content_recs['similarity_score'])
+        pd.testing.assert_frame_equal(recs, self.hybrid.batch_recommend_similar_items([250], top_n=5)[250])
+
+    def test_similar_items_match_batch(self):
+        for item_id in (3, 120):
+            pd.testing.assert_frame_equal(self.hybrid.recommend_similar_items(item_id, top_n=5),
+                                          self.hybrid.batch_recommend_similar_items([item_id], top_n=5)[item_id])
+
+    def test_user_scores_blend_normalized_vectors(self):
+        user_indices = np.arange(20)
+        collaborative_model = self.hybrid.collaborative_recommender
+        collab_scores = collaborative_model.score_users(user_indices)
+        content_scores, _ = self.hybrid.score_users(user_indices, weight_content=1, weight_collaborative=0)
+        scores, _ = self.hybrid.score_users(user_indices, weight_content=0.3, weight_collaborative=0.7)
+
+        def minmax(values):
+            spread = values.max(axis=1, keepdims=True) - values.min(axis=1, keepdims=True)
+            return (values - values.min(axis=1, keepdims=True)) / spread
+        np.testing.assert_allclose(scores, 0.7 * minmax(collab_scores) + 0.3 * content_scores, atol=1e-12)
+        np.testing.assert_allclose(content_scores.max(axis=1), 1)
+
+    def test_content_term_changes_user_ranking(self):
+        # Les prédictions sur l'échelle des notes ne doivent pas écraser l'affinité de contenu
+        # (sans normalisation, la première recommandation ne change pour aucun de ces utilisateurs)
+        changed = 0
+        for user_id in self.hybrid.collaborative_recommender.user_ids[:50]:
+            collaborative_only = self.hybrid.recommend_for_user(
+                user_id, top_n=10, weight_content=0, weight_collaborative=1)
+            hybrid = self.hybrid.recommend_for_user(user_id, top_n=10, weight_content=0.3, weight_collaborative=0.7)
+            changed += collaborative_only['item_id'].iloc[0] != hybrid['item_id'].iloc[0]
+        self.assertGreaterEqual(changed, 5)
+
+    def test_batch_of_items_matches_single_item_calls(self):
+        # Items notés, item sans note et item inconnu (ignoré) dans un même lot
+        batch = self.hybrid.batch_recommend_similar_items([3, 120, 250, 5000], top_n=5)
+        self.assertEqual(list(batch), [3, 120, 250])
+        for item_id, recs in batch.items():
+            pd.testing.assert_frame_equal(recs, self.hybrid.recommend_similar_items(item_id, top_n=5))
+
+
+class PrecomputedServingTests(TestCase):
+    """Mode précalculé: lecture sans modèle live, calcul en direct après de nouvelles notes."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(services.reset_recommenders)
+        for target, value in (('dataset_path', directory.name),
+                              ('load_datasets', mock.Mock(return_value=(self.item_data(), None))),
+                              ('get_hybrid_recommender', mock.Mock(side_effect=AssertionError))):
+            patcher = mock.patch.object(services, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.user = CustomUser.objects.create(username='reader')
+        self.item = Item.objects.create(title='Toy Story', description='', content_type='movie')
+        recommendations = (np.array([11, 10]), np.array([0.9, 0.5]))
+        PrecomputedRecommendations.save(
+            services.precomputed_dir('movies'), [10, 11, 12], {self.user.id: recommendations}, {}, top_n=5,
+            metadata={'interactions_until': Interaction.objects.count()})
+
+    @staticmethod
+    def item_data():
+        return pd.DataFrame({'item_id': [10, 11, 12], 'title': ['a', 'b', 'c']})
+
+    def test_precomputed_lists_skip_the_live_model(self):
+        recs = services.precomputed_recommend_for_user('movies', self.user.id, top_n=2)
+        self.assertEqual(recs['item_id'].tolist(), [11, 10])
+        self.assertEqual(recs['title'].tolist(), ['b', 'a'])
+
+    def test_new_ratings_fall_back_to_live_scoring(self):
+        Interaction.objects.create(user=self.user, item=self.item, clicked=True)
+        self.assertIsNotNone(services.precomputed_recommend_for_user('movies', self.user.id, top_n=2))
+        Interaction.objects.create(user=self.user, item=self.item, rating=4)
+        self.assertIsNone(services.precomputed_recommend_for_user('movies', self.user.id, top_n=2))
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'recommendations': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-results'},
+})
+class ResultCacheTests(TestCase):
+    """Cache des recommandations par utilisateur, invalidé par ses nouvelles interactions."""
+
+    def setUp(self):
+        caches['recommendations'].clear()
+        self.recommender = mock.Mock()
+        self.recommender.recommend_for_user.side_effect = lambda **kwargs: pd.DataFrame(
+            {'item_id': [1, 2], 'hybrid_score': [0.9, 0.5]})
+        patcher = mock.patch.object(services, 'get_hybrid_recommender', return_value=self.recommender)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = CustomUser.objects.create(username='reader')
+        self.other = CustomUser.objects.create(username='other')
+        self.item = Item.objects.create(title='Toy Story', description='', content_type='movie')
+
+    def test_identical_call_is_served_from_cache(self):
+        first = services.recommend_for_user('movies', self.user.id, top_n=5)
+        second = services.recommend_for_user('movies', self.user.id, top_n=5)
+        self.assertEqual(self.recommender.recommend_for_user.call_count, 1)
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_key_depends_on_top_n_and_weights(self):
+        calls = [dict(top_n=5), dict(top_n=10), dict(top_n=5, weight_content=0.2, weight_collaborative=0.8),
+                 dict(top_n=5, weight_content=0.8, weight_collaborative=0.2)]
+        for kwargs in calls + calls:
+            services.recommend_for_user('movies', self.user.id, **kwargs)
+        services.recommend_for_user('books', self.user.id, top_n=5)
+        self.assertEqual(self.recommender.recommend_for_user.call_count, len(calls) + 1)
+
+    def test_new_interaction_invalidates_only_its_user(self):
+        services.recommend_for_user('movies', self.user.id, top_n=5)
+        services.recommend_for_user('movies', self.other.id, top_n=5)
+        version = services._user_cache_version(self.user.id)
+        other_version = services._user_cache_version(self.other.id)
+
+        Interaction.objects.create(user=self.user, item=self.item, rating=4)
+        self.assertNotEqual(services._user_cache_version(self.user.id), version)
+        self.assertEqual(services._user_cache_version(self.other.id), other_version)
+
+        services.recommend_for_user('movies', self.user.id, top_n=5)
+        services.recommend_for_user('movies', self.other.id, top_n=5)
+        self.assertEqual(self.recommender.recommend_for_user.call_count, 3)
+
+
+class PrecomputeCommandTests(TransactionTestCase):
+    """Commande precompute_recommendations: blocs calculés par des processus créés par fork."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(services.reset_recommenders)
+        items = synthetic_items()
+        content = pd.DataFrame({'item_id': items['item_id'], 'title': items['description'],
+                                'genres': 'drama comedy', 'tag': 'classic movie'})
+        for target, value in (('dataset_path', directory.name),
+                              ('load_datasets', mock.Mock(return_value=(content, synthetic_ratings()))),
+                              ('similarity_refresh_enabled', True)):
+            patcher = mock.patch.object(services, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_precomputed_lists_match_live_recommendations(self):
+        user = CustomUser.objects.create(id=5000, username='reader')
+        item = Item.objects.create(title='item', description='', content_type='movie')
+        Interaction.objects.create(user=user, item=item, rating=5)
+
+        call_command('precompute_recommendations', 'movies', '--top-n', '5', '--block-size', '64',
+                     '--workers', '2', stdout=io.StringIO())
+        # Aucun recalcul en tâche de fond au moment du fork; la couche delta a été recalculée
+        self.assertFalse(services.similarity_refresh_enabled)
+        self.assertEqual(services._refresh_timers, {})
+        recommender = services.get_hybrid_recommender('movies')
+        self.assertEqual(recommender.collaborative_recommender.dirty_items, set())
+
+        precomputed = PrecomputedRecommendations.load(services.precomputed_dir('movies'))
+        user_ids = [0, 17, user.id]
+        live = recommender.batch_recommend_for_users(
+            user_ids, top_n=5, weight_content=services.user_weight_content,
+            weight_collaborative=services.user_weight_collaborative)
+        for user_id in user_ids:
+            recs = precomputed.recommend_for_user(user_id, top_n=5)
+            self.assertEqual(recs['item_id'].tolist(), live[user_id]['item_id'].tolist())
+            np.testing.assert_allclose(recs['hybrid_score'], live[user_id]['hybrid_score'], rtol=1e-6)
+
+        live_items = recommender.batch_recommend_similar_items(
+            [3, 250], top_n=5, weight_content=services.item_weight_content,
+            weight_collaborative=services.item_weight_collaborative)
+        for item_id, recs in live_items.items():
+            self.assertEqual(precomputed.recommend_similar_items(item_id, top_n=5)['item_id'].tolist(),
+                             recs['item_id'].tolist())
+
+
+class EvaluationTests(SimpleTestCase):
+    """Séparation des notes et métriques de classement de l'évaluation hors ligne."""
+
+    def test_temporal_split_holds_out_latest_ratings(self):
+        ratings = synthetic_ratings(n_ratings=2000, n_users=50)
+        ratings['timestamp'] = np.random.default_rng(5).integers(0, 10 ** 6, len(ratings))
+        train, test = split_ratings(ratings, method='temporal', test_fraction=0.25)
+
+        self.assertEqual(len(train) + len(test), len(ratings))
+        counts = ratings.groupby('user_id').size()
+        np.testing.assert_array_equal(
+            test.groupby('user_id').size().reindex(counts.index, fill_value=0),
+            np.floor(counts * 0.25).astype(int))
+        latest_train = train.groupby('user_id')['timestamp'].max()
+        earliest_test = test.groupby('user_id')['timestamp'].min()
+        self.assertTrue((earliest_test >= latest_train[earliest_test.index]).all())
+
+    def test_random_split_is_reproducible(self):
+        ratings = synthetic_ratings(n_ratings=500, n_users=20)
+        _, first = split_ratings(ratings, method='random', seed=3)
+        _, second = split_ratings(ratings, method='random', seed=3)
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_ranking_metrics(self):
+        # Utilisateur 1: pertinents aux rangs 1 et 3 (3 items pertinents); utilisateur 2: aucun
+        hits = np.array([[True, False, True], [False, False, False]])
+        metrics = ranking_metrics(hits, n_relevant=[3, 1])
+
+        np.testing.assert_allclose(metrics['precision'], [2 / 3, 0])
+        np.testing.assert_allclose(metrics['recall'], [2 / 3, 0])
+        ideal = 1 + 1 / np.log2(3) + 1 / np.log2(4)
+        np.testing.assert_allclose(metrics['ndcg'], [(1 + 1 / np.log2(4)) / ideal, 0])
+        np.testing.assert_allclose(metrics['map'], [(1 + 2 / 3) / 3, 0])
+        np.testing.assert_allclose(metrics['hit_rate'], [1, 0])
+
+    def test_run_evaluation_uses_temporary_cache_and_random_split_without_timestamps(self):
+        items = synthetic_items()
+        content = pd.DataFrame({'item_id': items['item_id'], 'description': items['description'],
+                                'title': items['description'], 'genres': 'fantasy', 'authors': 'someone'})
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(services, 'dataset_path', directory), \
+                mock.patch.object(services, 'load_datasets', return_value=(content, synthetic_ratings())):
+            report = run_evaluation('books', engine='collaborative', n_jobs=1)
+            # Le cache de production du dataset n'est pas touché
+            self.assertEqual(os.listdir(directory), [])
+
+        self.assertEqual(report['split']['method'], 'random')
+        self.assertGreater(report['metrics']['users_evaluated'], 0)
+
+
+class BenchmarkTests(SimpleTestCase):
+    """Dataset synthétique du benchmark."""
+
+    def test_synthetic_books_is_reproducible(self):
+        content_df, ratings_df = synthetic_books(scale=0.01, seed=1)
+        other_content_df, other_ratings_df = synthetic_books(scale=0.01, seed=1)
+        pd.testing.assert_frame_equal(ratings_df, other_ratings_df)
+        pd.testing.assert_frame_equal(content_df, other_content_df)
+
+        self.assertEqual(len(content_df), 100)
+        self.assertFalse(ratings_df.duplicated(['user_id', 'item_id']).any())
+        self.assertTrue(ratings_df['item_id'].isin(content_df['item_id']).all())
+        self.assertTrue(ratings_df['rating'].between(1, 5).all())
+
+
+class MetricsTests(SimpleTestCase):
+    """Durées des étapes (Server-Timing, histogrammes) et exposition Prometheus."""
+
+    def setUp(self):
+        metrics.reset_metrics()
+        self.addCleanup(metrics.reset_metrics)
+
+    def test_spans_are_collected_per_request(self):
+        with metrics.request_timings() as timings:
+            for _ in range(2):
+                with metrics.span('scoring'):
+                    pass
+        with metrics.span('outside'):
+            pass
+
+        self.assertEqual(list(timings), ['scoring'])
+        header = metrics.server_timing_header({'scoring': 0.0125}, total=0.02)
+        self.assertEqual(header, 'scoring;dur=12.50, total;dur=20.00')
+
+    def test_prometheus_exposition(self):
+        for seconds in (0.0004, 0.003, 0.003, 120):
+            metrics.observe_stage('scoring', seconds)
+        metrics.record_cache('results', hit=True)
+        metrics.record_cache('results', hit=False)
+        metrics.record_cache('results', hit=False)
+        lines = metrics.render_metrics().splitlines()
+
+        self.assertIn('recommender_stage_duration_seconds_bucket{stage="scoring",le="0.0005"} 1', lines)
+        self.assertIn('recommender_stage_duration_seconds_bucket{stage="scoring",le="0.005"} 3', lines)
+        self.assertIn('recommender_stage_duration_seconds_bucket{stage="scoring",le="60"} 3', lines)
+        self.assertIn('recommender_stage_duration_seconds_bucket{stage="scoring",le="+Inf"} 4', lines)
+        self.assertIn('recommender_stage_duration_seconds_count{stage="scoring"} 4', lines)
+        self.assertIn('recommender_cache_requests_total{cache="results",result="miss"} 2', lines)
+        self.assertIn('recommender_cache_hit_ratio{cache="results"} 0.333333', lines)
@@ -1,6 +1,9 @@
 from django.urls import path
 from .views import (UserRecommendView, 
                     ItemRecommendView, 
+                    BatchUserRecommendView,
+                    BatchItemRecommendView,
+                    MetricsView,
                     RegisterView, 
                     LoginView, 
                     UserProfileView,
@@ -26,10 +29,13 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('recommend/user/', UserRecommendView.as_view(), name='recommend-user'),
     path('recommend/item/', ItemRecommendView.as_view(), name='recommend-item'),
+    path('recommend/user/batch/', BatchUserRecommendView.as_view(), name='recommend-user-batch'),
+    path('recommend/item/batch/', BatchItemRecommendView.as_view(), name='recommend-item-batch'),
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('profile/', UserProfileView.as_view(), name='profile'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 
     # Docs
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
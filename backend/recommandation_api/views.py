@@ -5,18 +5,47 @@ from rest_framework.response import Response
 from .serializers import (
     UserRecommendParamsSerializer,
     ItemRecommendParamsSerializer,
+    BatchUserRecommendParamsSerializer,
+    BatchItemRecommendParamsSerializer,
     RecommendBookSerializer,
     RecommendMovieSerializer,
     UserSerializer,
     RegisterSerializer,
     CustomTokenObtainPairSerializer,
 )
-from .services import build_hybrid_recommender
+from . import metrics
+from . import services
+from .services import get_hybrid_recommender, get_precomputed_recommendations
+from django.conf import settings
+from django.http import HttpResponse
 from django.contrib.auth import get_user_model
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 User = get_user_model()
+
+
+def serialize_recommendations(df, dataset_type):
+    """
+    Sérialise un DataFrame de recommandations selon le type de dataset.
+    """
+    with metrics.span('serialize'):
+        data = df.to_dict(orient='records')
+        if dataset_type == 'books':
+            serializer = RecommendBookSerializer(data, many=True)
+        else:
+            serializer = RecommendMovieSerializer(data, many=True)
+        return serializer.data
+
+
+def serves_precomputed():
+    """
+    Indique si les vues servent d'abord les recommandations précalculées
+    (settings.RECOMMENDER_SERVING_MODE = 'precomputed').
+    """
+    return getattr(settings, 'RECOMMENDER_SERVING_MODE', 'live') == 'precomputed'
+
+
 class RegisterView(generics.CreateAPIView):
     """
     Endpoint d'inscription des utilisateurs.
@@ -119,26 +148,29 @@ class UserRecommendView(APIView):
 
         # Utilisez l'ID de l'utilisateur connecté
         user_id = request.user.id
-        weight_content = 0.3
-        weight_collaborative = 0.7
+        weight_content = services.user_weight_content
+        weight_collaborative = services.user_weight_collaborative
 
-        hybrid_recommender = build_hybrid_recommender(
-            dataset_type=validated['dataset_type'],
-            weight_content=weight_content,
-            weight_collaborative=weight_collaborative
-        )
+        # Mode précalculé: simple lecture, calcul en direct si l'utilisateur est absent
+        # ou a noté des items depuis le précalcul
+        df = None
+        if serves_precomputed():
+            with metrics.span('precomputed'):
+                df = services.precomputed_recommend_for_user(
+                    validated['dataset_type'], user_id, top_n=validated['top_n'])
+            metrics.record_cache('precomputed', hit=df is not None)
 
-        df = hybrid_recommender.recommend_for_user(
-            # user_id=validated['user_id'],
-            user_id=user_id,
-            top_n=validated['top_n']
-        )
-        data = df.to_dict(orient='records')
-        if validated['dataset_type'] == 'books':
-            serializer = RecommendBookSerializer(data, many=True)
-        else:
-            serializer = RecommendMovieSerializer(data, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if df is None:
+            df = services.recommend_for_user(
+                dataset_type=validated['dataset_type'],
+                # user_id=validated['user_id'],
+                user_id=user_id,
+                top_n=validated['top_n'],
+                weight_content=weight_content,
+                weight_collaborative=weight_collaborative
+            )
+        data = serialize_recommendations(df, validated['dataset_type'])
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class ItemRecommendView(APIView):
@@ -186,20 +218,132 @@ class ItemRecommendView(APIView):
         params.is_valid(raise_exception=True)
         validated = params.validated_data
 
-        hybrid_recommender = build_hybrid_recommender(
-            dataset_type=validated['dataset_type'],
-            # weight_content=validated['weight_content'],
-            # weight_collaborative=validated['weight_collaborative']
+        # Mode précalculé: simple lecture, calcul en direct si l'item est absent
+        df = None
+        if serves_precomputed():
+            precomputed = get_precomputed_recommendations(validated['dataset_type'])
+            if precomputed is not None:
+                with metrics.span('precomputed'):
+                    df = precomputed.recommend_similar_items(validated['item_id'], top_n=validated['top_n'])
+                metrics.record_cache('precomputed', hit=df is not None)
+
+        if df is None:
+            df = services.recommend_similar_items(
+                dataset_type=validated['dataset_type'],
+                item_id=validated['item_id'],
+                top_n=validated['top_n'],
+                weight_content=services.item_weight_content,
+                weight_collaborative=services.item_weight_collaborative
+                # weight_content=validated['weight_content'],
+                # weight_collaborative=validated['weight_collaborative']
+            )
+        data = serialize_recommendations(df, validated['dataset_type'])
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class BatchUserRecommendView(APIView):
+    """
+    POST: Recommandations pour un lot d'utilisateurs en un seul appel
+    (tâches d'envoi d'emails, page d'accueil, ...). Réservé aux comptes administrateurs.
+
+    POST /api/recommend/user/batch/
+    {"user_ids": [1, 2, 3], "dataset_type": "<books|movies>", "top_n": <n>}
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_description="Recommandations pour un lot d'utilisateurs",
+        request_body=BatchUserRecommendParamsSerializer,
+        responses={
+            200: "Liste des recommandations par utilisateur (vide pour un utilisateur inconnu)",
+            401: "Token invalide/expiré",
+            403: "Réservé aux administrateurs"
+        }
+    )
+    def post(self, request, format=None):
+        params = BatchUserRecommendParamsSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        validated = params.validated_data
+
+        hybrid_recommender = get_hybrid_recommender(validated['dataset_type'])
+
+        recommendations = hybrid_recommender.batch_recommend_for_users(
+            user_ids=validated['user_ids'],
+            top_n=validated['top_n'],
+            weight_content=services.user_weight_content,
+            weight_collaborative=services.user_weight_collaborative
         )
+        data = [
+            {
+                'user_id': user_id,
+                'recommendations': (
+                    serialize_recommendations(recommendations[user_id], validated['dataset_type'])
+                    if user_id in recommendations else []
+                )
+            }
+            for user_id in validated['user_ids']
+        ]
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class BatchItemRecommendView(APIView):
+    """
+    POST: Items similaires pour un lot d'items en un seul appel.
+
+    POST /api/recommend/item/batch/
+    {"item_ids": [1, 2, 3], "dataset_type": "<books|movies>", "top_n": <n>}
+    """
+
+    @swagger_auto_schema(
+        operation_description="Items similaires pour un lot d'items",
+        request_body=BatchItemRecommendParamsSerializer,
+        responses={
+            200: "Liste des items similaires par item (vide pour un item inconnu)",
+            401: "Token invalide/expiré"
+        }
+    )
+    def post(self, request, format=None):
+        params = BatchItemRecommendParamsSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        validated = params.validated_data
+
+        hybrid_recommender = get_hybrid_recommender(validated['dataset_type'])
 
-        df = hybrid_recommender.recommend_similar_items(
-            item_id=validated['item_id'],
-            top_n=validated['top_n']
+        recommendations = hybrid_recommender.batch_recommend_similar_items(
+            item_ids=validated['item_ids'],
+            top_n=validated['top_n'],
+            weight_content=services.item_weight_content,
+            weight_collaborative=services.item_weight_collaborative
+        )
+        data = [
+            {
+                'item_id': item_id,
+                'recommendations': (
+                    serialize_recommendations(recommendations[item_id], validated['dataset_type'])
+                    if item_id in recommendations else []
+                )
+            }
+            for item_id in validated['item_ids']
+        ]
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    """
+    GET: Métriques du processus au format texte de Prometheus: durées des étapes
+    de recommandation et des requêtes, accès aux caches, durées de chargement et
+    taille mémoire des modèles. Chaque worker publie ses propres métriques.
+
+    GET /api/metrics/
+    """
+    permission_classes = [permissions.AllowAny]
+
+    @swagger_auto_schema(
+        operation_description="Métriques Prometheus du service de recommandation",
+        responses={200: "Exposition au format texte de Prometheus"}
+    )
+    def get(self, request, format=None):
+        return HttpResponse(
+            metrics.render_metrics(services.loaded_recommenders()),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
         )
-        data = df.to_dict(orient='records')
-        if validated['dataset_type'] == 'books':
-            serializer = RecommendBookSerializer(data, many=True)
-        else:
-            serializer = RecommendMovieSerializer(data, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    
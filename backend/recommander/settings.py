@@ -67,6 +67,28 @@ SWAGGER_SETTINGS = {
 
 AUTH_USER_MODEL = 'recommandation_api.CustomUser'
 
+# 'live': recommandations calculées à chaque requête
+# 'precomputed': lecture des listes générées par `manage.py precompute_recommendations`,
+#                avec calcul en direct pour les IDs absents
+RECOMMENDER_SERVING_MODE = 'live'
+
+# Cache des réponses de recommandation (LRU en mémoire locale par défaut).
+# En production multi-processus, préférer un cache partagé (Redis, Memcached)
+# pour que l'invalidation après une nouvelle interaction touche tous les workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'recommendations': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recommendations',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -88,6 +110,8 @@ SIMPLE_JWT = {
 
 
 MIDDLEWARE = [
+    # En premier: l'en-tête Server-Timing couvre tout le traitement de la requête
+    'recommandation_api.metrics.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',